@@ -0,0 +1,172 @@
+"""
+This module contains the streaming export of the sentiment analysis API,
+which reads a whole DynamoDB table with a parallel scan and streams its items
+as newline-delimited JSON.
+
+The table is split into segments, each scanned page by page by a worker of a
+thread pool, so the duration of an export decreases with the number of
+segments. The pages are passed to the consumer through a bounded queue: a
+worker waits while the queue is full, so at most max_pages pages are held in
+memory whatever the size of the table. If the consumer stops reading, for
+example because the client disconnected, the workers stop at their next page.
+
+Functions:
+    parallel_scan: Yields the items of a table scanned in parallel segments.
+    ndjson_chunks: Encodes items as newline-delimited JSON chunks.
+    gzip_chunks: Compresses a stream of chunks into a gzip stream.
+"""
+
+import os
+import json
+import zlib
+import queue
+import logging
+import threading
+from concurrent.futures import Executor
+from typing import Any, Dict, Iterable, Iterator
+
+from logger_config import setup_logger
+
+LOGGING_LEVEL = (
+    int(os.getenv("LOGGING_LEVEL")) if os.getenv("LOGGING_LEVEL") else logging.DEBUG
+)
+
+script_name = os.path.splitext(os.path.basename(__file__))[0]
+
+logger = setup_logger(script_name, LOGGING_LEVEL)
+
+# Marks the end of a segment in the queue of pages
+_DONE = object()
+
+
+def _scan_segment(
+    table: Any,
+    segment: int,
+    total_segments: int,
+    pages: queue.Queue,
+    stopped: threading.Event,
+    scan_kwargs: Dict[str, Any],
+) -> None:
+    def put(page: Any) -> bool:
+        # Waits for room in the queue, giving up if the export is stopped.
+        while not stopped.is_set():
+            try:
+                pages.put(page, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    try:
+        kwargs = {**scan_kwargs, "Segment": segment, "TotalSegments": total_segments}
+        while not stopped.is_set():
+            response = table.scan(**kwargs)
+            if response["Items"] and not put(response["Items"]):
+                return
+            if "LastEvaluatedKey" not in response:
+                break
+            kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+        put(_DONE)
+    except Exception as e:  # pylint: disable=broad-except
+        logger.error("Scan of segment %d of %d failed: %s", segment, total_segments, e)
+        # The error is raised again by the consumer.
+        put(e)
+
+
+def parallel_scan(
+    table: Any,
+    executor: Executor,
+    total_segments: int,
+    max_pages: int = 8,
+    **scan_kwargs: Any,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Yields every item of a table, scanned in parallel segments by the workers
+    of a thread pool. Items are yielded in no particular order.
+
+    Args:
+        table (Any): The DynamoDB Table resource.
+        executor (Executor): The thread pool scanning the segments. Segments
+            wait for a free worker if there are more segments than workers.
+        total_segments (int): The number of segments.
+        max_pages (int): Maximum number of pages read ahead of the consumer.
+        **scan_kwargs (Any): Additional arguments of each scan, like Limit or
+            ProjectionExpression.
+
+    Yields:
+        Dict[str, Any]: The items of the table.
+
+    Raises:
+        Exception: The first error raised by the scan of a segment.
+    """
+    pages: queue.Queue = queue.Queue(max_pages)
+    stopped = threading.Event()
+    futures = [
+        executor.submit(
+            _scan_segment, table, segment, total_segments, pages, stopped, scan_kwargs
+        )
+        for segment in range(total_segments)
+    ]
+    try:
+        remaining = total_segments
+        while remaining:
+            page = pages.get()
+            if page is _DONE:
+                remaining -= 1
+            elif isinstance(page, Exception):
+                raise page
+            else:
+                yield from page
+    finally:
+        # Stops the workers when the consumer fails or stops reading early.
+        stopped.set()
+        for future in futures:
+            future.cancel()
+
+
+def ndjson_chunks(
+    items: Iterable[Dict[str, Any]], chunk_size: int = 65536
+) -> Iterator[bytes]:
+    """
+    Encodes items as newline-delimited JSON, one object per line, grouped in
+    chunks of about chunk_size bytes to limit the number of writes.
+
+    Args:
+        items (Iterable[Dict[str, Any]]): The items.
+        chunk_size (int): Minimum size of a chunk in bytes, except the last.
+
+    Yields:
+        bytes: The chunks.
+    """
+    buffer = []
+    size = 0
+    for item in items:
+        line = (json.dumps(item, default=str) + "\n").encode("utf-8")
+        buffer.append(line)
+        size += len(line)
+        if size >= chunk_size:
+            yield b"".join(buffer)
+            buffer = []
+            size = 0
+    if buffer:
+        yield b"".join(buffer)
+
+
+def gzip_chunks(chunks: Iterable[bytes], level: int = 6) -> Iterator[bytes]:
+    """
+    Compresses a stream of chunks into a single gzip stream.
+
+    Args:
+        chunks (Iterable[bytes]): The uncompressed chunks.
+        level (int): The compression level, from 1 to 9.
+
+    Yields:
+        bytes: The compressed chunks.
+    """
+    # A window size of 16 + 15 writes the gzip header and trailer.
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
@@ -0,0 +1,287 @@
+"""
+This module contains the setup_logger function which is used to configure
+the logger for the application.
+
+The setup_logger function takes in a script name and a logging level, and sets
+up a logger with a console handler and a file handler. The file handler writes
+logs to a file in a 'logs' directory, and rotates the log file at midnight
+every day, keeping a backup of the last 14 days. The console handler writes logs
+to the console.
+
+Both handlers use a formatter that includes the time of logging, the name of
+the logger, the logging level, and the log message, or, if LOG_FORMAT is
+"json", a formatter writing one JSON object per line.
+
+Writing to the console and to the file is kept off the calling thread: the
+logger only has a QueueHandler, which puts each record on a process-wide
+queue, and a single QueueListener thread passes the records to the console
+and file handlers of their logger. When the queue is full, records are
+dropped rather than blocking the caller. Calling setup_logger again for the
+same logger only updates its level, so modules that are re-executed, like
+the Streamlit script, do not attach duplicate handlers.
+
+Debug records are sampled with LOG_DEBUG_SAMPLE_RATE and limited to
+LOG_DEBUG_RATE_LIMIT records per second for each line of code that logs them,
+so that high-volume debug messages on hot paths do not flood the queue.
+Records of other levels are never dropped by the filter.
+
+This module is shared by the chatbot and the sentiment analysis API. Since
+each service image is built from its own directory, api/app/logger_config.py
+is a copy of chatbot/app/logger_config.py, and a test checks that both are
+identical.
+
+Classes:
+    JsonFormatter: Formats records as JSON objects.
+    DebugRateLimitFilter: Samples and rate limits debug records.
+
+Functions:
+    setup_logger(script_name: str, logging_level: int) -> logging.Logger:
+    Sets up and returns a logger with the given name and logging level.
+    get_handlers(script_name: str) -> List[logging.Handler]:
+    Returns the console and file handlers of a logger.
+    flush_logs() -> None:
+    Waits until every queued record has been written.
+"""
+
+import os
+import json
+import time
+import queue
+import atexit
+import random
+import logging
+import threading
+from logging.handlers import QueueHandler, QueueListener, TimedRotatingFileHandler
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text")
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+LOG_DEBUG_RATE_LIMIT = float(os.getenv("LOG_DEBUG_RATE_LIMIT", "20"))
+LOG_DEBUG_SAMPLE_RATE = float(os.getenv("LOG_DEBUG_SAMPLE_RATE", "1.0"))
+
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Formats each record as a JSON object on a single line, with the time of
+    logging, the name of the logger, the logging level and the log message.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": self.formatTime(record),
+            "logger": record.name,
+            "level": record.levelname,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class DebugRateLimitFilter(logging.Filter):
+    """
+    Samples debug records and limits them to a number of records per second
+    for each line of code that logs them, with a token bucket. Records of
+    other levels always pass.
+    """
+
+    def __init__(
+        self,
+        max_per_second: float = LOG_DEBUG_RATE_LIMIT,
+        sample_rate: float = LOG_DEBUG_SAMPLE_RATE,
+    ) -> None:
+        """
+        Args:
+            max_per_second (float): Maximum number of debug records per
+                second and per line of code. 0 disables the limit.
+            sample_rate (float): Share of the debug records kept, between 0
+                and 1.
+        """
+        super().__init__()
+        self.max_per_second = max_per_second
+        self.sample_rate = sample_rate
+        self.suppressed = 0
+        self._lock = threading.Lock()
+        # Tokens left and time of the last refill, per line of code
+        self._buckets: Dict[Tuple[str, int], Tuple[float, float]] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.DEBUG:
+            return True
+        if self.sample_rate < 1 and random.random() >= self.sample_rate:  # nosec B311
+            return self._suppress()
+        if self.max_per_second <= 0:
+            return True
+        key = (record.pathname, record.lineno)
+        now = time.monotonic()
+        with self._lock:
+            tokens, last = self._buckets.get(key, (self.max_per_second, now))
+            tokens = min(
+                self.max_per_second, tokens + (now - last) * self.max_per_second
+            )
+            if tokens < 1:
+                self._buckets[key] = (tokens, now)
+                self.suppressed += 1
+                return False
+            self._buckets[key] = (tokens - 1, now)
+        return True
+
+    def _suppress(self) -> bool:
+        with self._lock:
+            self.suppressed += 1
+        return False
+
+
+class _LoggerQueueHandler(QueueHandler):
+    """
+    QueueHandler tagging each record with the logger it was set up for, and
+    dropping records when the queue is full.
+    """
+
+    def __init__(self, log_queue: queue.Queue, route: str) -> None:
+        super().__init__(log_queue)
+        self.route = route
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = super().prepare(record)
+        record.route = self.route
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class _Dispatcher(logging.Handler):
+    """
+    Handler of the listener thread, passing each record to the console and
+    file handlers of its logger.
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.routes: Dict[str, List[logging.Handler]] = {}
+
+    def emit(self, record: logging.LogRecord) -> None:
+        for handler in self.routes.get(getattr(record, "route", record.name), ()):
+            if record.levelno >= handler.level:
+                handler.handle(record)
+
+
+_lock = threading.Lock()
+_queue: queue.Queue = queue.Queue(LOG_QUEUE_SIZE)
+_dispatcher = _Dispatcher()
+_listener: Optional[QueueListener] = None
+
+
+def _create_formatter() -> logging.Formatter:
+    if LOG_FORMAT == "json":
+        return JsonFormatter()
+    return logging.Formatter(TEXT_FORMAT)
+
+
+def _start_listener() -> None:
+    global _listener  # pylint: disable=global-statement
+
+    if _listener is None:
+        _listener = QueueListener(_queue, _dispatcher)
+        _listener.start()
+        atexit.register(_listener.stop)
+
+
+def setup_logger(
+    script_name: str, logging_level: int = logging.DEBUG
+) -> logging.Logger:
+    """
+    Sets up and returns a logger with the given name and logging level.
+
+    This function creates a logger with the provided script name and logging
+    level. It sets up a console handler and a file handler for the logger.
+    The file handler writes logs to a file in a 'logs' directory, and rotates
+    the log file at midnight every day, keeping a backup of the last 14 days.
+    The console handler writes logs to the console.
+
+    Both handlers use a formatter that includes the time of logging, the name of
+    the logger, the logging level, and the log message, or a JSON formatter if
+    LOG_FORMAT is "json". They are run by the background listener thread,
+    and the logger itself only gets a QueueHandler with a filter sampling and
+    rate limiting debug records.
+
+    If the logger has already been set up, only its level and the level of its
+    handlers are updated.
+
+    Args:
+        script_name (str): The name of the script where the logger is being set up.
+        logging_level (int): The logging level to be set for the logger.
+
+    Returns:
+        logging.Logger: The configured logger.
+    """
+    logger = logging.getLogger(script_name)
+    logger.setLevel(logging_level)
+
+    with _lock:
+        handlers = _dispatcher.routes.get(script_name)
+        if handlers is not None and any(
+            isinstance(h, _LoggerQueueHandler) and h.queue is _queue
+            for h in logger.handlers
+        ):
+            for handler in handlers:
+                handler.setLevel(logging_level)
+            return logger
+
+        console_handler = logging.StreamHandler()
+        console_handler.setLevel(logging_level)
+
+        if not os.path.exists("logs"):
+            os.makedirs("logs")
+        current_time = datetime.now().strftime("%Y%m%d_%H%M%S")
+        file_handler = TimedRotatingFileHandler(
+            f"logs/{script_name}_{current_time}.log", when="midnight", backupCount=14
+        )
+        file_handler.setLevel(logging_level)
+
+        formatter = _create_formatter()
+        console_handler.setFormatter(formatter)
+        file_handler.setFormatter(formatter)
+
+        queue_handler = _LoggerQueueHandler(_queue, script_name)
+        queue_handler.addFilter(DebugRateLimitFilter())
+
+        for handler in handlers or ():
+            handler.close()
+        _dispatcher.routes[script_name] = [console_handler, file_handler]
+        logger.addHandler(queue_handler)
+        _start_listener()
+
+    return logger
+
+
+def get_handlers(script_name: str) -> List[logging.Handler]:
+    """
+    Returns the console and file handlers run by the listener thread for a
+    logger.
+
+    Args:
+        script_name (str): The name of the logger.
+
+    Returns:
+        List[logging.Handler]: The console handler and the file handler, or an
+        empty list if the logger has not been set up.
+    """
+    return list(_dispatcher.routes.get(script_name, ()))
+
+
+def flush_logs() -> None:
+    """
+    Waits until every record queued so far has been written by the listener
+    thread.
+    """
+    if _listener is not None:
+        _queue.join()
@@ -0,0 +1,131 @@
+"""
+This module contains the pagination helpers of the list endpoints of the
+sentiment analysis API.
+
+A page is read with the Limit of a DynamoDB scan or query, and the next page
+starts at the LastEvaluatedKey of the previous one. That key is returned to
+the client as an opaque next_token: URL-safe base64 of its JSON encoding. The
+client can also select the returned fields, which are read with a
+ProjectionExpression.
+
+Functions:
+    encode_token: Encodes a LastEvaluatedKey into a next_token.
+    decode_token: Decodes a next_token into an ExclusiveStartKey.
+    parse_projection: Builds the projection arguments reading the selected
+        fields.
+    parse_page_request: Builds the scan or query arguments of a page from the
+        query string of a request.
+"""
+
+import os
+import json
+import base64
+import binascii
+from typing import Any, Dict, Iterable, Mapping, Optional
+
+DEFAULT_PAGE_SIZE = int(os.getenv("DEFAULT_PAGE_SIZE", "100"))
+MAX_PAGE_SIZE = int(os.getenv("MAX_PAGE_SIZE", "1000"))
+
+
+def encode_token(last_evaluated_key: Optional[Dict[str, Any]]) -> Optional[str]:
+    """
+    Encodes the LastEvaluatedKey of a scan or query into an opaque token.
+
+    Args:
+        last_evaluated_key (Optional[Dict[str, Any]]): The key, or None on the
+            last page.
+
+    Returns:
+        Optional[str]: The token, or None on the last page.
+    """
+    if not last_evaluated_key:
+        return None
+    data = json.dumps(last_evaluated_key, sort_keys=True, default=str)
+    return base64.urlsafe_b64encode(data.encode("utf-8")).decode("ascii")
+
+
+def decode_token(token: str) -> Dict[str, Any]:
+    """
+    Decodes a token returned by encode_token.
+
+    Args:
+        token (str): The token.
+
+    Returns:
+        Dict[str, Any]: The ExclusiveStartKey of the next page.
+
+    Raises:
+        ValueError: If the token is not valid.
+    """
+    try:
+        key = json.loads(base64.urlsafe_b64decode(token.encode("ascii")))
+    except (binascii.Error, UnicodeError, ValueError) as e:
+        raise ValueError("Invalid next_token") from e
+    if not isinstance(key, dict) or not all(isinstance(v, str) for v in key.values()):
+        raise ValueError("Invalid next_token")
+    return key
+
+
+def parse_projection(fields: str, allowed_fields: Iterable[str]) -> Dict[str, Any]:
+    """
+    Builds the arguments of a DynamoDB scan or query reading only the given
+    fields.
+
+    Args:
+        fields (str): Comma-separated fields, or an empty string for all
+            fields.
+        allowed_fields (Iterable[str]): The fields that can be selected.
+
+    Returns:
+        Dict[str, Any]: ProjectionExpression and ExpressionAttributeNames, or
+        an empty dictionary for all fields.
+
+    Raises:
+        ValueError: If a field is not allowed.
+    """
+    if not fields:
+        return {}
+    selected = list(dict.fromkeys(f.strip() for f in fields.split(",")))
+    unknown = sorted(set(selected) - set(allowed_fields))
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    # Attribute names are aliased since some, like timestamp, are reserved
+    # words of DynamoDB.
+    names = {f"#f{i}": field for i, field in enumerate(selected)}
+    return {
+        "ProjectionExpression": ", ".join(names),
+        "ExpressionAttributeNames": names,
+    }
+
+
+def parse_page_request(
+    args: Mapping[str, str], allowed_fields: Iterable[str]
+) -> Dict[str, Any]:
+    """
+    Builds the arguments of a DynamoDB scan or query reading one page, from
+    the 'limit', 'next_token' and 'fields' parameters of a request.
+
+    Args:
+        args (Mapping[str, str]): The query string parameters.
+        allowed_fields (Iterable[str]): The fields that can be selected.
+
+    Returns:
+        Dict[str, Any]: Limit, and ExclusiveStartKey, ProjectionExpression and
+        ExpressionAttributeNames if requested.
+
+    Raises:
+        ValueError: If a parameter is not valid.
+    """
+    try:
+        limit = int(args.get("limit", DEFAULT_PAGE_SIZE))
+    except ValueError as e:
+        raise ValueError("'limit' must be an integer") from e
+    if not 1 <= limit <= MAX_PAGE_SIZE:
+        raise ValueError(f"'limit' must be between 1 and {MAX_PAGE_SIZE}")
+    kwargs: Dict[str, Any] = {"Limit": limit}
+
+    if args.get("next_token"):
+        kwargs["ExclusiveStartKey"] = decode_token(args["next_token"])
+
+    kwargs.update(parse_projection(args.get("fields", ""), allowed_fields))
+    return kwargs
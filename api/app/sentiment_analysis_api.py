@@ -5,12 +5,10 @@ The API is built using Flask and provides endpoints for posting user queries and
 retrieving user queries. The sentiment of the user queries is analyzed using
 AWS Comprehend and the results are stored in a DynamoDB table.
 
-The API also includes logging functionalities. The logger is set up with a
-console handler and a file handler. The file handler writes logs to a file in a
-'logs' directory and rotates the log file at midnight every day, keeping a
-backup of the last 14 days. The console handler writes logs to the console.
-Both handlers use a formatter that includes the time of logging, the name of
-the logger, the logging level, and the log message.
+The API also includes logging functionalities. The logger is set up by the
+logger_config module shared with the chatbot: records are written to the
+console and to a daily rotated file in a 'logs' directory by a background
+thread, so that log I/O does not add to the latency of the requests.
 
 This module can be run as a standalone script to start the Flask development
 server.
@@ -23,67 +21,80 @@ Environment variables:
     AWS_ACCESS_KEY_ID: The AWS access key ID for accessing AWS services.
     AWS_SECRET_ACCESS_KEY: The AWS secret access key for accessing AWS services.
     LOGGING_LEVEL: The logging level for the logger. Defaults to logging.DEBUG.
+    COMPREHEND_MAX_WORKERS: The number of threads of the pool calling AWS
+        Comprehend concurrently with the request threads. Defaults to 16.
+    MAX_BATCH_TEXTS: The maximum number of user queries of a batch request.
+        Defaults to 500.
+    SENTIMENT_CACHE_ENABLED: Whether the results of AWS Comprehend are cached.
+        Defaults to 'True'.
+    SENTIMENT_CACHE_MAX_ENTRIES: The maximum number of results cached in
+        process. Defaults to 10000.
+    SENTIMENT_CACHE_TTL_SECONDS: The number of seconds a result stays cached.
+        Defaults to 86400.
+    SENTIMENT_CACHE_TABLE: The name of an optional DynamoDB table sharing the
+        cached results between the replicas of the API. Defaults to none.
+    PERSISTENCE_MODE: 'sync' to store each user query before responding, or
+        'write_behind' to store them in the background in batches. Defaults
+        to 'sync'.
+    WRITE_BEHIND_BATCH_SIZE: The maximum number of items per background
+        batch. Defaults to 25.
+    WRITE_BEHIND_FLUSH_INTERVAL_SECONDS: The maximum number of seconds an
+        item waits before its batch is written. Defaults to 1.
+    WRITE_BEHIND_MAX_QUEUE: The maximum number of queued items; user queries
+        are stored synchronously while the queue is full. Defaults to 10000.
+    WRITE_BEHIND_MAX_RETRIES: The number of retries of a failed batch.
+        Defaults to 5.
+    WRITE_BEHIND_BACKOFF_SECONDS: The delay before the first retry, doubled
+        for each following retry. Defaults to 0.5.
+    WRITE_BEHIND_SPILL_PATH: The file the batches that could not be written
+        are appended to. Defaults to 'spill/user_queries.ndjson'.
+    WRITE_BEHIND_SHUTDOWN_TIMEOUT_SECONDS: The number of seconds the queue is
+        drained for when the API stops, after which the remaining user
+        queries are spilled. It must be shorter than the termination grace
+        period of the pod. Defaults to 20.
+    DEFAULT_PAGE_SIZE: The number of user queries per page when no limit is
+        given. Defaults to 100.
+    MAX_PAGE_SIZE: The maximum number of user queries per page. Defaults to
+        1000.
+    EXPORT_SEGMENTS: The number of segments of the parallel scan of an export
+        when none is requested. Defaults to 4.
+    EXPORT_MAX_SEGMENTS: The maximum number of segments of an export.
+        Defaults to 32.
+    EXPORT_MAX_WORKERS: The number of threads of the pool scanning the
+        segments of the exports. Defaults to 8.
+    EXPORT_MAX_PAGES: The maximum number of scanned pages held in memory by
+        an export. Defaults to 8.
+    SENTIMENT_INDEX: The name of the global secondary index of the user
+        queries by sentiment and timestamp. Defaults to
+        'sentiment-timestamp-index'.
+    LANGUAGE_INDEX: The name of the global secondary index of the user
+        queries by language and timestamp. Defaults to
+        'language-timestamp-index'. Both indexes are added to an existing
+        table that lacks them when the API starts.
 """
 
 import os
+import sys
+import signal
+import atexit
 import logging
-from logging.handlers import TimedRotatingFileHandler
 import uuid
-from datetime import datetime
-from flask import Flask, request, jsonify
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, time
+from typing import List, Optional, Tuple
+from flask import Flask, Response, request, jsonify
 import boto3
-from botocore.exceptions import ClientError
+from boto3.dynamodb.conditions import Attr, Key
+from botocore.config import Config
+from botocore.exceptions import BotoCoreError, ClientError
+from export import gzip_chunks, ndjson_chunks, parallel_scan
+from logger_config import setup_logger
+from pagination import encode_token, parse_page_request, parse_projection
+from sentiment_cache import DynamoDBCacheTier, SentimentCache
+from write_behind import WriteBehindWriter
 
 app = Flask(__name__)
 
-
-def setup_logger(name: str, logging_level: int = logging.DEBUG) -> logging.Logger:
-    """
-    Sets up a logger with the specified name and logging level.
-
-    The logger is set up with a console handler and a file handler. The console
-    handler writes logs to the console, and the file handler writes logs to a
-    file in a 'logs' directory. The file handler rotates the log file at
-    midnight every day, keeping a backup of the last 14 days. Both handlers use
-    a formatter that includes the time of logging, the name of the logger, the
-    logging level, and the log message.
-
-    If the 'logs' directory does not exist, it is created.
-
-    Args:
-        name (str): The name of the logger.
-        logging_level (int, optional): The logging level of the logger. Defaults
-        to logging.DEBUG.
-
-    Returns:
-        logging.Logger: The set-up logger.
-    """
-    log = logging.getLogger(name)
-    log.setLevel(logging_level)
-
-    console_handler = logging.StreamHandler()
-    console_handler.setLevel(logging_level)
-
-    if not os.path.exists("logs"):
-        os.makedirs("logs")
-    current_time = datetime.now().strftime("%Y%m%d_%H%M%S")
-    file_handler = TimedRotatingFileHandler(
-        f"logs/{name}_{current_time}.log", when="midnight", backupCount=14
-    )
-    file_handler.setLevel(logging_level)
-
-    formatter = logging.Formatter(
-        "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
-    )
-    console_handler.setFormatter(formatter)
-    file_handler.setFormatter(formatter)
-
-    log.addHandler(console_handler)
-    log.addHandler(file_handler)
-
-    return log
-
-
 AWS_REGION = os.getenv("AWS_REGION", "us-east-1")
 DYNAMODB_TABLE = os.getenv("DYNAMODB_TABLE", "ce5-group6-user-queries")
 AWS_ACCESS_KEY_ID = os.getenv("AWS_ACCESS_KEY_ID")
@@ -92,6 +103,41 @@ LOGGING_LEVEL = (
     os.getenv("LOGGING_LEVEL") if os.getenv("LOGGING_LEVEL") else logging.DEBUG
 )
 DEBUG = os.getenv("DEBUG", "False") == "True"
+# Attributes of the items of the user queries table
+USER_QUERY_FIELDS = ("id", "user_query", "sentiment", "language", "timestamp")
+# Global secondary indexes of the user queries table by partition key, sorted
+# by timestamp
+QUERY_INDEXES = {
+    "sentiment": os.getenv("SENTIMENT_INDEX", "sentiment-timestamp-index"),
+    "language": os.getenv("LANGUAGE_INDEX", "language-timestamp-index"),
+}
+SENTIMENTS = ("POSITIVE", "NEGATIVE", "NEUTRAL", "MIXED")
+# Maximum number of documents of a Comprehend batch call
+COMPREHEND_BATCH_SIZE = 25
+COMPREHEND_MAX_WORKERS = int(os.getenv("COMPREHEND_MAX_WORKERS", "16"))
+MAX_BATCH_TEXTS = int(os.getenv("MAX_BATCH_TEXTS", "500"))
+SENTIMENT_CACHE_ENABLED = os.getenv("SENTIMENT_CACHE_ENABLED", "True") == "True"
+SENTIMENT_CACHE_MAX_ENTRIES = int(os.getenv("SENTIMENT_CACHE_MAX_ENTRIES", "10000"))
+SENTIMENT_CACHE_TTL_SECONDS = float(os.getenv("SENTIMENT_CACHE_TTL_SECONDS", "86400"))
+SENTIMENT_CACHE_TABLE = os.getenv("SENTIMENT_CACHE_TABLE", "")
+PERSISTENCE_MODE = os.getenv("PERSISTENCE_MODE", "sync")
+WRITE_BEHIND_BATCH_SIZE = int(os.getenv("WRITE_BEHIND_BATCH_SIZE", "25"))
+WRITE_BEHIND_FLUSH_INTERVAL_SECONDS = float(
+    os.getenv("WRITE_BEHIND_FLUSH_INTERVAL_SECONDS", "1")
+)
+WRITE_BEHIND_MAX_QUEUE = int(os.getenv("WRITE_BEHIND_MAX_QUEUE", "10000"))
+WRITE_BEHIND_MAX_RETRIES = int(os.getenv("WRITE_BEHIND_MAX_RETRIES", "5"))
+WRITE_BEHIND_BACKOFF_SECONDS = float(os.getenv("WRITE_BEHIND_BACKOFF_SECONDS", "0.5"))
+WRITE_BEHIND_SPILL_PATH = os.getenv(
+    "WRITE_BEHIND_SPILL_PATH", "spill/user_queries.ndjson"
+)
+WRITE_BEHIND_SHUTDOWN_TIMEOUT_SECONDS = float(
+    os.getenv("WRITE_BEHIND_SHUTDOWN_TIMEOUT_SECONDS", "20")
+)
+EXPORT_SEGMENTS = int(os.getenv("EXPORT_SEGMENTS", "4"))
+EXPORT_MAX_SEGMENTS = int(os.getenv("EXPORT_MAX_SEGMENTS", "32"))
+EXPORT_MAX_WORKERS = int(os.getenv("EXPORT_MAX_WORKERS", "8"))
+EXPORT_MAX_PAGES = int(os.getenv("EXPORT_MAX_PAGES", "8"))
 
 
 script_name = os.path.splitext(os.path.basename(__file__))[0]
@@ -103,24 +149,254 @@ session = boto3.Session(
     region_name=AWS_REGION,
 )
 
-comprehend = session.client(service_name="comprehend")
-dynamodb = session.resource("dynamodb")
+# The sentiment and language of a query are detected concurrently: one call on
+# the request thread and the other on a pool shared by every request. The
+# client keeps enough connections for both, instead of the default of 10, so
+# that connections are reused rather than opened for each call.
+comprehend = session.client(
+    service_name="comprehend",
+    config=Config(max_pool_connections=2 * COMPREHEND_MAX_WORKERS),
+)
+comprehend_executor = ThreadPoolExecutor(
+    max_workers=COMPREHEND_MAX_WORKERS, thread_name_prefix="comprehend"
+)
+# The segments of the parallel scans of the exports, shared by every export.
+export_executor = ThreadPoolExecutor(
+    max_workers=EXPORT_MAX_WORKERS, thread_name_prefix="export"
+)
+dynamodb = session.resource(
+    "dynamodb", config=Config(max_pool_connections=max(10, EXPORT_MAX_WORKERS))
+)
 table = dynamodb.Table(DYNAMODB_TABLE)
 
+
+def query_index(attribute: str, provisioned: bool = True) -> dict:
+    """
+    Returns the definition of the global secondary index of the user queries
+    of a sentiment or of a language, sorted by timestamp, so that they are
+    queried without scanning the table.
+
+    Args:
+        attribute (str): 'sentiment' or 'language'.
+        provisioned (bool): Whether the table has provisioned throughput,
+            which the index must then have too.
+
+    Returns:
+        dict: The index, as expected by create_table and update_table.
+    """
+    index = {
+        "IndexName": QUERY_INDEXES[attribute],
+        "KeySchema": [
+            {"AttributeName": attribute, "KeyType": "HASH"},
+            {"AttributeName": "timestamp", "KeyType": "RANGE"},
+        ],
+        "Projection": {"ProjectionType": "ALL"},
+    }
+    if provisioned:
+        index["ProvisionedThroughput"] = {
+            "ReadCapacityUnits": 5,
+            "WriteCapacityUnits": 5,
+        }
+    return index
+
+
+# Partition key, and keys of the secondary indexes
+ATTRIBUTE_DEFINITIONS = [
+    {"AttributeName": name, "AttributeType": "S"}
+    for name in ("id", "sentiment", "language", "timestamp")
+]
+
+
+def add_query_indexes(user_queries_table) -> None:
+    """
+    Adds the query indexes missing from a table created by an earlier version
+    of the API. DynamoDB creates one index per update, and backfills it from
+    the existing items before it can be queried, so an index that cannot be
+    added yet is added at the next start. Until then, querying it returns a
+    503 error.
+
+    Args:
+        user_queries_table: The DynamoDB Table resource.
+    """
+    existing = {
+        index["IndexName"]
+        for index in user_queries_table.global_secondary_indexes or []
+    }
+    billing_mode = (user_queries_table.billing_mode_summary or {}).get(
+        "BillingMode", "PROVISIONED"
+    )
+    for attribute, index_name in QUERY_INDEXES.items():
+        if index_name in existing:
+            continue
+        logger.warning(
+            "Adding index %s to table %s", index_name, user_queries_table.name
+        )
+        try:
+            user_queries_table.meta.client.update_table(
+                TableName=user_queries_table.name,
+                AttributeDefinitions=ATTRIBUTE_DEFINITIONS,
+                GlobalSecondaryIndexUpdates=[
+                    {"Create": query_index(attribute, billing_mode == "PROVISIONED")}
+                ],
+            )
+        except ClientError as error:
+            # For example while another index is being created, or if the
+            # API is not allowed to update the table.
+            logger.error("Failed to add index %s: %s", index_name, error)
+            return
+
+
 try:
     table.load()
+    add_query_indexes(table)
 except ClientError as e:
     if e.response["Error"]["Code"] == "ResourceNotFoundException":
         table = dynamodb.create_table(
             TableName=DYNAMODB_TABLE,
             KeySchema=[{"AttributeName": "id", "KeyType": "HASH"}],
-            # Partition key
-            AttributeDefinitions=[{"AttributeName": "id", "AttributeType": "S"}],
+            AttributeDefinitions=ATTRIBUTE_DEFINITIONS,
             ProvisionedThroughput={"ReadCapacityUnits": 5, "WriteCapacityUnits": 5},
+            GlobalSecondaryIndexes=[
+                query_index(attribute) for attribute in QUERY_INDEXES
+            ],
         )
     else:
         raise
 
+# Results of AWS Comprehend by normalized text, shared by every request and,
+# if SENTIMENT_CACHE_TABLE is set, by every replica.
+sentiment_cache = SentimentCache(
+    SENTIMENT_CACHE_MAX_ENTRIES,
+    SENTIMENT_CACHE_TTL_SECONDS,
+    (
+        DynamoDBCacheTier(
+            dynamodb.Table(SENTIMENT_CACHE_TABLE), SENTIMENT_CACHE_TTL_SECONDS
+        )
+        if SENTIMENT_CACHE_TABLE
+        else None
+    ),
+)
+
+# In write-behind mode, user queries are stored in the background and the
+# queue is drained when the process exits, until the shutdown timeout.
+write_behind: Optional[WriteBehindWriter] = None
+if PERSISTENCE_MODE == "write_behind":
+    write_behind = WriteBehindWriter(
+        table,
+        WRITE_BEHIND_BATCH_SIZE,
+        WRITE_BEHIND_FLUSH_INTERVAL_SECONDS,
+        WRITE_BEHIND_MAX_QUEUE,
+        WRITE_BEHIND_MAX_RETRIES,
+        WRITE_BEHIND_BACKOFF_SECONDS,
+        WRITE_BEHIND_SPILL_PATH,
+    )
+    atexit.register(write_behind.shutdown, WRITE_BEHIND_SHUTDOWN_TIMEOUT_SECONDS)
+elif PERSISTENCE_MODE != "sync":
+    raise ValueError(f"Unsupported persistence mode: {PERSISTENCE_MODE}")
+
+
+def store_user_queries(items: List[dict]) -> None:
+    """
+    Stores analyzed user queries in the DynamoDB table. In write-behind mode,
+    the items are queued to be written in the background, and only the items
+    that do not fit in the queue are written before returning.
+
+    Args:
+        items (List[dict]): The items to store.
+
+    Raises:
+        ClientError: If writing the items to DynamoDB fails.
+    """
+    if write_behind is not None:
+        items = [item for item in items if not write_behind.submit(item)]
+    if len(items) == 1:
+        table.put_item(Item=items[0])
+    elif items:
+        # The batch writer sends up to 25 items per request and resends
+        # unprocessed items.
+        with table.batch_writer() as batch:
+            for item in items:
+                batch.put_item(Item=item)
+
+
+def detect_sentiment_and_language(text: str) -> Tuple[str, str]:
+    """
+    Detects the sentiment and the dominant language of a text using AWS
+    Comprehend. Both are detected concurrently, so the latency is that of the
+    slower of the two calls.
+
+    Args:
+        text (str): The text.
+
+    Returns:
+        Tuple[str, str]: The sentiment and the language code.
+
+    Raises:
+        ClientError: If a call to AWS Comprehend fails.
+    """
+    language_future = comprehend_executor.submit(
+        comprehend.detect_dominant_language, Text=text
+    )
+    try:
+        sentiment_response = comprehend.detect_sentiment(Text=text, LanguageCode="en")
+    finally:
+        # Wait for the other call even if this one fails, so that a failing
+        # request never leaves work behind on the shared pool.
+        language_response = language_future.result()
+    return (
+        sentiment_response["Sentiment"],
+        language_response["Languages"][0]["LanguageCode"],
+    )
+
+
+def analyze_user_query(text: str) -> dict:
+    """
+    Analyzes the sentiment and dominant language of a user query using AWS
+    Comprehend, and stores the query, sentiment, language, and a timestamp in
+    the DynamoDB table. If SENTIMENT_CACHE_ENABLED is set, a text that has
+    already been analyzed is served from the sentiment cache, and concurrent
+    requests for the same text share a single call to AWS Comprehend.
+
+    Args:
+        text (str): The user query.
+
+    Returns:
+        dict: The user query, sentiment, language, and timestamp.
+
+    Raises:
+        ClientError: If a call to AWS Comprehend or DynamoDB fails.
+    """
+    if SENTIMENT_CACHE_ENABLED:
+        sentiment, language = sentiment_cache.get_or_compute(
+            text, detect_sentiment_and_language
+        )
+    else:
+        sentiment, language = detect_sentiment_and_language(text)
+    logger.debug("Sentiment: %s, language: %s", sentiment, language)
+
+    user_query_id = str(uuid.uuid4())
+    timestamp = datetime.now().isoformat()  # Get the current date and time
+
+    logger.debug("Adding user query to DynamoDB: %s", user_query_id)
+    store_user_queries(
+        [
+            {
+                "id": user_query_id,
+                "user_query": text,
+                "sentiment": sentiment,
+                "language": language,
+                "timestamp": timestamp,
+            }
+        ]
+    )
+
+    return {
+        "user_query": text,
+        "sentiment": sentiment,
+        "language": language,
+        "timestamp": timestamp,
+    }
+
 
 @app.route("/api/v1/user_query", methods=["POST"])
 def post_user_query():
@@ -158,40 +434,219 @@ def post_user_query():
     logger.info("Received user query")
     text = request.json.get("text")
     logger.debug("Received user query: %s", text)
-    sentiment_response = comprehend.detect_sentiment(Text=text, LanguageCode="en")
-    logger.debug("Sentiment response: %s", sentiment_response)
-    sentiment = sentiment_response["Sentiment"]
+    result = analyze_user_query(text)
+    return jsonify({"status": "Success", **result}), 200
 
-    language_response = comprehend.detect_dominant_language(Text=text)
-    logger.debug("Language response: %s", language_response)
-    language = language_response["Languages"][0]["LanguageCode"]
 
-    user_query_id = str(uuid.uuid4())
-    timestamp = datetime.now().isoformat()  # Get the current date and time
+def _batch_results(response: dict) -> dict:
+    """
+    Maps the index of each document of a Comprehend batch call to its result
+    or to its error.
+    """
+    results = {r["Index"]: r for r in response.get("ResultList", [])}
+    for error in response.get("ErrorList", []):
+        results[error["Index"]] = error
+    return results
 
-    logger.debug("Adding user query to DynamoDB: %s", user_query_id)
-    table.put_item(
-        Item={
-            "id": user_query_id,
-            "user_query": text,
+
+def analyze_user_queries(texts: List[str]) -> List[dict]:
+    """
+    Analyzes the sentiment and dominant language of a list of user queries
+    using the batch APIs of AWS Comprehend, in chunks of COMPREHEND_BATCH_SIZE
+    queries, and stores the analyzed queries in the DynamoDB table with a
+    batch writer.
+
+    Queries found in the sentiment cache are not sent to AWS Comprehend, and
+    the results of the others are cached. A query that Comprehend fails to
+    analyze, or whose chunk fails to be analyzed or stored, gets an error
+    result, without failing the other queries.
+
+    Args:
+        texts (List[str]): The user queries.
+
+    Returns:
+        List[dict]: One result per user query, in order, with a status of
+        "Success" and the user query, sentiment, language, and timestamp, or
+        a status of "Error" and the error message.
+    """
+    results = []
+    for start in range(0, len(texts), COMPREHEND_BATCH_SIZE):
+        results.extend(_analyze_chunk(texts[start : start + COMPREHEND_BATCH_SIZE]))
+    return results
+
+
+def _detect_batch(texts: List[str]) -> Tuple[dict, dict]:
+    """
+    Detects the sentiment and dominant language of at most
+    COMPREHEND_BATCH_SIZE texts with the batch APIs of AWS Comprehend, both
+    concurrently.
+
+    Returns:
+        Tuple[dict, dict]: The sentiment and language of the analyzed texts,
+        and the error message of the other ones, by index.
+    """
+    languages_future = comprehend_executor.submit(
+        comprehend.batch_detect_dominant_language, TextList=texts
+    )
+    try:
+        try:
+            sentiments = _batch_results(
+                comprehend.batch_detect_sentiment(TextList=texts, LanguageCode="en")
+            )
+        finally:
+            languages = _batch_results(languages_future.result())
+    except (BotoCoreError, ClientError) as error:
+        # Connection errors and timeouts too, so that only this chunk fails.
+        logger.error("Failed to analyze batch of user queries: %s", error)
+        return {}, {index: str(error) for index in range(len(texts))}
+
+    analyzed, errors = {}, {}
+    for index in range(len(texts)):
+        sentiment = sentiments.get(index, {})
+        language = languages.get(index, {})
+        if "Sentiment" in sentiment and language.get("Languages"):
+            analyzed[index] = (
+                sentiment["Sentiment"],
+                language["Languages"][0]["LanguageCode"],
+            )
+        else:
+            errors[index] = sentiment.get("ErrorMessage") or language.get(
+                "ErrorMessage", "No result"
+            )
+    return analyzed, errors
+
+
+def _analyze_chunk(texts: List[str]) -> List[dict]:
+    """
+    Analyzes and stores a chunk of at most COMPREHEND_BATCH_SIZE user queries
+    for analyze_user_queries. Only the queries missing from the sentiment
+    cache are sent to AWS Comprehend.
+    """
+    analyzed = {}
+    if SENTIMENT_CACHE_ENABLED:
+        for index, text in enumerate(texts):
+            result = sentiment_cache.get(text)
+            if result is not None:
+                analyzed[index] = result
+    missing = [index for index in range(len(texts)) if index not in analyzed]
+    errors = {}
+    if missing:
+        detected, missing_errors = _detect_batch([texts[i] for i in missing])
+        for position, result in detected.items():
+            analyzed[missing[position]] = result
+            if SENTIMENT_CACHE_ENABLED:
+                sentiment_cache.put(texts[missing[position]], result)
+        errors = {missing[pos]: message for pos, message in missing_errors.items()}
+
+    items = {
+        index: {
+            "id": str(uuid.uuid4()),
+            "user_query": texts[index],
             "sentiment": sentiment,
             "language": language,
-            "timestamp": timestamp,
+            "timestamp": datetime.now().isoformat(),
         }
-    )
+        for index, (sentiment, language) in analyzed.items()
+    }
+    try:
+        store_user_queries(list(items.values()))
+    except (BotoCoreError, ClientError) as error:
+        logger.error("Failed to store batch of user queries: %s", error)
+        errors.update((index, str(error)) for index in items)
+
+    results = []
+    for index, text in enumerate(texts):
+        if index in errors:
+            results.append(
+                {"status": "Error", "user_query": text, "error": errors[index]}
+            )
+        else:
+            item = items[index]
+            results.append(
+                {"status": "Success", **{k: v for k, v in item.items() if k != "id"}}
+            )
+    return results
+
+
+@app.route("/api/v1/user_queries:batch", methods=["POST"])
+def post_user_queries_batch():
+    """
+    Handles POST requests to the /api/v1/user_queries:batch endpoint.
+
+    This function receives a list of user queries in the request body,
+    analyzes them with the batch APIs of AWS Comprehend, 25 queries per call,
+    and stores them with DynamoDB batch writes, which takes a few AWS
+    round-trips per 25 queries instead of three per query. A failure on one
+    query does not fail the others. At most MAX_BATCH_TEXTS queries are
+    accepted per request, since the chunks are processed one after another
+    on the request thread.
+
+    The request body should be a JSON object with a 'texts' field containing
+    the user queries. For example:
+    {
+        "texts": ["I love this product!", "I hate this product!"]
+    }
 
-    return (
-        jsonify(
+    The function returns a JSON object with one result per user query, in the
+    order of the request, and the total number of queries. For example:
+    {
+        "results": [
             {
                 "status": "Success",
-                "user_query": text,
-                "sentiment": sentiment,
-                "language": language,
-                "timestamp": timestamp,
+                "user_query": "I love this product!",
+                "sentiment": "POSITIVE",
+                "language": "en",
+                "timestamp": "2022-01-01T12:00:00"
+            },
+            {
+                "status": "Error",
+                "user_query": "I hate this product!",
+                "error": "..."
             }
-        ),
-        200,
-    )
+        ],
+        "total": 2
+    }
+
+    Returns:
+        A tuple containing a Flask Response object and an HTTP status code. The
+        Response object contains a JSON object with the results, or an error
+        message and a 400 status code if 'texts' is not a list of strings or
+        holds more than MAX_BATCH_TEXTS queries.
+    """
+    logger.info("Received batch of user queries")
+    texts = (request.get_json(silent=True) or {}).get("texts")
+    if not isinstance(texts, list) or not all(isinstance(t, str) for t in texts):
+        return jsonify({"error": "'texts' must be a list of strings"}), 400
+    if len(texts) > MAX_BATCH_TEXTS:
+        message = f"'texts' must hold at most {MAX_BATCH_TEXTS} user queries"
+        return jsonify({"error": message}), 400
+
+    results = analyze_user_queries(texts)
+    logger.debug("Processed batch of %d user queries", len(results))
+    return jsonify({"results": results, "total": len(results)}), 200
+
+
+@app.route("/api/v1/sentiment_cache", methods=["GET"])
+def get_sentiment_cache_stats():
+    """
+    Handles GET requests to the /api/v1/sentiment_cache endpoint.
+
+    This function returns the statistics of the sentiment cache: the number
+    of cached results, the cumulative counts of in-process hits, shared tier
+    hits, coalesced requests and misses, and the hit rate. For example:
+    {
+        "size": 120,
+        "hits": 300,
+        "shared_hits": 20,
+        "coalesced": 5,
+        "misses": 175,
+        "hit_rate": 0.65
+    }
+
+    Returns:
+        A tuple containing a Flask Response object and an HTTP status code.
+    """
+    return jsonify(sentiment_cache.stats()), 200
 
 
 @app.route("/api/v1/user_queries", methods=["GET"])
@@ -199,11 +654,21 @@ def get_user_queries():
     """
     Handles GET requests to the /api/v1/user_queries endpoint.
 
-    This function retrieves all user queries from the DynamoDB table and returns
-    them in a JSON object. It also logs these activities.
-
-    The function returns a JSON object with the user queries and the total
-    number of queries. For example:
+    This function retrieves one page of user queries from the DynamoDB table
+    and returns them in a JSON object. It also logs these activities. Each
+    page is read with a single bounded scan, so the size of the response and
+    the read capacity it consumes do not depend on the size of the table.
+
+    The following query string parameters are supported:
+    - limit: The maximum number of user queries of the page, between 1 and
+      MAX_PAGE_SIZE. Defaults to DEFAULT_PAGE_SIZE.
+    - next_token: The next_token returned with the previous page.
+    - fields: A comma-separated list of the fields to return, among id,
+      user_query, sentiment, language and timestamp. Defaults to all fields.
+
+    The function returns a JSON object with the user queries, their number,
+    and the token of the next page, which is null on the last page. For
+    example:
     {
         "user_queries": [
             {
@@ -215,23 +680,221 @@ def get_user_queries():
             },
             ...
         ],
-        "total": 10
+        "total": 10,
+        "next_token": "eyJpZCI6ICIxMjMifQ=="
     }
 
     Returns:
         A tuple containing a Flask Response object and an HTTP status code. The
-        Response object contains a JSON object with the user queries and the
-        total number of queries.
-
-    TODO: Add error handling
+        Response object contains a JSON object with the user queries, or an
+        error message and a 400 status code if a parameter is not valid.
     """
     logger.info("Retrieving user queries")
-    response = table.scan()
-    logger.debug("User queries response: %s", response)
+    try:
+        page_request = parse_page_request(request.args, USER_QUERY_FIELDS)
+    except ValueError as error:
+        return jsonify({"error": str(error)}), 400
+    response = table.scan(**page_request)
     user_queries = response["Items"]
     total = len(user_queries)
     logger.debug("Total user queries: %s", total)
-    return jsonify({"user_queries": user_queries, "total": total}), 200
+    return (
+        jsonify(
+            {
+                "user_queries": user_queries,
+                "total": total,
+                "next_token": encode_token(response.get("LastEvaluatedKey")),
+            }
+        ),
+        200,
+    )
+
+
+def _parse_timestamp(args, name: str, end_of_day: bool = False) -> Optional[str]:
+    """
+    Returns a timestamp parameter of a request in the ISO 8601 format of the
+    stored timestamps, or None if it is not given.
+
+    The stored timestamps are naive local times, so a timestamp with a UTC
+    offset is converted to local time. A date alone means the start of that
+    day, or, with end_of_day, its last microsecond, so that the whole day is
+    included.
+
+    Raises:
+        ValueError: If the parameter is not an ISO 8601 date or date and time.
+    """
+    value = args.get(name)
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError as error:
+        raise ValueError(
+            f"'{name}' must be an ISO 8601 date or date and time"
+        ) from error
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone().replace(tzinfo=None)
+    elif end_of_day and "T" not in value and " " not in value:
+        parsed = datetime.combine(parsed.date(), time.max)
+    return parsed.isoformat()
+
+
+def build_index_query(args) -> dict:
+    """
+    Builds the arguments of a DynamoDB query reading one page of the user
+    queries matching the filters of a request, from the global secondary
+    index of its sentiment or, if none is given, of its language.
+
+    Args:
+        args (Mapping[str, str]): The query string parameters.
+
+    Returns:
+        dict: The arguments of table.query.
+
+    Raises:
+        ValueError: If a parameter is not valid.
+    """
+    sentiment = args.get("sentiment", "").upper()
+    language = args.get("language", "")
+    if sentiment and sentiment not in SENTIMENTS:
+        raise ValueError(f"'sentiment' must be one of {', '.join(SENTIMENTS)}")
+    if not sentiment and not language:
+        raise ValueError("'sentiment' or 'language' is required")
+    start = _parse_timestamp(args, "from")
+    end = _parse_timestamp(args, "to", end_of_day=True)
+    order = args.get("order", "desc")
+    if order not in ("asc", "desc"):
+        raise ValueError("'order' must be 'asc' or 'desc'")
+
+    kwargs = parse_page_request(args, USER_QUERY_FIELDS)
+    attribute, value = ("sentiment", sentiment) if sentiment else ("language", language)
+    condition = Key(attribute).eq(value)
+    if start and end:
+        condition &= Key("timestamp").between(start, end)
+    elif start:
+        condition &= Key("timestamp").gte(start)
+    elif end:
+        condition &= Key("timestamp").lte(end)
+    kwargs.update(
+        IndexName=QUERY_INDEXES[attribute],
+        KeyConditionExpression=condition,
+        ScanIndexForward=order == "asc",
+    )
+    if sentiment and language:
+        # Only one index can be queried, so the language is filtered.
+        kwargs["FilterExpression"] = Attr("language").eq(language)
+    return kwargs
+
+
+@app.route("/api/v1/user_queries:query", methods=["GET"])
+def query_user_queries():
+    """
+    Handles GET requests to the /api/v1/user_queries:query endpoint.
+
+    This function retrieves one page of the user queries of a sentiment or a
+    language, optionally within a time range, and returns them in a JSON
+    object. The user queries are read from a global secondary index sorted by
+    timestamp, so only the matching user queries are read.
+
+    The following query string parameters are supported:
+    - sentiment: POSITIVE, NEGATIVE, NEUTRAL or MIXED.
+    - language: A language code, like en.
+    - from: The earliest timestamp, an ISO 8601 date or date and time.
+    - to: The latest timestamp, an ISO 8601 date, which includes the whole
+      day, or date and time.
+    Timestamps with a UTC offset are converted to the local time of the
+    stored timestamps.
+    - order: 'desc' (default) for the latest user queries first, or 'asc'.
+    - limit, next_token and fields, as for /api/v1/user_queries.
+
+    At least one of sentiment and language is required. If both are given,
+    the sentiment index is queried and the language is filtered, so a page
+    may hold fewer than limit user queries.
+
+    The function returns a JSON object in the same format as
+    /api/v1/user_queries.
+
+    Returns:
+        A tuple containing a Flask Response object and an HTTP status code. The
+        Response object contains a JSON object with the user queries, or an
+        error message and a 400 status code if a parameter is not valid, or a
+        503 status code if the index is missing or still being created.
+    """
+    logger.info("Querying user queries")
+    try:
+        query = build_index_query(request.args)
+    except ValueError as error:
+        return jsonify({"error": str(error)}), 400
+    try:
+        response = table.query(**query)
+    except ClientError as error:
+        # DynamoDB rejects queries of a missing or backfilling index with a
+        # validation error naming the index.
+        index_name = query["IndexName"]
+        code = error.response["Error"]["Code"]
+        if code != "ValidationException" or index_name not in str(error):
+            raise
+        logger.error("Index %s is not available: %s", index_name, error)
+        message = f"The index {index_name} is missing or still being created"
+        return jsonify({"error": message}), 503
+    user_queries = response["Items"]
+    total = len(user_queries)
+    logger.debug("Total matching user queries: %s", total)
+    return (
+        jsonify(
+            {
+                "user_queries": user_queries,
+                "total": total,
+                "next_token": encode_token(response.get("LastEvaluatedKey")),
+            }
+        ),
+        200,
+    )
+
+
+@app.route("/api/v1/user_queries:export", methods=["GET"])
+def export_user_queries():
+    """
+    Handles GET requests to the /api/v1/user_queries:export endpoint.
+
+    This function streams every user query of the DynamoDB table as
+    newline-delimited JSON, one user query per line, in no particular order.
+    The table is read with a parallel scan whose segments are scanned by the
+    export thread pool, and items are written to the client as they are read,
+    so the memory used does not depend on the size of the table.
+
+    The following query string parameters are supported:
+    - segments: The number of segments of the parallel scan, between 1 and
+      EXPORT_MAX_SEGMENTS. Defaults to EXPORT_SEGMENTS.
+    - fields: A comma-separated list of the fields to return, among id,
+      user_query, sentiment, language and timestamp. Defaults to all fields.
+
+    The stream is gzip-compressed if the Accept-Encoding header of the request
+    accepts gzip. If the scan fails once the stream has started, the stream is
+    cut off before its end.
+
+    Returns:
+        A Flask Response object streaming the user queries, or a tuple
+        containing a Flask Response object with an error message and a 400
+        status code if a parameter is not valid.
+    """
+    logger.info("Exporting user queries")
+    try:
+        segments = int(request.args.get("segments", EXPORT_SEGMENTS))
+        if not 1 <= segments <= EXPORT_MAX_SEGMENTS:
+            raise ValueError(f"'segments' must be between 1 and {EXPORT_MAX_SEGMENTS}")
+        projection = parse_projection(request.args.get("fields", ""), USER_QUERY_FIELDS)
+    except ValueError as error:
+        return jsonify({"error": str(error)}), 400
+
+    chunks = ndjson_chunks(
+        parallel_scan(table, export_executor, segments, EXPORT_MAX_PAGES, **projection)
+    )
+    headers = {"Vary": "Accept-Encoding"}
+    if request.accept_encodings["gzip"]:
+        chunks = gzip_chunks(chunks)
+        headers["Content-Encoding"] = "gzip"
+    return Response(chunks, mimetype="application/x-ndjson", headers=headers)
 
 
 @app.route("/api/v1/user_queries/<user_query_id>", methods=["GET"])
@@ -266,11 +929,14 @@ def get_user_query(user_query_id):
     logger.info("Retrieving user query")
     logger.debug("Retrieving user query: %s", user_query_id)
     response = table.get_item(Key={"id": user_query_id})
-    logger.debug("User query response: %s", response)
+    logger.debug("User query found: %s", "Item" in response)
     if "Item" not in response:
         return jsonify({"error": "User query not found"}), 404
     return jsonify(response["Item"]), 200
 
 
 if __name__ == "__main__":
+    # Exit on SIGTERM, as sent by Kubernetes, so that the write-behind queue
+    # is drained before the process stops.
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
     app.run(host="0.0.0.0", debug=DEBUG)
@@ -0,0 +1,316 @@
+"""
+This module contains a cache of the sentiment and dominant language detected
+by AWS Comprehend for the user queries.
+
+Users often send the same text again, so the results are cached by the hash of
+the normalized text: Unicode-normalized, case-folded and with whitespace
+collapsed. The cache has two tiers:
+
+1. An in-process tier, with a time to live and least recently used eviction.
+2. An optional shared tier, a DynamoDB table with a time to live attribute,
+   so that results are shared between the replicas of the API and survive
+   restarts. Failures of the shared tier are logged and treated as misses.
+
+Concurrent lookups of the same text are coalesced: only the first one calls
+Comprehend, and the others wait for its result.
+
+Classes:
+    SentimentCache: Two-tier cache of Comprehend results with single-flight
+        coalescing.
+    DynamoDBCacheTier: Shared tier of the cache stored in a DynamoDB table.
+
+Functions:
+    normalize_text: Normalizes a text for caching.
+    cache_key: Returns the cache key of a text.
+"""
+
+import os
+import re
+import time
+import hashlib
+import logging
+import threading
+import unicodedata
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from botocore.exceptions import BotoCoreError, ClientError
+from logger_config import setup_logger
+
+LOGGING_LEVEL = (
+    int(os.getenv("LOGGING_LEVEL")) if os.getenv("LOGGING_LEVEL") else logging.DEBUG
+)
+
+script_name = os.path.splitext(os.path.basename(__file__))[0]
+
+logger = setup_logger(script_name, LOGGING_LEVEL)
+
+WHITESPACE_PATTERN = re.compile(r"\s+")
+
+# Sentiment and dominant language of a text
+Result = Tuple[str, str]
+
+
+def normalize_text(text: str) -> str:
+    """
+    Normalizes a text for caching: Unicode NFKC normalization, case folding
+    and collapsed whitespace.
+
+    Args:
+        text (str): The text.
+
+    Returns:
+        str: The normalized text.
+    """
+    text = unicodedata.normalize("NFKC", text).casefold()
+    return WHITESPACE_PATTERN.sub(" ", text).strip()
+
+
+def cache_key(text: str) -> str:
+    """
+    Returns the cache key of a text, the SHA-256 hash of the normalized text.
+
+    Args:
+        text (str): The text.
+
+    Returns:
+        str: The hexadecimal cache key.
+    """
+    return hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+
+
+class DynamoDBCacheTier:
+    """
+    Shared tier of the cache, stored in a DynamoDB table whose partition key
+    is "text_hash" and whose time to live attribute is "expires_at".
+    """
+
+    def __init__(self, table: Any, ttl_seconds: float) -> None:
+        """
+        Args:
+            table (Any): The DynamoDB Table resource.
+            ttl_seconds (float): Number of seconds a result stays cached.
+        """
+        self.table = table
+        self.ttl_seconds = ttl_seconds
+
+    def get(self, key: str) -> Optional[Result]:
+        """
+        Returns the cached result of a key, or None if it is missing or
+        expired.
+        """
+        item = self.table.get_item(Key={"text_hash": key}).get("Item")
+        # DynamoDB deletes expired items lazily, so they are filtered here.
+        if item is None or item["expires_at"] <= time.time():
+            return None
+        return item["sentiment"], item["language"]
+
+    def put(self, key: str, result: Result) -> None:
+        """
+        Caches the result of a key.
+        """
+        sentiment, language = result
+        self.table.put_item(
+            Item={
+                "text_hash": key,
+                "sentiment": sentiment,
+                "language": language,
+                "expires_at": int(time.time() + self.ttl_seconds),
+            }
+        )
+
+
+class SentimentCache:
+    """
+    Thread-safe two-tier cache of Comprehend results keyed by the hash of the
+    normalized text, with a time to live, least recently used eviction and
+    single-flight coalescing of concurrent misses.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 10000,
+        ttl_seconds: float = 86400,
+        shared_tier: Optional[DynamoDBCacheTier] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        """
+        Args:
+            max_entries (int): Maximum number of results in the in-process
+                tier. 0 disables the in-process tier.
+            ttl_seconds (float): Number of seconds a result stays cached.
+            shared_tier (Optional[DynamoDBCacheTier]): Optional shared tier.
+            clock (Callable[[], float]): Source of the current time in seconds.
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.shared_tier = shared_tier
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, Tuple[Result, float]]" = OrderedDict()
+        self._in_flight: Dict[str, Future] = {}
+        self.hits = 0
+        self.shared_hits = 0
+        self.coalesced = 0
+        self.misses = 0
+
+    def _get_local(self, key: str) -> Optional[Result]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if self._clock() - entry[1] > self.ttl_seconds:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry[0]
+
+    def _put_local(self, key: str, result: Result) -> None:
+        if self.max_entries <= 0:
+            return
+        self._entries[key] = (result, self._clock())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _get_shared(self, key: str) -> Optional[Result]:
+        if self.shared_tier is None:
+            return None
+        try:
+            return self.shared_tier.get(key)
+        except (BotoCoreError, ClientError) as e:
+            logger.warning("Failed to read the shared sentiment cache: %s", e)
+            return None
+
+    def _put_shared(self, key: str, result: Result) -> None:
+        if self.shared_tier is None:
+            return
+        try:
+            self.shared_tier.put(key, result)
+        except (BotoCoreError, ClientError) as e:
+            logger.warning("Failed to write the shared sentiment cache: %s", e)
+
+    def get(self, text: str) -> Optional[Result]:
+        """
+        Returns the cached result of a text, from the in-process tier or the
+        shared tier, without computing it on a miss.
+
+        Args:
+            text (str): The text.
+
+        Returns:
+            Optional[Result]: The sentiment and language, or None on a miss.
+        """
+        key = cache_key(text)
+        with self._lock:
+            result = self._get_local(key)
+            if result is not None:
+                self.hits += 1
+                return result
+        result = self._get_shared(key)
+        with self._lock:
+            if result is None:
+                self.misses += 1
+                return None
+            self.shared_hits += 1
+            self._put_local(key, result)
+        return result
+
+    def put(self, text: str, result: Result) -> None:
+        """
+        Caches the result of a text in both tiers.
+
+        Args:
+            text (str): The text.
+            result (Result): The sentiment and language.
+        """
+        key = cache_key(text)
+        with self._lock:
+            self._put_local(key, result)
+        self._put_shared(key, result)
+
+    def get_or_compute(self, text: str, compute: Callable[[str], Result]) -> Result:
+        """
+        Returns the cached result of a text, or computes and caches it on a
+        miss. If the result of the same text is already being computed by
+        another thread, waits for that result instead of computing it again.
+
+        Args:
+            text (str): The text.
+            compute (Callable[[str], Result]): Computes the result of a text.
+
+        Returns:
+            Result: The sentiment and language.
+
+        Raises:
+            Exception: The exception raised by compute, also raised to the
+                threads waiting for its result.
+        """
+        key = cache_key(text)
+        with self._lock:
+            result = self._get_local(key)
+            if result is not None:
+                self.hits += 1
+                return result
+            future = self._in_flight.get(key)
+            leader = future is None
+            if leader:
+                future = self._in_flight[key] = Future()
+            else:
+                self.coalesced += 1
+        if not leader:
+            return future.result()
+
+        try:
+            result = self._get_shared(key)
+            shared_hit = result is not None
+            if not shared_hit:
+                result = compute(text)
+                self._put_shared(key, result)
+        except BaseException as e:
+            with self._lock:
+                del self._in_flight[key]
+                self.misses += 1
+            future.set_exception(e)
+            raise
+        with self._lock:
+            del self._in_flight[key]
+            if shared_hit:
+                self.shared_hits += 1
+            else:
+                self.misses += 1
+            self._put_local(key, result)
+        future.set_result(result)
+        return result
+
+    def clear(self) -> None:
+        """
+        Removes every result of the in-process tier.
+        """
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Returns the number of cached results, the cumulative counts of hits
+        of each tier, of coalesced lookups and of misses, and the hit rate,
+        the share of lookups that did not call Comprehend.
+
+        Returns:
+            Dict[str, Any]: Size, counts and hit rate.
+        """
+        with self._lock:
+            lookups = self.hits + self.shared_hits + self.coalesced + self.misses
+            served = lookups - self.misses
+            return {
+                "size": len(self._entries),
+                "hits": self.hits,
+                "shared_hits": self.shared_hits,
+                "coalesced": self.coalesced,
+                "misses": self.misses,
+                "hit_rate": served / lookups if lookups else 0.0,
+            }
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
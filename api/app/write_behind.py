@@ -0,0 +1,267 @@
+"""
+This module contains the write-behind writer of the sentiment analysis API,
+which stores the analyzed user queries in DynamoDB in the background, so that
+the responses of the API do not wait for DynamoDB.
+
+Items are put on a bounded in-memory queue. A worker thread, started on the
+first submission, writes them with the batch writer of the table as soon as
+batch_size items are queued, or once flush_interval seconds have passed since
+the oldest queued item was submitted. A batch that fails to be written is
+retried with exponential backoff, and, if it still fails, appended to a local
+spill file, one JSON object per line, from which it can be replayed. Other
+errors, like an item the batch writer cannot serialize, spill the batch
+without retries, so that the worker keeps running while items are submitted.
+
+On shutdown, the writer stops accepting items and drains the queue until a
+deadline, which must be shorter than the grace period of the process. Once it
+passes, the remaining items are spilled at once, without trying DynamoDB, and
+a retry waiting for its backoff is given up and its batch spilled.
+
+Classes:
+    WriteBehindWriter: Bounded background queue writing items in batches.
+"""
+
+import os
+import json
+import time
+import logging
+import threading
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+
+from botocore.exceptions import BotoCoreError, ClientError
+from logger_config import setup_logger
+
+LOGGING_LEVEL = (
+    int(os.getenv("LOGGING_LEVEL")) if os.getenv("LOGGING_LEVEL") else logging.DEBUG
+)
+
+script_name = os.path.splitext(os.path.basename(__file__))[0]
+
+logger = setup_logger(script_name, LOGGING_LEVEL)
+
+
+class WriteBehindWriter:
+    """
+    Bounded background queue that writes items to a DynamoDB table in
+    batches, retrying failed batches with exponential backoff and spilling
+    them to a local file when the retries are exhausted.
+    """
+
+    def __init__(
+        self,
+        table: Any,
+        batch_size: int = 25,
+        flush_interval: float = 1,
+        max_queue: int = 10000,
+        max_retries: int = 5,
+        backoff_seconds: float = 0.5,
+        spill_path: str = "spill/user_queries.ndjson",
+    ) -> None:
+        """
+        Args:
+            table (Any): The DynamoDB Table resource.
+            batch_size (int): Maximum number of items per batch.
+            flush_interval (float): Maximum number of seconds an item waits
+                in the queue before its batch is written.
+            max_queue (int): Maximum number of queued items.
+            max_retries (int): Number of retries of a failed batch.
+            backoff_seconds (float): Delay before the first retry, doubled
+                for each following retry.
+            spill_path (str): File the batches that could not be written are
+                appended to.
+        """
+        self.table = table
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_queue = max_queue
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.spill_path = spill_path
+        self._queue: Deque[Dict[str, Any]] = deque()
+        self._oldest_at = 0.0
+        self._condition = threading.Condition()
+        self._stopping = False
+        self._deadline: Optional[float] = None
+        self._spill_lock = threading.Lock()
+        self._worker: Optional[threading.Thread] = None
+        self._counts = {
+            "submitted": 0,
+            "rejected": 0,
+            "written": 0,
+            "batches": 0,
+            "retries": 0,
+            "spilled": 0,
+            "lost": 0,
+        }
+
+    def submit(self, item: Dict[str, Any]) -> bool:
+        """
+        Queues an item to be written with the next batch.
+
+        Args:
+            item (Dict[str, Any]): The item.
+
+        Returns:
+            bool: True if the item was queued, False if the queue is full or
+            the writer is shut down, in which case the caller must write the
+            item itself.
+        """
+        with self._condition:
+            if self._stopping or len(self._queue) >= self.max_queue:
+                self._counts["rejected"] += 1
+                return False
+            if self._worker is None:
+                self._worker = threading.Thread(
+                    target=self._run, name="write-behind", daemon=True
+                )
+                self._worker.start()
+
+            if not self._queue:
+                self._oldest_at = time.monotonic()
+            self._queue.append(item)
+            self._counts["submitted"] += 1
+            # Wakes the worker to start the flush timer or write a full batch.
+            self._condition.notify()
+            return True
+
+    def _next_batch(self) -> List[Dict[str, Any]]:
+        with self._condition:
+            while not self._stopping:
+                if len(self._queue) >= self.batch_size:
+                    break
+                if self._queue:
+                    remaining = self.flush_interval - (
+                        time.monotonic() - self._oldest_at
+                    )
+                    if remaining <= 0:
+                        break
+                    self._condition.wait(remaining)
+                else:
+                    self._condition.wait()
+            batch = [
+                self._queue.popleft()
+                for _ in range(min(self.batch_size, len(self._queue)))
+            ]
+            if self._queue:
+                self._oldest_at = time.monotonic()
+            return batch
+
+    def _take_all(self) -> List[Dict[str, Any]]:
+        with self._condition:
+            items = list(self._queue)
+            self._queue.clear()
+            return items
+
+    def _expired(self) -> bool:
+        return self._deadline is not None and time.monotonic() >= self._deadline
+
+    def _backoff(self, seconds: float) -> bool:
+        # Waits on the condition rather than sleeping, so that the wait ends
+        # at the shutdown deadline, even if shutdown is called meanwhile.
+        # Returns False if the deadline has passed.
+        end = time.monotonic() + seconds
+        with self._condition:
+            while True:
+                until = end if self._deadline is None else min(end, self._deadline)
+                remaining = until - time.monotonic()
+                if remaining <= 0:
+                    return not self._expired()
+                self._condition.wait(remaining)
+
+    def _write(self, batch: List[Dict[str, Any]]) -> None:
+        for attempt in range(self.max_retries + 1):
+            try:
+                # Items already written by a failed attempt are overwritten
+                # with the same content.
+                with self.table.batch_writer() as writer:
+                    for item in batch:
+                        writer.put_item(Item=item)
+                with self._condition:
+                    self._counts["written"] += len(batch)
+                    self._counts["batches"] += 1
+                return
+            except (BotoCoreError, ClientError) as e:
+                logger.warning(
+                    "Failed to write batch of %d items (attempt %d): %s",
+                    len(batch),
+                    attempt + 1,
+                    e,
+                )
+                if attempt < self.max_retries:
+                    if not self._backoff(self.backoff_seconds * 2**attempt):
+                        break
+                    with self._condition:
+                        self._counts["retries"] += 1
+        self._spill(batch)
+
+    def _spill(self, batch: List[Dict[str, Any]]) -> None:
+        logger.error("Spilling batch of %d items to %s", len(batch), self.spill_path)
+        try:
+            directory = os.path.dirname(self.spill_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            # The worker and shutdown may spill at the same time.
+            with self._spill_lock, open(self.spill_path, "a", encoding="utf-8") as file:
+                for item in batch:
+                    file.write(json.dumps(item, default=str) + "\n")
+        except OSError as e:
+            logger.critical("Lost batch of %d items: %s", len(batch), e)
+            with self._condition:
+                self._counts["lost"] += len(batch)
+            return
+        with self._condition:
+            self._counts["spilled"] += len(batch)
+
+    def _run(self) -> None:
+        while True:
+            batch = self._next_batch()
+            if batch and self._expired():
+                self._spill(batch + self._take_all())
+            elif batch:
+                try:
+                    self._write(batch)
+                except Exception as e:  # pylint: disable=broad-except
+                    logger.error("Failed to write batch of %d items: %r", len(batch), e)
+                    self._spill(batch)
+            with self._condition:
+                if self._stopping and not self._queue:
+                    return
+
+    def shutdown(self, timeout: Optional[float] = None) -> None:
+        """
+        Stops accepting items, writes the queued items and waits for the
+        worker thread to finish. Once the timeout has passed, the items not
+        written yet are spilled instead.
+
+        Args:
+            timeout (Optional[float]): Number of seconds the queue is drained
+                for, or None to drain it whatever the time it takes.
+        """
+        with self._condition:
+            self._stopping = True
+            if timeout is not None:
+                self._deadline = time.monotonic() + timeout
+            self._condition.notify_all()
+            worker = self._worker
+        if worker is not None:
+            worker.join(timeout)
+            if worker.is_alive():
+                # The worker is still waiting for DynamoDB: the queued items
+                # are spilled here, before the process is killed.
+                items = self._take_all()
+                if items:
+                    self._spill(items)
+        logger.info("Write-behind writer shut down: %s", self.stats())
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Returns the number of queued items and the cumulative counts of
+        submitted, rejected, written, spilled and lost items, of written
+        batches and of retries.
+
+        Returns:
+            Dict[str, int]: Queue size and counts.
+        """
+        with self._condition:
+            return {"queued": len(self._queue), **self._counts}
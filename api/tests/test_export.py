@@ -0,0 +1,122 @@
+"""
+This module contains unit tests for the export module of the sentiment
+analysis API. It tests that a parallel scan yields the items of every page of
+every segment, that it raises the error of a failed segment, that it stops
+its workers when the consumer stops reading, and that items are encoded as
+newline-delimited JSON and gzip-compressed.
+"""
+
+import gzip
+import json
+import time
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from botocore.exceptions import ClientError
+from api.app.export import gzip_chunks, ndjson_chunks, parallel_scan
+
+
+class FakeTable:
+    """
+    Stand-in for a DynamoDB Table resource whose scan returns, for each
+    segment, `pages` pages of `page_size` items, and records its calls.
+    """
+
+    def __init__(self, pages=3, page_size=2, failing_segment=None):
+        self.pages = pages
+        self.page_size = page_size
+        self.failing_segment = failing_segment
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def scan(self, **kwargs):
+        """Returns the page of the segment following ExclusiveStartKey."""
+        with self.lock:
+            self.calls.append(kwargs)
+        segment = kwargs["Segment"]
+        if segment == self.failing_segment:
+            raise ClientError({"Error": {"Code": "InternalServerError"}}, "Scan")
+        page = kwargs.get("ExclusiveStartKey", {}).get("page", 0)
+        response = {
+            "Items": [
+                {"id": f"{segment}-{page}-{i}", "sentiment": "POSITIVE"}
+                for i in range(self.page_size)
+            ]
+        }
+        if page + 1 < self.pages:
+            response["LastEvaluatedKey"] = {"page": page + 1}
+        return response
+
+
+class TestExport(unittest.TestCase):
+    """
+    This class contains unit tests for the parallel scan and the encoding of
+    the exported items.
+    """
+
+    def setUp(self):
+        self.executor = ThreadPoolExecutor(max_workers=4)
+
+    def tearDown(self):
+        self.executor.shutdown(wait=True)
+
+    def test_parallel_scan_yields_every_item(self):
+        """
+        Tests that every page of every segment is scanned with the segment
+        arguments and the additional scan arguments, and yielded once.
+        """
+        table = FakeTable()
+        items = list(
+            parallel_scan(table, self.executor, 4, 2, ProjectionExpression="#f0")
+        )
+        self.assertEqual(len(items), 4 * 3 * 2)
+        self.assertEqual(len({item["id"] for item in items}), len(items))
+        self.assertEqual(len(table.calls), 4 * 3)
+        for call in table.calls:
+            self.assertEqual(call["TotalSegments"], 4)
+            self.assertEqual(call["ProjectionExpression"], "#f0")
+
+    def test_parallel_scan_raises_segment_error(self):
+        """
+        Tests that the error of a failed segment is raised to the consumer.
+        """
+        table = FakeTable(failing_segment=2)
+        with self.assertRaises(ClientError):
+            list(parallel_scan(table, self.executor, 4))
+
+    def test_parallel_scan_stops_when_consumer_stops(self):
+        """
+        Tests that the workers stop scanning once the consumer closes the
+        scan, instead of reading the rest of the table.
+        """
+        table = FakeTable(pages=1000, page_size=1)
+        items = parallel_scan(table, self.executor, 2, 1)
+        next(items)
+        items.close()
+        time.sleep(0.3)
+        calls = len(table.calls)
+        time.sleep(0.3)
+        self.assertEqual(len(table.calls), calls)
+        self.assertLess(calls, 20)
+
+    def test_ndjson_chunks(self):
+        """
+        Tests that items are encoded one per line and grouped in chunks.
+        """
+        items = [{"id": str(i), "user_query": "x" * 10} for i in range(100)]
+        chunks = list(ndjson_chunks(items, chunk_size=100))
+        self.assertGreater(len(chunks), 1)
+        lines = b"".join(chunks).decode("utf-8").splitlines()
+        self.assertEqual([json.loads(line) for line in lines], items)
+
+    def test_gzip_chunks(self):
+        """
+        Tests that the compressed chunks form a gzip stream of the input.
+        """
+        chunks = [b'{"id": "1"}\n', b'{"id": "2"}\n']
+        compressed = b"".join(gzip_chunks(chunks))
+        self.assertEqual(gzip.decompress(compressed), b"".join(chunks))
+
+
+if __name__ == "__main__":
+    unittest.main()
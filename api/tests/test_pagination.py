@@ -0,0 +1,88 @@
+"""
+This module contains unit tests for the pagination module of the sentiment
+analysis API. It tests that tokens round-trip, that invalid tokens and
+parameters are rejected, and that selected fields are read with aliased
+attribute names.
+"""
+
+import unittest
+from api.app.pagination import (
+    MAX_PAGE_SIZE,
+    DEFAULT_PAGE_SIZE,
+    decode_token,
+    encode_token,
+    parse_page_request,
+)
+
+FIELDS = ("id", "user_query", "sentiment", "language", "timestamp")
+
+
+class TestPagination(unittest.TestCase):
+    """
+    This class contains unit tests for the token encoding and the parsing of
+    the page parameters.
+    """
+
+    def test_token_round_trip(self):
+        """
+        Tests that a decoded token is the key it was encoded from, and that
+        there is no token on the last page.
+        """
+        key = {"id": "123", "sentiment": "POSITIVE"}
+        self.assertEqual(decode_token(encode_token(key)), key)
+        self.assertIsNone(encode_token(None))
+        self.assertIsNone(encode_token({}))
+
+    def test_decode_invalid_token(self):
+        """
+        Tests that tokens which are not base64, not JSON, or not a key with
+        string values are rejected.
+        """
+        for token in ("%%%", "bm90IGpzb24=", encode_token({"id": 1}), "WzFd"):
+            with self.assertRaises(ValueError, msg=token):
+                decode_token(token)
+
+    def test_parse_default_page(self):
+        """
+        Tests that a request without parameters reads one page of the default
+        size.
+        """
+        self.assertEqual(parse_page_request({}, FIELDS), {"Limit": DEFAULT_PAGE_SIZE})
+
+    def test_parse_page_with_fields(self):
+        """
+        Tests that the selected fields are deduplicated and read with aliased
+        attribute names, and that a token becomes the ExclusiveStartKey.
+        """
+        args = {
+            "limit": str(MAX_PAGE_SIZE),
+            "next_token": encode_token({"id": "123"}),
+            "fields": "id, timestamp,id",
+        }
+        self.assertEqual(
+            parse_page_request(args, FIELDS),
+            {
+                "Limit": MAX_PAGE_SIZE,
+                "ExclusiveStartKey": {"id": "123"},
+                "ProjectionExpression": "#f0, #f1",
+                "ExpressionAttributeNames": {"#f0": "id", "#f1": "timestamp"},
+            },
+        )
+
+    def test_parse_invalid_parameters(self):
+        """
+        Tests that limits out of range or not integers, and unknown fields,
+        are rejected.
+        """
+        for args in (
+            {"limit": "0"},
+            {"limit": str(MAX_PAGE_SIZE + 1)},
+            {"limit": "ten"},
+            {"fields": "id,secret"},
+        ):
+            with self.assertRaises(ValueError, msg=str(args)):
+                parse_page_request(args, FIELDS)
+
+
+if __name__ == "__main__":
+    unittest.main()
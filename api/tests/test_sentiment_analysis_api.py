@@ -3,12 +3,21 @@ This module contains unit tests for the sentiment_analysis_api module.
 It tests the API endpoints to ensure they are working as expected.
 """
 
+import os
+import gzip
+import json
+import time
+import threading
 import unittest
-from unittest.mock import patch
+from unittest.mock import MagicMock, patch
+from boto3.dynamodb.conditions import Attr, Key
+from botocore.exceptions import ClientError, EndpointConnectionError
 import api.app.sentiment_analysis_api as api
 
 
-class TestSentimentAnalysisAPI(unittest.TestCase):
+class TestSentimentAnalysisAPI(
+    unittest.TestCase
+):  # pylint: disable=too-many-public-methods
     """
     This class contains unit tests for each function in the
     sentiment_analysis_api module of the API application. It sets up the
@@ -19,6 +28,7 @@ class TestSentimentAnalysisAPI(unittest.TestCase):
     def setUp(self):
         self.app = api.app
         self.client = self.app.test_client()
+        api.sentiment_cache.clear()
 
     @patch("api.app.sentiment_analysis_api.comprehend.detect_sentiment")
     @patch("api.app.sentiment_analysis_api.comprehend.detect_dominant_language")
@@ -46,6 +56,250 @@ class TestSentimentAnalysisAPI(unittest.TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertEqual(response.get_json()["status"], "Success")
 
+    @patch("api.app.sentiment_analysis_api.comprehend.detect_sentiment")
+    @patch("api.app.sentiment_analysis_api.comprehend.detect_dominant_language")
+    @patch("api.app.sentiment_analysis_api.table.put_item")
+    def test_post_user_query_calls_comprehend_concurrently(
+        self,
+        mock_put_item,
+        mock_detect_dominant_language,  # noqa
+        mock_detect_sentiment,
+    ):
+        """
+        Tests the post_user_query function from the sentiment_analysis_api
+        module. It checks if the sentiment and the language are detected
+        concurrently: each mock waits for the other one to be called, which
+        only succeeds if both calls are in flight at the same time.
+        """
+        barrier = threading.Barrier(2, timeout=5)
+
+        def detect_sentiment(**_):
+            barrier.wait()
+            return {"Sentiment": "NEGATIVE"}
+
+        def detect_dominant_language(**_):
+            barrier.wait()
+            return {"Languages": [{"LanguageCode": "fr"}]}
+
+        mock_detect_sentiment.side_effect = detect_sentiment
+        mock_detect_dominant_language.side_effect = detect_dominant_language
+        response = self.client.post("/api/v1/user_query", json={"text": "Trop petit"})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json()["sentiment"], "NEGATIVE")
+        self.assertEqual(response.get_json()["language"], "fr")
+        mock_put_item.assert_called_once()
+
+    @patch("api.app.sentiment_analysis_api.comprehend.detect_sentiment")
+    @patch("api.app.sentiment_analysis_api.comprehend.detect_dominant_language")
+    @patch("api.app.sentiment_analysis_api.table.put_item")
+    def test_post_user_query_cached(
+        self,
+        mock_put_item,
+        mock_detect_dominant_language,  # noqa
+        mock_detect_sentiment,
+    ):
+        """
+        Tests the post_user_query function from the sentiment_analysis_api
+        module. It checks if a repeated text, differing only in case and
+        whitespace, is analyzed by AWS Comprehend once, while every query is
+        still stored, and if the hit is counted in the cache statistics.
+        """
+        mock_detect_sentiment.return_value = {"Sentiment": "POSITIVE"}
+        mock_detect_dominant_language.return_value = {
+            "Languages": [{"LanguageCode": "en"}]
+        }
+        hits = api.sentiment_cache.stats()["hits"]
+        for text in ["Love these shoes", "  love THESE shoes "]:
+            response = self.client.post("/api/v1/user_query", json={"text": text})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.get_json()["sentiment"], "POSITIVE")
+
+        mock_detect_sentiment.assert_called_once()
+        mock_detect_dominant_language.assert_called_once()
+        self.assertEqual(mock_put_item.call_count, 2)
+        stats = self.client.get("/api/v1/sentiment_cache").get_json()
+        self.assertEqual(stats["hits"], hits + 1)
+
+    @patch("api.app.sentiment_analysis_api.table.put_item")
+    def test_store_user_queries_write_behind(self, mock_put_item):
+        """
+        Tests the store_user_queries function from the sentiment_analysis_api
+        module. It checks if, in write-behind mode, user queries are queued
+        instead of being written, and are written directly when the queue
+        rejects them.
+        """
+        writer = MagicMock()
+        writer.submit.side_effect = [True, False]
+        with patch("api.app.sentiment_analysis_api.write_behind", writer):
+            api.store_user_queries([{"id": "1"}])
+            mock_put_item.assert_not_called()
+            api.store_user_queries([{"id": "2"}])
+        mock_put_item.assert_called_once_with(Item={"id": "2"})
+
+    @patch("api.app.sentiment_analysis_api.comprehend.detect_sentiment")
+    @patch("api.app.sentiment_analysis_api.comprehend.detect_dominant_language")
+    def test_analyze_user_query_error(
+        self, mock_detect_dominant_language, mock_detect_sentiment
+    ):
+        """
+        Tests the analyze_user_query function from the sentiment_analysis_api
+        module. It checks if an error of the concurrent Comprehend call is
+        raised to the caller, as when the calls were made one after the other.
+        """
+        mock_detect_sentiment.return_value = {"Sentiment": "POSITIVE"}
+        mock_detect_dominant_language.side_effect = ClientError(
+            {"Error": {"Code": "ThrottlingException", "Message": "Rate exceeded"}},
+            "DetectDominantLanguage",
+        )
+        with self.assertRaises(ClientError):
+            api.analyze_user_query("I love this product!")
+
+    @patch("api.app.sentiment_analysis_api.comprehend.batch_detect_sentiment")
+    @patch("api.app.sentiment_analysis_api.comprehend.batch_detect_dominant_language")
+    @patch("api.app.sentiment_analysis_api.table.batch_writer")
+    def test_post_user_queries_batch(
+        self,
+        mock_batch_writer,
+        mock_batch_detect_dominant_language,  # noqa
+        mock_batch_detect_sentiment,
+    ):
+        """
+        Tests the post_user_queries_batch function from the
+        sentiment_analysis_api module. It checks if the user queries are
+        analyzed in chunks of 25 with the Comprehend batch APIs, if the
+        analyzed queries are stored with the batch writer, and if a query that
+        Comprehend fails to analyze gets an error result without failing the
+        others.
+        """
+
+        def detect_sentiment(TextList, LanguageCode):  # pylint: disable=invalid-name
+            self.assertEqual(LanguageCode, "en")
+            return {
+                "ResultList": [
+                    {"Index": i, "Sentiment": "POSITIVE"}
+                    for i, text in enumerate(TextList)
+                    if text
+                ],
+                "ErrorList": [
+                    {"Index": i, "ErrorCode": "INVALID", "ErrorMessage": "Empty"}
+                    for i, text in enumerate(TextList)
+                    if not text
+                ],
+            }
+
+        mock_batch_detect_sentiment.side_effect = detect_sentiment
+        mock_batch_detect_dominant_language.side_effect = lambda TextList: {
+            "ResultList": [
+                {"Index": i, "Languages": [{"LanguageCode": "en"}]}
+                for i in range(len(TextList))
+            ],
+            "ErrorList": [],
+        }
+        texts = [f"Great shoes {i}" for i in range(29)] + [""]
+
+        response = self.client.post("/api/v1/user_queries:batch", json={"texts": texts})
+
+        self.assertEqual(response.status_code, 200)
+        results = response.get_json()["results"]
+        self.assertEqual(response.get_json()["total"], 30)
+        self.assertEqual([r["user_query"] for r in results], texts)
+        self.assertEqual([r["status"] for r in results], ["Success"] * 29 + ["Error"])
+        self.assertEqual(results[-1]["error"], "Empty")
+        self.assertEqual(
+            [len(c.kwargs["TextList"]) for c in mock_batch_detect_sentiment.mock_calls],
+            [25, 5],
+        )
+        batch = mock_batch_writer.return_value.__enter__.return_value
+        self.assertEqual(batch.put_item.call_count, 29)
+
+    @patch("api.app.sentiment_analysis_api.comprehend.batch_detect_sentiment")
+    @patch("api.app.sentiment_analysis_api.comprehend.batch_detect_dominant_language")
+    def test_post_user_queries_batch_comprehend_error(
+        self, mock_batch_detect_dominant_language, mock_batch_detect_sentiment
+    ):
+        """
+        Tests the post_user_queries_batch function from the
+        sentiment_analysis_api module. It checks if every query of a chunk
+        gets an error result when the Comprehend batch call fails.
+        """
+        mock_batch_detect_sentiment.side_effect = ClientError(
+            {"Error": {"Code": "ThrottlingException", "Message": "Rate exceeded"}},
+            "BatchDetectSentiment",
+        )
+        mock_batch_detect_dominant_language.return_value = {
+            "ResultList": [],
+            "ErrorList": [],
+        }
+        response = self.client.post(
+            "/api/v1/user_queries:batch", json={"texts": ["Great shoes", "Too small"]}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [r["status"] for r in response.get_json()["results"]], ["Error", "Error"]
+        )
+
+    @patch("api.app.sentiment_analysis_api.comprehend.batch_detect_sentiment")
+    @patch("api.app.sentiment_analysis_api.comprehend.batch_detect_dominant_language")
+    @patch("api.app.sentiment_analysis_api.table.batch_writer")
+    def test_post_user_queries_batch_connection_error(
+        self,
+        mock_batch_writer,
+        mock_batch_detect_dominant_language,
+        mock_batch_detect_sentiment,
+    ):
+        """
+        Tests the post_user_queries_batch function from the
+        sentiment_analysis_api module. It checks if a connection error on the
+        Comprehend call of the second chunk only fails the queries of that
+        chunk, and the queries of the first chunk are reported as stored.
+        """
+        texts = [f"query {i}" for i in range(30)]
+        mock_batch_detect_sentiment.side_effect = [
+            {
+                "ResultList": [{"Index": i, "Sentiment": "NEUTRAL"} for i in range(25)],
+                "ErrorList": [],
+            },
+            EndpointConnectionError(endpoint_url="https://comprehend"),
+        ]
+        mock_batch_detect_dominant_language.side_effect = lambda TextList: {
+            "ResultList": [
+                {"Index": i, "Languages": [{"LanguageCode": "en"}]}
+                for i in range(len(TextList))
+            ],
+            "ErrorList": [],
+        }
+        response = self.client.post("/api/v1/user_queries:batch", json={"texts": texts})
+        self.assertEqual(response.status_code, 200)
+        statuses = [r["status"] for r in response.get_json()["results"]]
+        self.assertEqual(statuses, ["Success"] * 25 + ["Error"] * 5)
+        batch = mock_batch_writer.return_value.__enter__.return_value
+        self.assertEqual(batch.put_item.call_count, 25)
+
+    def test_post_user_queries_batch_too_many_texts(self):
+        """
+        Tests the post_user_queries_batch function from the
+        sentiment_analysis_api module. It checks if the function returns a
+        status code of 400 when the request holds more than MAX_BATCH_TEXTS
+        queries.
+        """
+        with patch.object(api, "MAX_BATCH_TEXTS", 2):
+            response = self.client.post(
+                "/api/v1/user_queries:batch", json={"texts": ["a", "b", "c"]}
+            )
+        self.assertEqual(response.status_code, 400)
+
+    def test_post_user_queries_batch_invalid_body(self):
+        """
+        Tests the post_user_queries_batch function from the
+        sentiment_analysis_api module. It checks if the function returns a
+        status code of 400 when 'texts' is not a list of strings.
+        """
+        response = self.client.post(
+            "/api/v1/user_queries:batch", json={"texts": "I love this product!"}
+        )
+        self.assertEqual(response.status_code, 400)
+
     @patch("api.app.sentiment_analysis_api.table.scan")
     def test_get_user_queries(self, mock_scan):
         """
@@ -58,6 +312,244 @@ class TestSentimentAnalysisAPI(unittest.TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertEqual(response.get_json()["total"], 0)
 
+    @patch("api.app.sentiment_analysis_api.table.scan")
+    def test_get_user_queries_paginated(self, mock_scan):
+        """
+        Tests that get_user_queries reads one page with the requested limit
+        and selected fields, returns the token of the next page, and starts
+        the next page after the last key of the previous one.
+        """
+        mock_scan.return_value = {
+            "Items": [{"id": "1", "sentiment": "POSITIVE"}],
+            "LastEvaluatedKey": {"id": "1"},
+        }
+        response = self.client.get("/api/v1/user_queries?limit=1&fields=id,sentiment")
+        self.assertEqual(response.status_code, 200)
+        next_token = response.get_json()["next_token"]
+        self.assertIsNotNone(next_token)
+        mock_scan.assert_called_once_with(
+            Limit=1,
+            ProjectionExpression="#f0, #f1",
+            ExpressionAttributeNames={"#f0": "id", "#f1": "sentiment"},
+        )
+
+        mock_scan.reset_mock()
+        mock_scan.return_value = {"Items": [{"id": "2", "sentiment": "NEUTRAL"}]}
+        response = self.client.get(
+            f"/api/v1/user_queries?limit=1&next_token={next_token}"
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(response.get_json()["next_token"])
+        mock_scan.assert_called_once_with(Limit=1, ExclusiveStartKey={"id": "1"})
+
+    @patch("api.app.sentiment_analysis_api.table.scan")
+    def test_get_user_queries_invalid_parameters(self, mock_scan):
+        """
+        Tests that get_user_queries returns a status code of 400 without
+        scanning the table when the limit, the token or the fields are not
+        valid.
+        """
+        for query in (
+            "limit=0",
+            "limit=abc",
+            "limit=100000",
+            "next_token=not-a-token",
+            "fields=id,password",
+        ):
+            response = self.client.get(f"/api/v1/user_queries?{query}")
+            self.assertEqual(response.status_code, 400, query)
+            self.assertIn("error", response.get_json())
+        mock_scan.assert_not_called()
+
+    @patch("api.app.sentiment_analysis_api.table.query")
+    def test_query_user_queries_by_sentiment(self, mock_query):
+        """
+        Tests that query_user_queries queries the sentiment index within the
+        time range, latest first, filters the language, and returns the
+        token of the next page.
+        """
+        mock_query.return_value = {
+            "Items": [{"id": "1", "sentiment": "NEGATIVE"}],
+            "LastEvaluatedKey": {"id": "1", "sentiment": "NEGATIVE"},
+        }
+        response = self.client.get(
+            "/api/v1/user_queries:query?sentiment=negative&language=en"
+            "&from=2024-01-01&to=2024-01-07T23:59:59&limit=10"
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json()["total"], 1)
+        self.assertIsNotNone(response.get_json()["next_token"])
+        mock_query.assert_called_once_with(
+            Limit=10,
+            IndexName=api.QUERY_INDEXES["sentiment"],
+            KeyConditionExpression=Key("sentiment").eq("NEGATIVE")
+            & Key("timestamp").between("2024-01-01T00:00:00", "2024-01-07T23:59:59"),
+            ScanIndexForward=False,
+            FilterExpression=Attr("language").eq("en"),
+        )
+
+    @patch("api.app.sentiment_analysis_api.table.query")
+    def test_query_user_queries_by_language(self, mock_query):
+        """
+        Tests that query_user_queries queries the language index from a
+        timestamp, oldest first, when no sentiment is given.
+        """
+        mock_query.return_value = {"Items": []}
+        response = self.client.get(
+            "/api/v1/user_queries:query?language=fr&from=2024-01-01&order=asc"
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(response.get_json()["next_token"])
+        kwargs = mock_query.call_args.kwargs
+        self.assertEqual(kwargs["IndexName"], api.QUERY_INDEXES["language"])
+        self.assertEqual(
+            kwargs["KeyConditionExpression"],
+            Key("language").eq("fr") & Key("timestamp").gte("2024-01-01T00:00:00"),
+        )
+        self.assertTrue(kwargs["ScanIndexForward"])
+        self.assertNotIn("FilterExpression", kwargs)
+
+    @patch("api.app.sentiment_analysis_api.table.query")
+    def test_query_user_queries_time_range(self, mock_query):
+        """
+        Tests that a date alone as the end of the time range includes the
+        whole day, and that timestamps with a UTC offset are converted to the
+        local time of the stored timestamps.
+        """
+        self.addCleanup(time.tzset)
+        with patch.dict(os.environ, {"TZ": "UTC"}):
+            time.tzset()
+            mock_query.return_value = {"Items": []}
+            response = self.client.get(
+                "/api/v1/user_queries:query",
+                query_string={
+                    "sentiment": "POSITIVE",
+                    "from": "2024-01-01T09:00:00+02:00",
+                    "to": "2024-01-07",
+                },
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            mock_query.call_args.kwargs["KeyConditionExpression"],
+            Key("sentiment").eq("POSITIVE")
+            & Key("timestamp").between(
+                "2024-01-01T07:00:00", "2024-01-07T23:59:59.999999"
+            ),
+        )
+
+    @patch("api.app.sentiment_analysis_api.table.query")
+    def test_query_user_queries_invalid_parameters(self, mock_query):
+        """
+        Tests that query_user_queries returns a status code of 400 without
+        querying the table when no sentiment or language is given, or when a
+        parameter is not valid.
+        """
+        for query in (
+            "",
+            "from=2024-01-01",
+            "sentiment=HAPPY",
+            "sentiment=POSITIVE&from=yesterday",
+            "sentiment=POSITIVE&order=random",
+            "sentiment=POSITIVE&limit=0",
+        ):
+            response = self.client.get(f"/api/v1/user_queries:query?{query}")
+            self.assertEqual(response.status_code, 400, query)
+        mock_query.assert_not_called()
+
+    @patch("api.app.sentiment_analysis_api.table.query")
+    def test_query_user_queries_index_unavailable(self, mock_query):
+        """
+        Tests that query_user_queries returns a status code of 503 when the
+        index is missing from the table or still being backfilled.
+        """
+        for message in (
+            "The table does not have the specified index: "
+            + api.QUERY_INDEXES["sentiment"],
+            "Cannot read from backfilling global secondary index: "
+            + api.QUERY_INDEXES["sentiment"],
+        ):
+            mock_query.side_effect = ClientError(
+                {"Error": {"Code": "ValidationException", "Message": message}},
+                "Query",
+            )
+            response = self.client.get("/api/v1/user_queries:query?sentiment=MIXED")
+            self.assertEqual(response.status_code, 503, message)
+            self.assertIn(api.QUERY_INDEXES["sentiment"], response.get_json()["error"])
+
+    def test_add_query_indexes(self):
+        """
+        Tests that add_query_indexes adds the missing index to a table created
+        without it, without throughput for an on-demand table, and that a
+        failed update does not stop the API from starting.
+        """
+        user_queries_table = MagicMock()
+        user_queries_table.name = "user_queries"
+        user_queries_table.global_secondary_indexes = [
+            {"IndexName": api.QUERY_INDEXES["sentiment"]}
+        ]
+        user_queries_table.billing_mode_summary = {"BillingMode": "PAY_PER_REQUEST"}
+        api.add_query_indexes(user_queries_table)
+        update_table = user_queries_table.meta.client.update_table
+        update_table.assert_called_once_with(
+            TableName="user_queries",
+            AttributeDefinitions=api.ATTRIBUTE_DEFINITIONS,
+            GlobalSecondaryIndexUpdates=[
+                {"Create": api.query_index("language", provisioned=False)}
+            ],
+        )
+        self.assertNotIn("ProvisionedThroughput", api.query_index("language", False))
+
+        user_queries_table.global_secondary_indexes = None
+        update_table.reset_mock()
+        update_table.side_effect = ClientError(
+            {"Error": {"Code": "LimitExceededException"}}, "UpdateTable"
+        )
+        api.add_query_indexes(user_queries_table)
+        update_table.assert_called_once()
+
+    @patch("api.app.sentiment_analysis_api.table.scan")
+    def test_export_user_queries(self, mock_scan):
+        """
+        Tests that export_user_queries scans the requested number of segments
+        and streams their user queries as newline-delimited JSON, compressed
+        with gzip when the client accepts it.
+        """
+        mock_scan.side_effect = lambda **kwargs: {
+            "Items": [{"id": str(kwargs["Segment"])}]
+        }
+        response = self.client.get("/api/v1/user_queries:export?segments=3&fields=id")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, "application/x-ndjson")
+        lines = response.get_data().decode("utf-8").splitlines()
+        self.assertEqual(
+            sorted(json.loads(line)["id"] for line in lines), ["0", "1", "2"]
+        )
+        self.assertEqual(mock_scan.call_count, 3)
+        self.assertEqual(
+            mock_scan.call_args.kwargs["ExpressionAttributeNames"], {"#f0": "id"}
+        )
+
+        response = self.client.get(
+            "/api/v1/user_queries:export?segments=1",
+            headers={"Accept-Encoding": "gzip"},
+        )
+        self.assertEqual(response.headers["Content-Encoding"], "gzip")
+        self.assertEqual(
+            gzip.decompress(response.get_data()).decode("utf-8"), '{"id": "0"}\n'
+        )
+
+    @patch("api.app.sentiment_analysis_api.table.scan")
+    def test_export_user_queries_invalid_parameters(self, mock_scan):
+        """
+        Tests that export_user_queries returns a status code of 400 without
+        scanning the table when the number of segments or the fields are not
+        valid.
+        """
+        for query in ("segments=0", "segments=abc", "segments=1000", "fields=x"):
+            response = self.client.get(f"/api/v1/user_queries:export?{query}")
+            self.assertEqual(response.status_code, 400, query)
+        mock_scan.assert_not_called()
+
     @patch("api.app.sentiment_analysis_api.table.get_item")
     def test_get_user_query_found(self, mock_get_item):
         """
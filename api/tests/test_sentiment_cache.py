@@ -0,0 +1,159 @@
+"""
+This module contains unit tests for the sentiment_cache module of the
+sentiment analysis API. It tests the normalization of the cached texts, the
+time to live and least recently used eviction of the in-process tier, the
+shared tier, and the coalescing of concurrent lookups of the same text.
+"""
+
+import time
+import threading
+import unittest
+from botocore.exceptions import ClientError
+from api.app.sentiment_cache import (
+    DynamoDBCacheTier,
+    SentimentCache,
+    cache_key,
+    normalize_text,
+)
+
+
+class FakeTable:
+    """
+    In-memory stand-in for a DynamoDB Table resource, supporting get_item and
+    put_item, and failing every call if fail is set.
+    """
+
+    def __init__(self):
+        self.items = {}
+        self.fail = False
+
+    def _check(self):
+        if self.fail:
+            raise ClientError({"Error": {"Code": "Throttled"}}, "GetItem")
+
+    def get_item(self, Key):  # pylint: disable=invalid-name
+        """Returns the item of a key."""
+        self._check()
+        item = self.items.get(Key["text_hash"])
+        return {"Item": item} if item else {}
+
+    def put_item(self, Item):  # pylint: disable=invalid-name
+        """Stores an item."""
+        self._check()
+        self.items[Item["text_hash"]] = Item
+
+
+class TestSentimentCache(unittest.TestCase):
+    """
+    This class contains unit tests for the SentimentCache class.
+    """
+
+    def test_normalize_text(self):
+        """
+        Tests that case, whitespace and Unicode compatibility forms are
+        normalized, so that such variants share a cache key.
+        """
+        self.assertEqual(normalize_text("  Great\tSHOES\n "), "great shoes")
+        self.assertEqual(cache_key("Ｇreat shoes"), cache_key("great  shoes"))
+        self.assertNotEqual(cache_key("great shoes"), cache_key("great shoe"))
+
+    def test_ttl_and_lru_eviction(self):
+        """
+        Tests that results expire after the time to live and that the least
+        recently used result is evicted once the cache is full.
+        """
+        now = [0.0]
+        cache = SentimentCache(max_entries=2, ttl_seconds=10, clock=lambda: now[0])
+        cache.put("a", ("POSITIVE", "en"))
+        cache.put("b", ("NEGATIVE", "en"))
+        cache.get("a")
+        cache.put("c", ("NEUTRAL", "en"))
+
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), ("POSITIVE", "en"))
+        now[0] = 11
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(cache.stats()["misses"], 2)
+
+    def test_get_or_compute(self):
+        """
+        Tests that a result is computed once, then served from the cache,
+        and that a failed computation is raised and not cached.
+        """
+        cache = SentimentCache()
+        calls = []
+
+        def compute(text):
+            calls.append(text)
+            return ("POSITIVE", "en")
+
+        self.assertEqual(cache.get_or_compute("Hi", compute), ("POSITIVE", "en"))
+        self.assertEqual(cache.get_or_compute("hi", compute), ("POSITIVE", "en"))
+        self.assertEqual(calls, ["Hi"])
+
+        def fail(_):
+            raise ValueError("failed")
+
+        with self.assertRaises(ValueError):
+            cache.get_or_compute("other", fail)
+        self.assertEqual(cache.get_or_compute("other", compute), ("POSITIVE", "en"))
+        stats = cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (1, 3))
+        self.assertEqual(stats["hit_rate"], 0.25)
+
+    def test_concurrent_lookups_are_coalesced(self):
+        """
+        Tests that concurrent lookups of the same text wait for a single
+        computation.
+        """
+        cache = SentimentCache()
+        started = threading.Event()
+        calls = []
+
+        def compute(text):
+            calls.append(text)
+            started.set()
+            time.sleep(0.2)
+            return ("NEUTRAL", "en")
+
+        results = []
+        leader = threading.Thread(
+            target=lambda: results.append(cache.get_or_compute("Hi", compute))
+        )
+        leader.start()
+        started.wait(5)
+        followers = [
+            threading.Thread(
+                target=lambda: results.append(cache.get_or_compute("hi ", compute))
+            )
+            for _ in range(4)
+        ]
+        for thread in followers:
+            thread.start()
+        for thread in [leader] + followers:
+            thread.join(5)
+
+        self.assertEqual(calls, ["Hi"])
+        self.assertEqual(results, [("NEUTRAL", "en")] * 5)
+        self.assertEqual(cache.stats()["coalesced"], 4)
+
+    def test_shared_tier(self):
+        """
+        Tests that results are shared through the shared tier, and that
+        failures of the shared tier are treated as misses.
+        """
+        table = FakeTable()
+        first = SentimentCache(shared_tier=DynamoDBCacheTier(table, 60))
+        second = SentimentCache(shared_tier=DynamoDBCacheTier(table, 60))
+        first.get_or_compute("Hi", lambda _: ("POSITIVE", "en"))
+
+        self.assertEqual(second.get("hi"), ("POSITIVE", "en"))
+        self.assertEqual(second.stats()["shared_hits"], 1)
+
+        table.fail = True
+        result = second.get_or_compute("new", lambda _: ("NEGATIVE", "en"))
+        self.assertEqual(result, ("NEGATIVE", "en"))
+
+
+if __name__ == "__main__":
+    unittest.main()
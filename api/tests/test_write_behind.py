@@ -0,0 +1,187 @@
+"""
+This module contains unit tests for the write_behind module of the sentiment
+analysis API. It tests that queued items are written in batches by size and
+by time, that failed batches are retried and then spilled to a file, that a
+full queue rejects items, that the queue is drained on shutdown and spilled
+once the shutdown timeout has passed, and that the worker survives errors
+other than those of DynamoDB.
+"""
+
+import os
+import json
+import time
+import tempfile
+import unittest
+from contextlib import contextmanager
+from botocore.exceptions import ClientError
+from api.app.write_behind import WriteBehindWriter
+
+
+class FakeTable:
+    """
+    Stand-in for a DynamoDB Table resource whose batch writer records the
+    written batches, failing the first `failures` batches.
+    """
+
+    def __init__(self, failures=0):
+        self.batches = []
+        self.failures = failures
+        self.attempts = 0
+
+    @contextmanager
+    def batch_writer(self):
+        """Collects the items of a batch and records them on exit."""
+        items = []
+
+        class Writer:  # pylint: disable=too-few-public-methods
+            """Batch writer collecting the items."""
+
+            @staticmethod
+            def put_item(Item):  # pylint: disable=invalid-name
+                """Collects an item."""
+                items.append(Item)
+
+        yield Writer()
+        self.attempts += 1
+        if any(not isinstance(item["id"], str) for item in items):
+            raise TypeError("Unsupported type for the id attribute")
+        if self.failures:
+            self.failures -= 1
+            raise ClientError({"Error": {"Code": "Throttled"}}, "BatchWriteItem")
+        self.batches.append(items)
+
+
+def wait_for(condition, timeout=5):
+    """
+    Waits until the condition is true or the timeout expires.
+    """
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+class TestWriteBehindWriter(unittest.TestCase):
+    """
+    This class contains unit tests for the WriteBehindWriter class.
+    """
+
+    def test_flush_by_size_and_time(self):
+        """
+        Tests that a full batch is written at once and that a partial batch
+        is written after the flush interval.
+        """
+        table = FakeTable()
+        writer = WriteBehindWriter(table, batch_size=3, flush_interval=0.2)
+        for i in range(4):
+            self.assertTrue(writer.submit({"id": str(i)}))
+
+        self.assertTrue(wait_for(lambda: len(table.batches) == 2))
+        self.assertEqual([len(batch) for batch in table.batches], [3, 1])
+        self.assertEqual(writer.stats()["written"], 4)
+        writer.shutdown(5)
+
+    def test_retry_then_spill(self):
+        """
+        Tests that a failed batch is retried, and spilled to the spill file
+        once the retries are exhausted.
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            spill_path = os.path.join(directory, "spill", "items.ndjson")
+            table = FakeTable(failures=1)
+            writer = WriteBehindWriter(
+                table, batch_size=1, max_retries=1, backoff_seconds=0.01
+            )
+            writer.submit({"id": "1"})
+            self.assertTrue(wait_for(lambda: writer.stats()["written"] == 1))
+            self.assertEqual(writer.stats()["retries"], 1)
+            writer.shutdown(5)
+
+            table = FakeTable(failures=3)
+            writer = WriteBehindWriter(
+                table,
+                batch_size=1,
+                max_retries=2,
+                backoff_seconds=0.01,
+                spill_path=spill_path,
+            )
+            writer.submit({"id": "2"})
+            writer.shutdown(5)
+
+            with open(spill_path, "r", encoding="utf-8") as file:
+                self.assertEqual([json.loads(line) for line in file], [{"id": "2"}])
+            self.assertEqual(writer.stats()["spilled"], 1)
+            self.assertEqual(table.batches, [])
+
+    def test_full_queue_and_shutdown(self):
+        """
+        Tests that items are rejected while the queue is full or once the
+        writer is shut down, and that shutdown drains the queue.
+        """
+        table = FakeTable()
+        writer = WriteBehindWriter(table, batch_size=10, flush_interval=60, max_queue=2)
+        self.assertTrue(writer.submit({"id": "1"}))
+        self.assertTrue(writer.submit({"id": "2"}))
+        self.assertFalse(writer.submit({"id": "3"}))
+
+        writer.shutdown(5)
+        self.assertEqual(table.batches, [[{"id": "1"}, {"id": "2"}]])
+        self.assertFalse(writer.submit({"id": "4"}))
+        self.assertEqual(writer.stats()["rejected"], 2)
+
+    def test_shutdown_timeout_spills_queue(self):
+        """
+        Tests that once the shutdown timeout has passed, the batch waiting for
+        a retry and the queued items are spilled without further attempts.
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            spill_path = os.path.join(directory, "items.ndjson")
+            table = FakeTable(failures=100)
+            writer = WriteBehindWriter(
+                table,
+                batch_size=1,
+                flush_interval=0,
+                max_retries=5,
+                backoff_seconds=30,
+                spill_path=spill_path,
+            )
+            for i in range(3):
+                writer.submit({"id": str(i)})
+            self.assertTrue(wait_for(lambda: table.attempts == 1))
+
+            start = time.monotonic()
+            writer.shutdown(0.2)
+            self.assertLess(time.monotonic() - start, 2)
+
+            self.assertTrue(wait_for(lambda: writer.stats()["spilled"] == 3))
+            with open(spill_path, "r", encoding="utf-8") as file:
+                self.assertEqual(
+                    sorted(json.loads(line)["id"] for line in file), ["0", "1", "2"]
+                )
+            self.assertEqual(table.attempts, 1)
+            self.assertEqual(writer.stats()["retries"], 0)
+
+    def test_worker_survives_unexpected_error(self):
+        """
+        Tests that a batch failing with an error other than those of DynamoDB
+        is spilled without retries, and that the worker keeps writing the
+        next batches.
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            spill_path = os.path.join(directory, "items.ndjson")
+            table = FakeTable()
+            writer = WriteBehindWriter(
+                table, batch_size=1, flush_interval=0, spill_path=spill_path
+            )
+            self.assertTrue(writer.submit({"id": 1}))
+            self.assertTrue(wait_for(lambda: writer.stats()["spilled"] == 1))
+            self.assertTrue(writer.submit({"id": "2"}))
+            self.assertTrue(wait_for(lambda: writer.stats()["written"] == 1))
+            writer.shutdown(5)
+
+            self.assertEqual(table.batches, [[{"id": "2"}]])
+            self.assertEqual(writer.stats()["retries"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
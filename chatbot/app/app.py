@@ -11,20 +11,27 @@ from typing import Optional
 import logging
 import requests
 import streamlit as st
-import openai
 from dotenv import load_dotenv
-from bot_logic import query
+from bot_logic import last_response_source, query_stream
 from logger_config import setup_logger
+from metrics import track
+from sentiment_client import (
+    SENTIMENT_API_BASE_URL,
+    SENTIMENT_BATCHING_ENABLED,
+    sentiment_api_client,
+    sentiment_batcher,
+    sentiment_submitter,
+)
 
 load_dotenv()
 
+# The OpenAI client reads OPENAI_API_KEY from the environment when bot_logic
+# first creates it, so the openai package is not imported here.
 API_KEY = os.getenv("OPENAI_API_KEY")
-openai.api_key = API_KEY
 MODEL_ENGINE = "gpt-3.5-turbo"
 LOGGING_LEVEL = (
     int(os.getenv("LOGGING_LEVEL")) if os.getenv("LOGGING_LEVEL") else logging.DEBUG
 )
-SENTIMENT_API_BASE_URL = os.getenv("SENTIMENT_API_BASE_URL", "http://localhost:5000")
 
 script_name = os.path.splitext(os.path.basename(__file__))[0]
 
@@ -36,7 +43,9 @@ chat_placeholder = st.empty()
 
 def call_sentiment_analysis_api(prompt: str) -> Optional[dict]:
     """
-    Makes a POST request to the sentiment analysis API with the user's prompt.
+    Makes a POST request to the sentiment analysis API with the user's prompt,
+    through the shared client that pools connections, retries failed
+    connections and skips the call while the circuit breaker is open.
 
     Args:
         prompt (str): The user's prompt.
@@ -50,9 +59,8 @@ def call_sentiment_analysis_api(prompt: str) -> Optional[dict]:
     try:
         logger.info("Making a request to the sentiment analysis API")
         logger.debug("Request URL: %s and user_query: %s", url, prompt)
-        response = requests.post(url, json={"text": prompt}, timeout=3)
-        response.raise_for_status()
-        return response.json()
+        with track("sentiment_api"):
+            return sentiment_api_client.post_json(url, {"text": prompt})
     except requests.exceptions.RequestException as e:
         logger.error("Failed to make a request to the sentiment analysis API: %s", e)
         return None
@@ -66,29 +74,33 @@ def init_chat_history() -> None:
     Returns:
         None
     """
-    logger.info("Initializing chat history: %s", st.session_state)
+    logger.info("Initializing chat history")
     if "messages" not in st.session_state:
         st.session_state["messages"] = []
         st.session_state.messages = [
             {"role": "system", "content": "You are a helpful assistant."}
         ]
-        logger.debug("Updated session state: %s", st.session_state)
+        logger.debug("Added system message to session state")
     logger.info("Chat history initialized")
 
 
 def start_chat() -> None:
     """
     Starts the chat interface in the Streamlit app. It loads the chat history,
-    accepts user input, generates a response using the query function from
-    bot_logic, and updates the chat history with the user input and assistant
-    response.
+    accepts user input, streams a response using the query_stream function
+    from bot_logic as it is generated, and updates the chat history with the
+    user input and the full assistant response. The prompt is sent to the
+    sentiment analysis API in the background, either batched with other
+    prompts or on its own, so the API never delays the response.
 
     Returns:
          None
     """
     logger.info("Starting chat")
     with chat_placeholder.container():
-        logger.info("Loading session_state.messages: %s", st.session_state.messages)
+        logger.info(
+            "Loading %d messages from session_state", len(st.session_state.messages)
+        )
         for message in st.session_state.messages:
             if message["role"] != "system":
                 with st.chat_message(message["role"]):
@@ -106,19 +118,22 @@ def start_chat() -> None:
             logger.debug("Adding user message via st.markdown: %s", prompt)
             st.markdown(prompt)
 
-        response = query(prompt)
-        logger.info("Assistant response: %s", response)
-
-        logger.info("Calling sentiment analysis API")
-        sentiment_analysis_response = call_sentiment_analysis_api(prompt)
-        logger.debug("Sentiment analysis response: %s", sentiment_analysis_response)
+        logger.info("Submitting prompt to sentiment analysis API")
+        if SENTIMENT_BATCHING_ENABLED:
+            sentiment_batcher.submit(prompt)
+        else:
+            sentiment_submitter.submit(call_sentiment_analysis_api, prompt)
 
         with st.chat_message("assistant"):
-            logger.debug("Adding assistant response via st.markdown: %s", response)
-            st.markdown(response)
+            logger.debug("Streaming assistant response via st.write_stream")
+            response = st.write_stream(query_stream(prompt))
+        source = last_response_source()
+        logger.info("Assistant response (served by %s): %s", source, response)
 
         logger.debug("Adding assistant response %s to session_state.messages", response)
-        st.session_state.messages.append({"role": "assistant", "content": response})
+        st.session_state.messages.append(
+            {"role": "assistant", "content": response, "source": source}
+        )
     logger.info("Chat started")
 
 
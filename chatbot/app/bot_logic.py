@@ -1,44 +1,94 @@
 """
 This module, bot_logic.py, contains the logic for a chatbot application.
 
-It includes functions to load and format documents, create a vector store from the documents,
-generate a response based on user input, and process the user's input to generate a response.
+It includes functions to format documents, generate a response based on user
+input, and process the user's input to generate a response. The documents,
+embeddings, vector stores and retrievers are built by the retriever_builder
+module, whose public functions are re-exported here.
 
 The main functions in this module are:
-- format_docs: Concatenates the content of a list of documents into a single string.
-- load_documents: Loads a file from a given path, splits it into chunks, and
-                  returns a list of Document objects.
-- load_embeddings: Creates a vector store from a list of Document objects.
+- format_docs: Assembles the content of a list of documents into a context
+               bounded by a token budget.
+- get_model: Returns the process-wide chat model, creating it on first use.
+- get_retriever: Returns the process-wide retriever, building it on first use
+                 and rebuilding it when the source file or directory changes.
+- rebuild_retriever: Explicitly rebuilds the process-wide retriever.
+- warm_up: Builds the retriever and chain and runs a stub question through
+           them, then marks the chatbot as ready.
+- is_ready: Tells whether the warm-up has completed.
 - generate_response: Generates a response for the given user input using the
                      provided vector store.
-- query: Processes the user's input, loads the documents, creates a vector store,
-         and generates a response.
-
-This module uses the OpenAI API for generating responses and the Chroma vector
+- generate_response_stream: Streams the response for the given user input
+                            chunk by chunk as the model generates it.
+- load_faq_index: Builds the index of the FAQ questions of the source documents.
+- query: Processes the user's input using the process-wide retriever and
+         generates a response, answering FAQ questions directly and reusing
+         cached answers to similar questions.
+- last_response_source: Tells which path served the last response of the
+                        current thread.
+- query_stream: Same as query, but streams the response chunk by chunk.
+
+The OpenAI chat model is imported on first use, through get_model, since
+importing it takes most of the time needed to import this module. The
+warm-up loads it before the first user request.
+
+This module uses the OpenAI API for generating responses, OpenAI or local
+hashed n-gram embeddings depending on EMBEDDING_PROVIDER, and, depending on
+VECTOR_STORE_BACKEND, the Chroma vector store or an in-memory NumPy vector
 store for storing document embeddings.
+
+Each stage of the pipeline is timed into the chatbot_stage_duration_seconds
+histogram of the metrics module, and FAQ, response cache and embedding cache
+lookups are counted, so that serve.py can expose them to Prometheus.
 """
 
 import os
+import time
 import logging
-from typing import List
+import threading
+from typing import Iterator, List, Optional, Tuple
 
 from dotenv import load_dotenv
-from langchain.chat_models import ChatOpenAI
-from langchain.document_loaders import TextLoader
 from langchain.schema.document import Document
-from langchain.embeddings.openai import OpenAIEmbeddings
-from langchain.text_splitter import (
-    CharacterTextSplitter,
-)
 from langchain.prompts.chat import (
     HumanMessagePromptTemplate,
     SystemMessagePromptTemplate,
 )
 from langchain.prompts import ChatPromptTemplate
-from langchain.schema import StrOutputParser
-from langchain.schema.runnable import RunnablePassthrough
-from langchain.vectorstores import Chroma
+from langchain.schema import BaseRetriever, StrOutputParser
+from langchain.schema.runnable import Runnable, RunnableLambda, RunnablePassthrough
 from logger_config import setup_logger
+from response_cache import SemanticResponseCache
+from faq_index import FAQIndex, parse_faq
+from context_builder import ContextAssembler, TokenCounter
+
+# CACHE_LOOKUPS is re-exported: it counts the embedding cache lookups made by
+# the retriever_builder module.
+# pylint: disable-next=unused-import
+from metrics import (
+    CACHE_LOOKUPS,
+    QUERIES_IN_FLIGHT,
+    RESPONSES,
+    record_cache_lookup,
+    track,
+)
+from ingestion import INGEST_FILE_PATTERN, iter_document_paths
+
+# pylint: disable-next=unused-import
+from retriever_builder import (
+    build_hybrid_retriever,
+    build_index_from_directory,
+    create_embeddings,
+    get_embeddings,
+    hash_directory,
+    hash_documents,
+    load_documents,
+    load_embeddings,
+    load_retriever,
+    prune_persist_dirs,
+    resolve_path,
+    source_version,
+)
 
 load_dotenv()
 
@@ -46,9 +96,29 @@ load_dotenv()
 
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 LANGUAGE_MODEL = "gpt-3.5-turbo-instruct"
+CHAT_MODEL = os.getenv("CHAT_MODEL", "gpt-3.5-turbo")
+# A single file, or a directory indexed with the ingestion pipeline
+DOCUMENT_PATH = os.getenv("DOCUMENT_PATH", "./docs/faq_albert_shoes.txt")
+CONTEXT_MAX_TOKENS = int(os.getenv("CONTEXT_MAX_TOKENS", "1500"))
+CONTEXT_OVERLAP_THRESHOLD = float(os.getenv("CONTEXT_OVERLAP_THRESHOLD", "0.8"))
+WARMUP_QUESTION = os.getenv("WARMUP_QUESTION", "What is your return policy?")
+# Whether the warm-up question is also sent to the language model
+WARMUP_INVOKE_MODEL = os.getenv("WARMUP_INVOKE_MODEL", "True") == "True"
+FAQ_ENABLED = os.getenv("FAQ_ENABLED", "True") == "True"
+FAQ_MATCH_THRESHOLD = float(os.getenv("FAQ_MATCH_THRESHOLD", "0.9"))
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "True") == "True"
+RESPONSE_CACHE_THRESHOLD = float(os.getenv("RESPONSE_CACHE_THRESHOLD", "0.95"))
+RESPONSE_CACHE_TTL_SECONDS = float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "3600"))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "512"))
+# Minimum number of seconds between two checks of the source documents
+SOURCE_CHECK_INTERVAL_SECONDS = float(os.getenv("SOURCE_CHECK_INTERVAL_SECONDS", "5"))
 LOGGING_LEVEL = (
     int(os.getenv("LOGGING_LEVEL")) if os.getenv("LOGGING_LEVEL") else logging.DEBUG
 )
+# Paths serving a response, as returned by last_response_source
+RESPONSE_SOURCE_FAQ = "faq"
+RESPONSE_SOURCE_CACHE = "cache"
+RESPONSE_SOURCE_MODEL = "model"
 script_name = os.path.splitext(os.path.basename(__file__))[0]
 
 logger = setup_logger(script_name, LOGGING_LEVEL)
@@ -67,89 +137,428 @@ chat_prompt_template = ChatPromptTemplate.from_messages(
     [system_message_prompt, human_message_prompt]
 )
 
-model = ChatOpenAI()
+context_assembler = ContextAssembler(
+    CONTEXT_MAX_TOKENS,
+    CONTEXT_OVERLAP_THRESHOLD,
+    token_counter=TokenCounter(CHAT_MODEL),
+)
+response_cache = SemanticResponseCache(
+    RESPONSE_CACHE_THRESHOLD, RESPONSE_CACHE_TTL_SECONDS, RESPONSE_CACHE_MAX_ENTRIES
+)
+
+# The chat model is created on first use.
+_model_lock = threading.Lock()
+_model: Optional[Runnable] = None
+
+# The retriever is shared by every Streamlit session in the process. It is
+# rebuilt only when the modification time of the source file, or of a document
+# in the source directory, changes, which is checked at most once every
+# SOURCE_CHECK_INTERVAL_SECONDS.
+_retriever_lock = threading.Lock()
+_retriever: Optional[BaseRetriever] = None
+_retriever_source: Optional[tuple] = None
+_source_checked_at: float = 0.0
+# Persist directory of the vector store of the retriever
+_store_in_use: Optional[str] = None
+# The chain is built once per retriever, together with the retriever.
+_chain: Optional[Tuple[BaseRetriever, Runnable]] = None
+# The FAQ index is rebuilt together with the retriever.
+_faq_index: Optional[FAQIndex] = None
+# Set once warm_up has completed.
+_ready = threading.Event()
+# Path that served the last response of each thread
+_response_source = threading.local()
+
+
+def get_model() -> Runnable:
+    """
+    Returns the process-wide chat model, importing and creating it on first
+    use.
+
+    Returns:
+        Runnable: The ChatOpenAI model.
+    """
+    global _model  # pylint: disable=global-statement
+
+    with _model_lock:
+        if _model is None:
+            # pylint: disable-next=import-outside-toplevel
+            from langchain.chat_models.openai import ChatOpenAI
+
+            _model = ChatOpenAI(model_name=CHAT_MODEL)
+        return _model
 
 
 def format_docs(docs: List[Document]) -> str:
     """
     Concatenate the page content of a list of documents, separated by two
-    newlines into a single string.
+    newlines into a single string. Documents are added in the given order,
+    most relevant first, until CONTEXT_MAX_TOKENS tokens are used; duplicate
+    and overlapping documents are skipped.
 
     Args:
         docs (List[Document]): A list of Document objects.
 
     Returns:
-        str: Concatenated string of all document contents.
+        str: Concatenated string of the selected document contents.
     """
-    return "\n\n".join([d.page_content for d in docs])
+    with track("format_docs"):
+        context, _ = context_assembler.assemble(docs)
+    return context
 
 
-def load_documents(relative_path: str) -> List[Document]:
+def _build_retriever(relative_path: str) -> BaseRetriever:
     """
-    Loads a file from the relative path, splits it into chunks, and returns a
-    list of Document objects.
+    Loads the documents and builds a retriever persisted under a directory
+    keyed by the vector store backend, the fingerprint of the embeddings and
+    the hash of the documents. A directory is indexed with the ingestion
+    pipeline. In hybrid mode, the BM25 index is built alongside the vector
+    store. Cached responses are cleared, since they may have been generated
+    from the previous documents.
+
+    The vector store of the previous retriever is only removed at the next
+    rebuild, since queries that fetched the previous retriever just before
+    it was replaced may still be reading it.
 
     Args:
-        relative_path (str): Relative path to the file.
+        relative_path (str): Relative path to the source file or directory.
 
     Returns:
-        List[Document]: List of Document objects.
+        BaseRetriever: Retriever over the documents.
     """
-    logger.debug("Loading documents from %s", relative_path)
-    script_dir = os.path.dirname(__file__)
-    absolute_path = os.path.join(script_dir, relative_path)
-    logger.debug("Relative path: %s converted to %s", relative_path, absolute_path)
+    global _store_in_use  # pylint: disable=global-statement
+
+    with track("build_retriever"):
+        retriever, store_name = load_retriever(relative_path)
+    prune_persist_dirs(store_name, _store_in_use)
+    _store_in_use = store_name
+    response_cache.clear()
+    return retriever
 
-    logger.debug("Loading documents from %s", absolute_path)
-    raw_documents = TextLoader(absolute_path).load()
-    logger.debug("Loaded %d documents", len(raw_documents))
-    logger.info("Splitting documents")
-    text_splitter = CharacterTextSplitter(chunk_size=100, chunk_overlap=0)
-    return text_splitter.split_documents(raw_documents)
 
+def load_faq_index(relative_path: str) -> FAQIndex:
+    """
+    Builds the index of the FAQ questions and answers found in the source
+    file, or in the documents of the source directory.
 
-def load_embeddings(documents: List[Document]) -> Chroma:
+    Args:
+        relative_path (str): Relative path to the source file or directory.
+
+    Returns:
+        FAQIndex: The index, matching questions with FAQ_MATCH_THRESHOLD.
+    """
+    absolute_path = resolve_path(relative_path)
+    if os.path.isdir(absolute_path):
+        paths = iter_document_paths(absolute_path, INGEST_FILE_PATTERN)
+    else:
+        paths = iter([absolute_path])
+    pairs = []
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as file:
+            pairs.extend(parse_faq(file.read()))
+    logger.info("Indexed %d FAQ questions", len(pairs))
+    return FAQIndex(pairs, FAQ_MATCH_THRESHOLD)
+
+
+def rebuild_retriever(relative_path: str = DOCUMENT_PATH) -> BaseRetriever:
     """
-    Create a vector store from a list of Document objects.
+    Rebuilds the process-wide retriever from the source file or directory,
+    regardless of whether it has changed.
 
     Args:
-        documents (List[Document]): List of Document objects.
+        relative_path (str): Relative path to the source file or directory.
 
     Returns:
-        Chroma: Vector store object.
+        BaseRetriever: The rebuilt retriever.
     """
-    logger.debug("Creating vector store from %d documents", len(documents))
-    db = Chroma.from_documents(documents, OpenAIEmbeddings())
+    # pylint: disable-next=global-statement
+    global _retriever, _retriever_source, _source_checked_at, _chain, _faq_index
 
-    return db.as_retriever()
+    source = source_version(relative_path)
+    with _retriever_lock:
+        logger.info("Rebuilding retriever from %s", relative_path)
+        _retriever = _build_retriever(relative_path)
+        _retriever_source = source
+        _source_checked_at = time.monotonic()
+        _chain = (_retriever, _build_chain(_retriever))
+        _faq_index = load_faq_index(relative_path)
+        return _retriever
 
 
-def generate_response(retriever: Chroma, user_input: str) -> str:
+def get_retriever(relative_path: str = DOCUMENT_PATH) -> BaseRetriever:
+    """
+    Returns the process-wide retriever. It is built on first use and rebuilt
+    when the source file, or a document of the source directory, has been
+    added, removed or modified since it was last built. The source is checked
+    at most once every SOURCE_CHECK_INTERVAL_SECONDS, since checking a
+    directory lists every document.
+
+    Args:
+        relative_path (str): Relative path to the source file or directory.
+
+    Returns:
+        BaseRetriever: The shared retriever.
+    """
+    # pylint: disable-next=global-statement
+    global _retriever, _retriever_source, _source_checked_at, _chain, _faq_index
+
+    with _retriever_lock:
+        if (
+            _retriever is not None
+            and _retriever_source[0] == relative_path
+            and time.monotonic() - _source_checked_at < SOURCE_CHECK_INTERVAL_SECONDS
+        ):
+            return _retriever
+
+    source = source_version(relative_path)
+    with _retriever_lock:
+        if _retriever is None or _retriever_source != source:
+            logger.info("Building retriever from %s", relative_path)
+            _retriever = _build_retriever(relative_path)
+            _retriever_source = source
+            _chain = (_retriever, _build_chain(_retriever))
+            _faq_index = load_faq_index(relative_path)
+        _source_checked_at = time.monotonic()
+        return _retriever
+
+
+def _build_chain(retriever: BaseRetriever) -> Runnable:
+    """
+    Builds the LCEL chain that retrieves the documents for a question,
+    assembles them into a context within the token budget, fills in the
+    prompt template and parses the model output into a string. Retrieval is
+    timed as its own stage.
+
+    Args:
+        retriever (BaseRetriever): Retriever over the documents.
+
+    Returns:
+        Runnable: The chain, taking the user input as its input.
+    """
+
+    def retrieve(question: str) -> List[Document]:
+        with track("retrieval"):
+            return retriever.get_relevant_documents(question)
+
+    return (
+        {
+            "context": RunnableLambda(retrieve) | format_docs,
+            "question": RunnablePassthrough(),
+        }
+        | chat_prompt_template
+        | get_model()
+        | StrOutputParser()
+    )
+
+
+def _get_chain(retriever: BaseRetriever) -> Runnable:
+    """
+    Returns the chain prebuilt for the process-wide retriever, or builds a
+    chain for any other retriever.
+
+    Args:
+        retriever (BaseRetriever): Retriever over the documents.
+
+    Returns:
+        Runnable: The chain, taking the user input as its input.
+    """
+    chain = _chain
+    if chain is not None and chain[0] is retriever:
+        return chain[1]
+    return _build_chain(retriever)
+
+
+def generate_response(retriever: BaseRetriever, user_input: str) -> str:
     """
     Generates a response for the given user input using the provided vector
     store.
 
     Args:
-        retriever (Chroma): Vector store object.
+        retriever (BaseRetriever): Retriever over the documents.
         user_input (str): User input.
 
     Returns:
         str: Generated response.
     """
     logger.info("Generating response for user input: %s", user_input)
-    chain = (
-        {"context": retriever, "question": RunnablePassthrough()}
-        | chat_prompt_template
-        | model
-        | StrOutputParser()
+    with track("generate_response"):
+        return _get_chain(retriever).invoke(user_input)
+
+
+def generate_response_stream(
+    retriever: BaseRetriever, user_input: str
+) -> Iterator[str]:
+    """
+    Streams the response for the given user input using the provided vector
+    store, yielding each chunk of text as the model generates it.
+
+    Args:
+        retriever (BaseRetriever): Retriever over the documents.
+        user_input (str): User input.
+
+    Yields:
+        str: The next chunk of the generated response.
+    """
+    logger.info("Streaming response for user input: %s", user_input)
+    with track("generate_response"):
+        yield from _get_chain(retriever).stream(user_input)
+
+
+def warm_up(question: str = WARMUP_QUESTION) -> bool:
+    """
+    Builds the process-wide retriever and chain, and runs a stub question
+    through them so that the index, the embedding client and, if
+    WARMUP_INVOKE_MODEL is set, the language model client are initialised
+    before the first user arrives. The chatbot is marked as ready once the
+    retriever is built, even if the language model call fails, since that
+    call only warms up connections. The answer is not cached.
+
+    Args:
+        question (str): Stub question used for the warm-up.
+
+    Returns:
+        bool: True if the warm-up completed and the chatbot is ready.
+    """
+    logger.info("Warming up with question: %s", question)
+    try:
+        retriever = get_retriever()
+        retriever.invoke(question)
+        if RESPONSE_CACHE_ENABLED:
+            get_embeddings().embed_query(question)
+    except Exception as e:  # pylint: disable=broad-except
+        logger.error("Warm-up failed: %s", e)
+        return False
+    if WARMUP_INVOKE_MODEL:
+        try:
+            _get_chain(retriever).invoke(question)
+        except Exception as e:  # pylint: disable=broad-except
+            logger.warning("Warm-up call to the language model failed: %s", e)
+    _ready.set()
+    logger.info("Warm-up complete, ready to serve")
+    return True
+
+
+def is_ready() -> bool:
+    """
+    Tells whether the warm-up has completed.
+
+    Returns:
+        bool: True once warm_up has completed.
+    """
+    return _ready.is_set()
+
+
+def _lookup_cached_response(
+    user_input: str,
+) -> Tuple[Optional[str], Optional[List[float]]]:
+    """
+    Looks up the answer to a similar question in the response cache.
+
+    Args:
+        user_input (str): User input.
+
+    Returns:
+        Tuple[Optional[str], Optional[List[float]]]: The cached response, or
+        None on a miss, and the embedding of the user input, or None if the
+        response cache is disabled.
+    """
+    if not RESPONSE_CACHE_ENABLED:
+        return None, None
+    with track("response_cache_lookup"):
+        question_embedding = get_embeddings().embed_query(user_input)
+        cached_response = response_cache.lookup(question_embedding)
+    record_cache_lookup("response", cached_response is not None)
+    if cached_response is not None:
+        logger.info("Serving cached response: %s", response_cache.stats())
+    return cached_response, question_embedding
+
+
+def _lookup_faq(user_input: str) -> Optional[str]:
+    """
+    Looks up the user input in the FAQ index.
+
+    Args:
+        user_input (str): User input.
+
+    Returns:
+        Optional[str]: The canonical answer of the matching FAQ question, or
+        None if no question matches or the FAQ fast path is disabled.
+    """
+    faq_index = _faq_index
+    if not FAQ_ENABLED or faq_index is None:
+        return None
+    with track("faq_lookup"):
+        match = faq_index.lookup(user_input)
+    record_cache_lookup("faq", match is not None)
+    if match is None:
+        return None
+    logger.info(
+        "Serving FAQ answer to %r (score %.2f, exact %s)",
+        match.question,
+        match.score,
+        match.exact,
     )
-    return chain.invoke(user_input)
+    return match.answer
+
+
+def _store_response(
+    retriever: BaseRetriever,
+    user_input: str,
+    question_embedding: Optional[List[float]],
+    response: str,
+) -> None:
+    """
+    Caches a generated response, unless the retriever it was generated with
+    has been replaced meanwhile: the rebuild cleared the responses to the
+    previous documents, and this one is stale too. A rebuild in progress holds
+    the retriever lock, so the response is then not cached rather than
+    waiting for the rebuild.
+
+    Args:
+        retriever (BaseRetriever): Retriever the response was generated with.
+        user_input (str): User input.
+        question_embedding (Optional[List[float]]): Embedding of the user
+            input, or None if the response cache is disabled.
+        response (str): Generated response.
+    """
+    if question_embedding is None:
+        return
+    # pylint: disable-next=consider-using-with
+    if not _retriever_lock.acquire(blocking=False):
+        return
+    try:
+        if retriever is _retriever:
+            response_cache.store(user_input, question_embedding, response)
+        else:
+            logger.info("Not caching response generated from replaced documents")
+    finally:
+        _retriever_lock.release()
+
+
+def last_response_source() -> Optional[str]:
+    """
+    Tells which path served the last response of the current thread.
+
+    Returns:
+        Optional[str]: RESPONSE_SOURCE_FAQ, RESPONSE_SOURCE_CACHE or
+        RESPONSE_SOURCE_MODEL, or None if this thread has not served a
+        response yet.
+    """
+    return getattr(_response_source, "value", None)
+
+
+def _set_response_source(source: str) -> None:
+    _response_source.value = source
+    RESPONSES.inc(source=source)
 
 
 def query(user_input: str) -> str:
     """
-    Processes the user's input, loads the documents, creates a vector store,
-    and generates a response.
+    Processes the user's input using the process-wide retriever and generates
+    a response. If the input matches an FAQ question, the FAQ answer is
+    returned, and if a similar enough question was answered before, the
+    cached answer is returned, both without calling the language model. The
+    path that served the response is returned by last_response_source.
 
     Args:
         user_input (str): User input.
@@ -158,10 +567,73 @@ def query(user_input: str) -> str:
         str: Generated response.
     """
     logger.info("User input: %s", user_input)
-    logger.info("Loading documents")
-    documents = load_documents("./docs/faq_albert_shoes.txt")
-    logger.info("Loading embeddings")
-    retriever = load_embeddings(documents)
+    QUERIES_IN_FLIGHT.inc()
+    try:
+        with track("query"):
+            return _query(user_input)
+    finally:
+        QUERIES_IN_FLIGHT.dec()
+
+
+def _query(user_input: str) -> str:
+    # Fetch the retriever first: a rebuild clears the response cache.
+    retriever = get_retriever()
+    faq_answer = _lookup_faq(user_input)
+    if faq_answer is not None:
+        _set_response_source(RESPONSE_SOURCE_FAQ)
+        return faq_answer
+    cached_response, question_embedding = _lookup_cached_response(user_input)
+    if cached_response is not None:
+        _set_response_source(RESPONSE_SOURCE_CACHE)
+        return cached_response
+
     logger.info("Generating response")
+    _set_response_source(RESPONSE_SOURCE_MODEL)
     response = generate_response(retriever, user_input)
+    _store_response(retriever, user_input, question_embedding, response)
     return response
+
+
+def query_stream(user_input: str) -> Iterator[str]:
+    """
+    Processes the user's input like query, but yields the response chunk by
+    chunk as it is generated. An FAQ answer or a cached response is yielded
+    as a single chunk. The full response is cached once the stream is
+    complete.
+
+    Args:
+        user_input (str): User input.
+
+    Yields:
+        str: The next chunk of the response.
+    """
+    logger.info("User input: %s", user_input)
+    QUERIES_IN_FLIGHT.inc()
+    try:
+        with track("query"):
+            yield from _query_stream(user_input)
+    finally:
+        QUERIES_IN_FLIGHT.dec()
+
+
+def _query_stream(user_input: str) -> Iterator[str]:
+    # Fetch the retriever first: a rebuild clears the response cache.
+    retriever = get_retriever()
+    faq_answer = _lookup_faq(user_input)
+    if faq_answer is not None:
+        _set_response_source(RESPONSE_SOURCE_FAQ)
+        yield faq_answer
+        return
+    cached_response, question_embedding = _lookup_cached_response(user_input)
+    if cached_response is not None:
+        _set_response_source(RESPONSE_SOURCE_CACHE)
+        yield cached_response
+        return
+
+    logger.info("Streaming response")
+    _set_response_source(RESPONSE_SOURCE_MODEL)
+    chunks = []
+    for chunk in generate_response_stream(retriever, user_input):
+        chunks.append(chunk)
+        yield chunk
+    _store_response(retriever, user_input, question_embedding, "".join(chunks))
@@ -0,0 +1,235 @@
+"""
+This module contains a token-budget-aware assembler of the context sent to the
+language model.
+
+Retrieved chunks used to be concatenated without any limit, so the prompt grew
+with the number and size of the chunks. ContextAssembler counts tokens with the
+tokenizer of the chat model (tiktoken) and adds chunks in relevance order until
+a token budget is spent. Chunks that duplicate, or mostly overlap with, a chunk
+already in the context are skipped, and a chunk that does not fit is skipped
+in favor of the next, smaller ones. The most relevant chunk is truncated to
+the budget rather than dropped if it is too large on its own, so the context is
+never empty when documents were retrieved.
+
+The number of tokens used by each request is logged and counted, so prompt
+sizes can be monitored.
+
+tiktoken downloads its encodings on first use. Where they cannot be loaded,
+for example without network access, tokens are estimated from the number of
+characters instead.
+
+Classes:
+    TokenCounter: Counts and truncates text in tokens of a model.
+    ContextAssembler: Assembles retrieved chunks into a context within a
+        token budget.
+"""
+
+import os
+import re
+import logging
+import threading
+from typing import Dict, List, Optional, Set, Tuple
+
+from langchain.schema.document import Document
+from logger_config import setup_logger
+
+LOGGING_LEVEL = (
+    int(os.getenv("LOGGING_LEVEL")) if os.getenv("LOGGING_LEVEL") else logging.DEBUG
+)
+# Rough number of characters per token of English text for OpenAI tokenizers
+CHARACTERS_PER_TOKEN = 4
+
+script_name = os.path.splitext(os.path.basename(__file__))[0]
+
+logger = setup_logger(script_name, LOGGING_LEVEL)
+
+WORD_PATTERN = re.compile(r"\w+")
+
+
+class TokenCounter:
+    """
+    Counts and truncates text in tokens of a model, with tiktoken, or with an
+    estimate based on the number of characters if the tiktoken encoding
+    cannot be loaded.
+    """
+
+    def __init__(self, model_name: str = "gpt-3.5-turbo") -> None:
+        """
+        Args:
+            model_name (str): Model whose tokenizer is used.
+        """
+        self.model_name = model_name
+        self._encoding = None
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    def _get_encoding(self):
+        # The encoding is loaded on first use, since it may be downloaded.
+        with self._lock:
+            if not self._loaded:
+                try:
+                    import tiktoken  # pylint: disable=import-outside-toplevel
+
+                    try:
+                        self._encoding = tiktoken.encoding_for_model(self.model_name)
+                    except KeyError:
+                        self._encoding = tiktoken.get_encoding("cl100k_base")
+                except Exception as e:  # pylint: disable=broad-except
+                    logger.warning(
+                        "Could not load the tiktoken encoding, estimating "
+                        "tokens from characters: %s",
+                        e,
+                    )
+                self._loaded = True
+            return self._encoding
+
+    def count(self, text: str) -> int:
+        """
+        Counts the tokens of a text.
+
+        Args:
+            text (str): The text.
+
+        Returns:
+            int: The number of tokens.
+        """
+        encoding = self._get_encoding()
+        if encoding is None:
+            return -(-len(text) // CHARACTERS_PER_TOKEN)
+        return len(encoding.encode(text))
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        """
+        Truncates a text to at most max_tokens tokens.
+
+        Args:
+            text (str): The text.
+            max_tokens (int): Maximum number of tokens.
+
+        Returns:
+            str: The truncated text.
+        """
+        encoding = self._get_encoding()
+        if encoding is None:
+            return text[: max_tokens * CHARACTERS_PER_TOKEN]
+        return encoding.decode(encoding.encode(text)[:max_tokens])
+
+
+class ContextAssembler:
+    """
+    Assembles retrieved chunks into a context of at most max_tokens tokens,
+    in relevance order, without duplicate or overlapping chunks.
+    """
+
+    def __init__(
+        self,
+        max_tokens: int = 1500,
+        overlap_threshold: float = 0.8,
+        separator: str = "\n\n",
+        token_counter: Optional[TokenCounter] = None,
+    ) -> None:
+        """
+        Args:
+            max_tokens (int): Token budget of the context.
+            overlap_threshold (float): Share of the word trigrams of a chunk
+                already in the context above which the chunk is skipped.
+            separator (str): Text placed between chunks.
+            token_counter (Optional[TokenCounter]): Counter of tokens.
+                Defaults to a counter for gpt-3.5-turbo.
+        """
+        self.max_tokens = max_tokens
+        self.overlap_threshold = overlap_threshold
+        self.separator = separator
+        self.token_counter = token_counter or TokenCounter()
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.total_tokens = 0
+        self.last_tokens = 0
+        self.skipped_overlapping = 0
+        self.skipped_over_budget = 0
+
+    @staticmethod
+    def _shingles(words: List[str]) -> Set[Tuple[str, ...]]:
+        if len(words) < 3:
+            return {tuple(words)} if words else set()
+        return {tuple(words[i : i + 3]) for i in range(len(words) - 2)}
+
+    def _overlaps(self, text: str, selected: List[str], covered: Set[Tuple]) -> bool:
+        words = WORD_PATTERN.findall(text.lower())
+        if any(f" {' '.join(words)} " in other for other in selected):
+            return True
+        shingles = self._shingles(words)
+        if not shingles:
+            return True
+        return len(shingles & covered) / len(shingles) >= self.overlap_threshold
+
+    def assemble(self, documents: List[Document]) -> Tuple[str, int]:
+        """
+        Assembles a context from documents ordered from most to least
+        relevant.
+
+        Args:
+            documents (List[Document]): The retrieved documents.
+
+        Returns:
+            Tuple[str, int]: The context and its number of tokens.
+        """
+        parts: List[str] = []
+        selected: List[str] = []
+        covered: Set[Tuple] = set()
+        used = 0
+        separator_tokens = self.token_counter.count(self.separator)
+        skipped_overlapping = skipped_over_budget = 0
+
+        for document in documents:
+            text = document.page_content.strip()
+            if self._overlaps(text, selected, covered):
+                skipped_overlapping += 1
+                continue
+            cost = self.token_counter.count(text) + (separator_tokens if parts else 0)
+            if used + cost > self.max_tokens:
+                if parts:
+                    skipped_over_budget += 1
+                    continue
+                text = self.token_counter.truncate(text, self.max_tokens)
+                cost = self.token_counter.count(text)
+            parts.append(text)
+            words = WORD_PATTERN.findall(text.lower())
+            selected.append(f" {' '.join(words)} ")
+            covered |= self._shingles(words)
+            used += cost
+
+        with self._lock:
+            self.requests += 1
+            self.total_tokens += used
+            self.last_tokens = used
+            self.skipped_overlapping += skipped_overlapping
+            self.skipped_over_budget += skipped_over_budget
+        logger.info(
+            "Context of %d tokens from %d of %d chunks (%d overlapping, "
+            "%d over budget)",
+            used,
+            len(parts),
+            len(documents),
+            skipped_overlapping,
+            skipped_over_budget,
+        )
+        return self.separator.join(parts), used
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Returns the number of requests, the tokens used by the last request
+        and by all requests, and the number of chunks skipped.
+
+        Returns:
+            Dict[str, int]: The statistics.
+        """
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "last_tokens": self.last_tokens,
+                "total_tokens": self.total_tokens,
+                "max_tokens": self.max_tokens,
+                "skipped_overlapping": self.skipped_overlapping,
+                "skipped_over_budget": self.skipped_over_budget,
+            }
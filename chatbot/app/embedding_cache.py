@@ -0,0 +1,231 @@
+"""
+This module contains an on-disk, content-addressed cache for document
+embeddings.
+
+Embeddings are keyed by a hash of the embedding model name and the chunk text,
+so re-indexing after an edit to the source documents only sends the changed
+chunks to the embedding API. The cache is stored in a SQLite database and is
+bounded in size: once it holds more than the configured number of entries, the
+least recently used entries are evicted.
+
+Classes:
+    EmbeddingCache: SQLite-backed store of embeddings keyed by content hash.
+    CachedEmbeddings: Embeddings wrapper that looks up the cache before
+        calling the underlying embeddings.
+"""
+
+import os
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from array import array
+from typing import Dict, List, Optional
+
+from langchain.schema.embeddings import Embeddings
+from logger_config import setup_logger
+
+LOGGING_LEVEL = (
+    int(os.getenv("LOGGING_LEVEL")) if os.getenv("LOGGING_LEVEL") else logging.DEBUG
+)
+script_name = os.path.splitext(os.path.basename(__file__))[0]
+
+logger = setup_logger(script_name, LOGGING_LEVEL)
+
+
+class EmbeddingCache:
+    """
+    SQLite-backed store of embeddings keyed by content hash, with least
+    recently used eviction once the number of entries exceeds max_entries.
+
+    The database is opened lazily on first use and shared between threads.
+    """
+
+    def __init__(self, path: str, max_entries: int = 10000) -> None:
+        """
+        Args:
+            path (str): Path of the SQLite database file.
+            max_entries (int): Maximum number of embeddings kept on disk.
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._connection: Optional[sqlite3.Connection] = None
+
+    @staticmethod
+    def key(model_name: str, text: str) -> str:
+        """
+        Computes the cache key of a chunk of text for an embedding model.
+
+        Args:
+            model_name (str): Name of the embedding model.
+            text (str): Text of the chunk.
+
+        Returns:
+            str: Hex digest identifying the embedding.
+        """
+        return hashlib.sha256(f"{model_name}\0{text}".encode("utf-8")).hexdigest()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._connection is None:
+            directory = os.path.dirname(self.path)
+            if directory and not os.path.exists(directory):
+                os.makedirs(directory)
+            self._connection = sqlite3.connect(self.path, check_same_thread=False)
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                "key TEXT PRIMARY KEY, vector BLOB NOT NULL, last_used REAL NOT NULL)"
+            )
+            self._connection.execute(
+                "CREATE INDEX IF NOT EXISTS embeddings_last_used "
+                "ON embeddings (last_used)"
+            )
+        return self._connection
+
+    def get_many(self, keys: List[str]) -> Dict[str, List[float]]:
+        """
+        Looks up the embeddings stored for the given keys and marks them as
+        recently used.
+
+        Args:
+            keys (List[str]): Cache keys to look up.
+
+        Returns:
+            Dict[str, List[float]]: The embeddings found, by key.
+        """
+        found: Dict[str, List[float]] = {}
+        if not keys:
+            return found
+        with self._lock:
+            connection = self._connect()
+            for key in set(keys):
+                row = connection.execute(
+                    "SELECT vector FROM embeddings WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    found[key] = array("d", row[0]).tolist()
+            connection.executemany(
+                "UPDATE embeddings SET last_used = ? WHERE key = ?",
+                [(time.time(), key) for key in found],
+            )
+            connection.commit()
+        return found
+
+    def put_many(self, vectors: Dict[str, List[float]]) -> None:
+        """
+        Stores embeddings by key and evicts the least recently used entries if
+        the cache grows beyond max_entries.
+
+        Args:
+            vectors (Dict[str, List[float]]): Embeddings to store, by key.
+        """
+        if not vectors:
+            return
+        now = time.time()
+        with self._lock:
+            connection = self._connect()
+            connection.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector, last_used) "
+                "VALUES (?, ?, ?)",
+                [
+                    (key, array("d", vector).tobytes(), now)
+                    for key, vector in vectors.items()
+                ],
+            )
+            (count,) = connection.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+            if count > self.max_entries:
+                logger.debug("Evicting %d cached embeddings", count - self.max_entries)
+                connection.execute(
+                    "DELETE FROM embeddings WHERE key IN ("
+                    "SELECT key FROM embeddings ORDER BY last_used, rowid LIMIT ?)",
+                    (count - self.max_entries,),
+                )
+            connection.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            (count,) = (
+                self._connect().execute("SELECT COUNT(*) FROM embeddings").fetchone()
+            )
+        return count
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embeddings wrapper that serves document embeddings from an EmbeddingCache
+    and only sends cache misses to the underlying embeddings. Hit and miss
+    counts are kept for reporting. It can be called from several threads, as
+    the ingestion pipeline does.
+    """
+
+    def __init__(
+        self, underlying: Embeddings, cache: EmbeddingCache, model_name: str
+    ) -> None:
+        """
+        Args:
+            underlying (Embeddings): Embeddings used for cache misses.
+            cache (EmbeddingCache): Cache of previously computed embeddings.
+            model_name (str): Name of the embedding model, part of the key.
+        """
+        self.underlying = underlying
+        self.cache = cache
+        self.model_name = model_name
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embeds a list of texts, calling the underlying embeddings only for the
+        texts that are not in the cache.
+
+        Args:
+            texts (List[str]): Texts to embed.
+
+        Returns:
+            List[List[float]]: One embedding per text.
+        """
+        keys = [self.cache.key(self.model_name, text) for text in texts]
+        vectors = self.cache.get_many(keys)
+        missing = {key: text for key, text in zip(keys, texts) if key not in vectors}
+        hits = len(texts) - sum(1 for key in keys if key in missing)
+        with self._lock:
+            self.hits += hits
+            self.misses += len(texts) - hits
+        logger.info(
+            "Embedding cache: %d hits, %d misses (%d unique)",
+            hits,
+            len(texts) - hits,
+            len(missing),
+        )
+
+        if missing:
+            embedded = self.underlying.embed_documents(list(missing.values()))
+            new_vectors = dict(zip(missing.keys(), embedded))
+            self.cache.put_many(new_vectors)
+            vectors.update(new_vectors)
+        return [vectors[key] for key in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        """
+        Embeds a query text. Queries are not cached, since they rarely repeat
+        verbatim and would crowd document embeddings out of the cache.
+
+        Args:
+            text (str): Text to embed.
+
+        Returns:
+            List[float]: The embedding.
+        """
+        return self.underlying.embed_query(text)
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Returns the cumulative cache hit and miss counts.
+
+        Returns:
+            Dict[str, int]: Hit and miss counts.
+        """
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses}
@@ -0,0 +1,187 @@
+"""
+This module contains an index of the questions of an FAQ document, used to
+answer FAQ questions without calling the language model.
+
+The FAQ is a list of question lines, each followed by its answer on lines
+starting with "* ". FAQIndex normalizes every question once, when the index is
+built: lowercase, without punctuation, possessives and common stop words. A
+user question is then looked up in two steps:
+
+1. An exact match of the normalized question, which is a dictionary lookup.
+2. A fuzzy match against the questions sharing at least one token with it,
+   found through an inverted index. Each candidate is scored with the average
+   of a token-set ratio, which tolerates extra or reordered words, and a
+   token-sort ratio, which penalizes questions sharing only a few words.
+   Since the token-set ratio ignores extra words, the score is multiplied by
+   the share of the user's tokens found anywhere in the FAQ: a word the FAQ
+   never uses, like a month in "business hours in december", narrows the
+   question to something the FAQ does not answer. A candidate is also skipped
+   unless it has the same negations as the user question, so that "not
+   environmentally friendly" never matches "environmentally friendly".
+
+The canonical answer of the best match is returned if its score reaches the
+threshold.
+
+Classes:
+    FAQMatch: A matched FAQ entry with its score.
+    FAQIndex: Index of normalized FAQ questions.
+
+Functions:
+    normalize: Normalizes a question into its content tokens.
+    parse_faq: Parses the question and answer pairs of an FAQ document.
+"""
+
+import re
+from collections import defaultdict
+from difflib import SequenceMatcher
+from typing import Dict, List, NamedTuple, Optional, Set, Tuple
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+STOP_WORDS = frozenset(
+    """a an and are can could do does for how i in is it me my of on or our s
+    the there to what whats when where which who why will with you your""".split()
+)
+# Negations, written without apostrophes as normalize removes them
+NEGATIONS = frozenset(
+    """aint arent cannot cant didnt doesnt dont isnt never no not nothing
+    wasnt without wont""".split()
+)
+
+
+class FAQMatch(NamedTuple):
+    """
+    A matched FAQ entry with its score, between 0 and 1.
+    """
+
+    question: str
+    answer: str
+    score: float
+    exact: bool
+
+
+def normalize(question: str) -> List[str]:
+    """
+    Normalizes a question into its content tokens: lowercase, without
+    punctuation, possessive "s" and stop words.
+
+    Args:
+        question (str): The question.
+
+    Returns:
+        List[str]: The content tokens, in order.
+    """
+    text = question.lower().replace("’", "'").replace("'s", "").replace("'", "")
+    return [token for token in TOKEN_PATTERN.findall(text) if token not in STOP_WORDS]
+
+
+def parse_faq(text: str) -> List[Tuple[str, str]]:
+    """
+    Parses the question and answer pairs of an FAQ document, in which each
+    question is on its own line, ending with a question mark, and is
+    followed by its answer on lines starting with "* ".
+
+    Args:
+        text (str): The FAQ document.
+
+    Returns:
+        List[Tuple[str, str]]: The questions and their answers.
+    """
+    pairs = []
+    question: Optional[str] = None
+    answer: List[str] = []
+    for line in text.splitlines():
+        line = line.strip().lstrip("﻿")
+        if line.startswith("* ") and question is not None:
+            answer.append(line[2:].strip())
+            continue
+        if question is not None and answer:
+            pairs.append((question, " ".join(answer)))
+        question = line if line.endswith("?") else None
+        answer = []
+    if question is not None and answer:
+        pairs.append((question, " ".join(answer)))
+    return pairs
+
+
+def _ratio(a: str, b: str) -> float:
+    return SequenceMatcher(None, a, b).ratio() if a or b else 1.0
+
+
+def _token_set_ratio(a: Set[str], b: Set[str]) -> float:
+    common = " ".join(sorted(a & b))
+    with_a = f"{common} {' '.join(sorted(a - b))}".strip()
+    with_b = f"{common} {' '.join(sorted(b - a))}".strip()
+    return max(_ratio(common, with_a), _ratio(common, with_b), _ratio(with_a, with_b))
+
+
+class FAQIndex:
+    """
+    Index of normalized FAQ questions, with an exact lookup table and an
+    inverted index of tokens for fuzzy matching.
+    """
+
+    def __init__(self, pairs: List[Tuple[str, str]], threshold: float = 0.9) -> None:
+        """
+        Args:
+            pairs (List[Tuple[str, str]]): The questions and their answers.
+            threshold (float): Minimum score, between 0 and 1, for a fuzzy
+                match to be returned.
+        """
+        self.pairs = pairs
+        self.threshold = threshold
+        self._exact: Dict[str, int] = {}
+        self._tokens: List[Set[str]] = []
+        self._sorted: List[str] = []
+        self._postings: Dict[str, Set[int]] = defaultdict(set)
+        for index, (question, _) in enumerate(pairs):
+            tokens = normalize(question)
+            self._exact.setdefault(" ".join(tokens), index)
+            self._tokens.append(set(tokens))
+            self._sorted.append(" ".join(sorted(tokens)))
+            for token in tokens:
+                self._postings[token].add(index)
+
+    def __len__(self) -> int:
+        return len(self.pairs)
+
+    def _match(self, index: int, score: float, exact: bool) -> FAQMatch:
+        question, answer = self.pairs[index]
+        return FAQMatch(question, answer, score, exact)
+
+    def lookup(self, question: str) -> Optional[FAQMatch]:
+        """
+        Looks up the FAQ entry matching a question.
+
+        Args:
+            question (str): The user's question.
+
+        Returns:
+            Optional[FAQMatch]: The exact match, or the best fuzzy match if
+            its score reaches the threshold, or None.
+        """
+        tokens = normalize(question)
+        if not tokens:
+            return None
+        index = self._exact.get(" ".join(tokens))
+        if index is not None:
+            return self._match(index, 1.0, True)
+
+        token_set = set(tokens)
+        sorted_tokens = " ".join(sorted(tokens))
+        negations = token_set & NEGATIONS
+        coverage = sum(token in self._postings for token in tokens) / len(tokens)
+        candidates = set().union(*(self._postings.get(t, ()) for t in token_set))
+        best_score, best_index = 0.0, -1
+        for candidate in candidates:
+            if self._tokens[candidate] & NEGATIONS != negations:
+                continue
+            ratio = (
+                _token_set_ratio(token_set, self._tokens[candidate])
+                + _ratio(sorted_tokens, self._sorted[candidate])
+            ) / 2
+            score = coverage * ratio
+            if score > best_score:
+                best_score, best_index = score, candidate
+        if best_index < 0 or best_score < self.threshold:
+            return None
+        return self._match(best_index, best_score, False)
@@ -0,0 +1,150 @@
+"""
+This module contains a hybrid retriever that combines lexical and vector
+retrieval.
+
+Many support questions hinge on exact terms such as "loyalty program" or
+"international shipping", which embedding similarity alone sometimes ranks
+too low. BM25Index is an Okapi BM25 inverted index precomputed from the
+document chunks: term frequencies, document lengths and inverse document
+frequencies are computed once when the index is built, so a lookup only
+touches the postings of the query terms.
+
+HybridRetriever fuses the BM25 ranking with the ranking of a vector retriever
+using reciprocal rank fusion, which combines rankings without having to
+calibrate BM25 scores against cosine similarities. It is a LangChain retriever
+and plugs into the LCEL chain in bot_logic like the vector retrievers.
+
+Classes:
+    BM25Index: Precomputed Okapi BM25 inverted index over documents.
+    HybridRetriever: Retriever fusing BM25 and vector retrieval rankings.
+"""
+
+import re
+import math
+from collections import Counter, defaultdict
+from typing import Dict, List, Tuple
+
+from langchain.callbacks.manager import CallbackManagerForRetrieverRun
+from langchain.schema import BaseRetriever
+from langchain.schema.document import Document
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Splits a text into lowercase alphanumeric tokens.
+
+    Args:
+        text (str): Text to tokenize.
+
+    Returns:
+        List[str]: The tokens.
+    """
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+class BM25Index:
+    """
+    Okapi BM25 inverted index over a list of documents, with the postings,
+    document lengths and inverse document frequencies computed at build time.
+    """
+
+    def __init__(self, documents: List[Document], k1: float = 1.5, b: float = 0.75):
+        """
+        Args:
+            documents (List[Document]): Documents to index.
+            k1 (float): Term frequency saturation parameter.
+            b (float): Document length normalization parameter.
+        """
+        self.documents = documents
+        self.k1 = k1
+        self.b = b
+        self.postings: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+        self.lengths: List[int] = []
+        for index, document in enumerate(documents):
+            tokens = tokenize(document.page_content)
+            self.lengths.append(len(tokens))
+            for term, count in Counter(tokens).items():
+                self.postings[term].append((index, count))
+        self.average_length = (
+            sum(self.lengths) / len(self.lengths) if self.lengths else 0.0
+        )
+        self.idf = {
+            term: math.log(
+                1 + (len(documents) - len(postings) + 0.5) / (len(postings) + 0.5)
+            )
+            for term, postings in self.postings.items()
+        }
+
+    def search(self, query: str, k: int = 4) -> List[Tuple[int, float]]:
+        """
+        Returns the k documents with the highest BM25 score for a query.
+
+        Args:
+            query (str): The query.
+            k (int): Number of documents to return.
+
+        Returns:
+            List[Tuple[int, float]]: Indexes of the documents and their
+            scores, highest score first. Documents sharing no term with the
+            query are not returned.
+        """
+        scores: Dict[int, float] = defaultdict(float)
+        for term in set(tokenize(query)):
+            idf = self.idf.get(term)
+            if idf is None:
+                continue
+            for index, count in self.postings[term]:
+                length_norm = (
+                    1 - self.b + self.b * (self.lengths[index] / self.average_length)
+                )
+                scores[index] += (
+                    idf * count * (self.k1 + 1) / (count + self.k1 * length_norm)
+                )
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+
+
+class HybridRetriever(BaseRetriever):
+    """
+    Retriever fusing the rankings of a BM25 index and a vector retriever with
+    reciprocal rank fusion. Documents are identified by their content, so a
+    chunk found by both retrievers is counted once.
+    """
+
+    vector_retriever: BaseRetriever
+    bm25_index: BM25Index
+    k: int = 4
+    fetch_k: int = 10
+    rrf_k: int = 60
+    lexical_weight: float = 1.0
+    vector_weight: float = 1.0
+
+    class Config:
+        """Configuration for this pydantic object."""
+
+        arbitrary_types_allowed = True
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        vector_documents = self.vector_retriever.get_relevant_documents(
+            query, callbacks=run_manager.get_child()
+        )
+        lexical_documents = [
+            self.bm25_index.documents[index]
+            for index, _ in self.bm25_index.search(query, self.fetch_k)
+        ]
+
+        scores: Dict[str, float] = defaultdict(float)
+        documents: Dict[str, Document] = {}
+        for weight, ranking in (
+            (self.vector_weight, vector_documents),
+            (self.lexical_weight, lexical_documents),
+        ):
+            for rank, document in enumerate(ranking):
+                documents.setdefault(document.page_content, document)
+                scores[document.page_content] += weight / (self.rrf_k + rank + 1)
+
+        ranked = sorted(scores, key=scores.get, reverse=True)
+        return [documents[content] for content in ranked[: self.k]]
@@ -0,0 +1,386 @@
+"""
+This module contains a streaming ingestion pipeline that indexes a directory of
+documents into a vector store.
+
+The pipeline never holds the whole corpus in memory:
+
+1. Document paths are listed lazily from the directory.
+2. Each file is loaded and split into chunks in a process pool.
+3. Chunks are grouped into batches of a configurable size, and each batch is
+   embedded in a thread pool, with a bounded number of batches in flight.
+4. Each embedded batch is written to the vector store as soon as it is ready,
+   in the order of the documents.
+
+The pipeline reports the number of documents and chunks it processed, and the
+documents per second and chunks per second, so index rebuilds can be sized.
+
+It can be run as a script to index a directory, relative to the current
+directory, and print the statistics as JSON, for example with the local
+embeddings from the chatbot folder:
+
+    EMBEDDING_PROVIDER=hashing python app/ingestion.py app/docs
+
+The script exits with a non-zero status if the directory does not exist or
+holds no document.
+
+Classes:
+    IngestionStats: Counts and timings of an ingestion run.
+    PrimedEmbeddings: Embeddings serving precomputed document embeddings to a
+        vector store.
+
+Functions:
+    iter_document_paths: Lazily lists the documents of a directory.
+    split_file: Loads a file and splits it into chunks.
+    bounded_map: Maps a function over an iterable on an executor, with a
+        bounded number of calls in flight.
+    ingest_directory: Indexes a directory of documents into a vector store.
+    main: Runs the ingestion of a directory from the command line.
+"""
+
+import os
+import sys
+import json
+import time
+import fnmatch
+import logging
+import threading
+import multiprocessing
+from collections import deque
+from dataclasses import dataclass, asdict
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, Deque, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from langchain.schema.document import Document
+from langchain.schema.embeddings import Embeddings
+from langchain.schema.vectorstore import VectorStore
+from langchain.text_splitter import CharacterTextSplitter
+from logger_config import setup_logger
+
+LOGGING_LEVEL = (
+    int(os.getenv("LOGGING_LEVEL")) if os.getenv("LOGGING_LEVEL") else logging.DEBUG
+)
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "64"))
+# os.cpu_count() counts the cores of the host, not those a container may use:
+# the CPUs the process may run on are counted instead, at most 4, since a CPU
+# limit does not change them.
+_AVAILABLE_CPUS = (
+    len(os.sched_getaffinity(0))
+    if hasattr(os, "sched_getaffinity")
+    else os.cpu_count() or 1
+)
+INGEST_MAX_PROCESSES = int(
+    os.getenv("INGEST_MAX_PROCESSES", str(min(_AVAILABLE_CPUS, 4)))
+)
+INGEST_MAX_CONCURRENT_BATCHES = int(os.getenv("INGEST_MAX_CONCURRENT_BATCHES", "4"))
+INGEST_FILE_PATTERN = os.getenv("INGEST_FILE_PATTERN", "*.txt")
+
+script_name = os.path.splitext(os.path.basename(__file__))[0]
+
+logger = setup_logger(script_name, LOGGING_LEVEL)
+
+
+@dataclass
+class IngestionStats:
+    """
+    Counts and timings of an ingestion run.
+    """
+
+    documents: int = 0
+    chunks: int = 0
+    batches: int = 0
+    seconds: float = 0.0
+
+    @property
+    def documents_per_second(self) -> float:
+        """
+        Returns the number of documents ingested per second.
+        """
+        return self.documents / self.seconds if self.seconds else 0.0
+
+    @property
+    def chunks_per_second(self) -> float:
+        """
+        Returns the number of chunks ingested per second.
+        """
+        return self.chunks / self.seconds if self.seconds else 0.0
+
+    def as_dict(self) -> Dict[str, float]:
+        """
+        Returns the counts, timings and rates as a dictionary.
+        """
+        return {
+            **asdict(self),
+            "documents_per_second": self.documents_per_second,
+            "chunks_per_second": self.chunks_per_second,
+        }
+
+
+class PrimedEmbeddings(Embeddings):
+    """
+    Embeddings serving precomputed document embeddings.
+
+    Vector stores embed the texts passed to add_documents themselves. To let
+    the pipeline compute embeddings concurrently and then write them, the
+    store is built with these embeddings: the pipeline primes the vectors of a
+    batch, and embed_documents returns them instead of embedding again. Texts
+    that were not primed, and queries, go to the underlying embeddings.
+    """
+
+    def __init__(self, underlying: Embeddings) -> None:
+        """
+        Args:
+            underlying (Embeddings): Embeddings used for texts that were not
+                primed and for queries.
+        """
+        self.underlying = underlying
+        self._primed: Dict[str, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def prime(self, texts: List[str], vectors: List[List[float]]) -> None:
+        """
+        Stores precomputed embeddings to be returned by embed_documents.
+
+        Args:
+            texts (List[str]): The embedded texts.
+            vectors (List[List[float]]): One embedding per text.
+        """
+        with self._lock:
+            self._primed.update(zip(texts, vectors))
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        with self._lock:
+            primed = {text: self._primed.pop(text, None) for text in texts}
+        missing = [text for text, vector in primed.items() if vector is None]
+        if missing:
+            primed.update(zip(missing, self.underlying.embed_documents(missing)))
+        return [primed[text] for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.underlying.embed_query(text)
+
+
+def iter_document_paths(directory: str, pattern: str = "*.txt") -> Iterator[str]:
+    """
+    Lazily lists the files of a directory and its subdirectories whose name
+    matches a pattern, in a stable order.
+
+    Args:
+        directory (str): Directory to list.
+        pattern (str): Shell-style pattern matched against file names.
+
+    Returns:
+        Iterator[str]: The paths of the matching files.
+
+    Raises:
+        FileNotFoundError: If the directory does not exist.
+        NotADirectoryError: If the path is not a directory.
+    """
+    # Checked before listing, since os.walk silently yields nothing for a
+    # missing directory.
+    if not os.path.exists(directory):
+        raise FileNotFoundError(f"Document directory not found: {directory}")
+    if not os.path.isdir(directory):
+        raise NotADirectoryError(f"Not a document directory: {directory}")
+    return _walk_document_paths(directory, pattern)
+
+
+def _walk_document_paths(directory: str, pattern: str) -> Iterator[str]:
+    for root, directories, files in os.walk(directory):
+        directories.sort()
+        for name in sorted(files):
+            if fnmatch.fnmatch(name, pattern):
+                yield os.path.join(root, name)
+
+
+def split_file(
+    path: str, chunk_size: int = 100, chunk_overlap: int = 0
+) -> List[Document]:
+    """
+    Loads a file and splits it into chunks, like load_documents in bot_logic.
+    This runs in the worker processes of the pipeline.
+
+    Args:
+        path (str): Path of the file.
+        chunk_size (int): Maximum size of a chunk in characters.
+        chunk_overlap (int): Overlap between consecutive chunks in characters.
+
+    Returns:
+        List[Document]: The chunks of the file.
+    """
+    # Imported here since importing the document loaders is slow.
+    # pylint: disable-next=import-outside-toplevel
+    from langchain.document_loaders.text import TextLoader
+
+    text_splitter = CharacterTextSplitter(
+        chunk_size=chunk_size, chunk_overlap=chunk_overlap
+    )
+    return text_splitter.split_documents(TextLoader(path).load())
+
+
+def bounded_map(
+    executor: Executor, function: Callable, iterable: Iterable, window: int
+) -> Iterator:
+    """
+    Maps a function over an iterable on an executor, consuming the iterable
+    lazily and keeping at most window calls in flight. Results are yielded in
+    the order of the iterable.
+
+    Args:
+        executor (Executor): Executor running the calls.
+        function (Callable): Function to call on each item.
+        iterable (Iterable): Items to map over.
+        window (int): Maximum number of calls in flight.
+
+    Yields:
+        The result of the next call.
+    """
+    pending: Deque = deque()
+    for item in iterable:
+        pending.append(executor.submit(function, item))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def _batched(
+    chunks_per_document: Iterable[List[Document]],
+    batch_size: int,
+    stats: IngestionStats,
+) -> Iterator[List[Document]]:
+    batch: List[Document] = []
+    for chunks in chunks_per_document:
+        stats.documents += 1
+        for chunk in chunks:
+            batch.append(chunk)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+    if batch:
+        yield batch
+
+
+def ingest_directory(
+    directory: str,
+    store: VectorStore,
+    embeddings: PrimedEmbeddings,
+    batch_size: int = INGEST_BATCH_SIZE,
+    max_processes: int = INGEST_MAX_PROCESSES,
+    max_concurrent_batches: int = INGEST_MAX_CONCURRENT_BATCHES,
+    pattern: str = INGEST_FILE_PATTERN,
+    on_batch: Optional[Callable[[List[Document]], None]] = None,
+) -> IngestionStats:
+    """
+    Indexes the documents of a directory into a vector store, streaming them
+    through the pipeline described in the module docstring.
+
+    Args:
+        directory (str): Directory holding the documents.
+        store (VectorStore): Vector store to write to. It must have been
+            created with the given PrimedEmbeddings.
+        embeddings (PrimedEmbeddings): Embeddings of the vector store.
+        batch_size (int): Number of chunks per embedding batch.
+        max_processes (int): Number of processes splitting documents. With 0,
+            documents are split in the calling process.
+        max_concurrent_batches (int): Maximum number of batches being
+            embedded at the same time.
+        pattern (str): Shell-style pattern of the file names to index.
+        on_batch (Optional[Callable[[List[Document]], None]]): Called with
+            each batch once it is written, for example to build a lexical
+            index alongside the vector store.
+
+    Returns:
+        IngestionStats: Counts and timings of the run.
+
+    Raises:
+        FileNotFoundError: If the directory does not exist.
+        NotADirectoryError: If the path is not a directory.
+    """
+    stats = IngestionStats()
+    start = time.perf_counter()
+    paths = iter_document_paths(directory, pattern)
+
+    def embed(batch: List[Document]) -> Tuple[List[Document], List[List[float]]]:
+        texts = [chunk.page_content for chunk in batch]
+        return batch, embeddings.underlying.embed_documents(texts)
+
+    # The worker processes are spawned rather than forked: the chatbot runs
+    # the pipeline from a process with other threads, like the warm-up thread
+    # and the log listener, and a child forked while one of them holds a lock,
+    # like a logging lock, would deadlock on it.
+    split_executor = (
+        ProcessPoolExecutor(
+            max_workers=max_processes, mp_context=multiprocessing.get_context("spawn")
+        )
+        if max_processes > 0
+        else None
+    )
+    try:
+        if split_executor is not None:
+            chunks_per_document = bounded_map(
+                split_executor, split_file, paths, max_processes * 2
+            )
+        else:
+            chunks_per_document = map(split_file, paths)
+
+        with ThreadPoolExecutor(max_workers=max_concurrent_batches) as embed_executor:
+            for batch, vectors in bounded_map(
+                embed_executor,
+                embed,
+                _batched(chunks_per_document, batch_size, stats),
+                max_concurrent_batches,
+            ):
+                embeddings.prime([chunk.page_content for chunk in batch], vectors)
+                store.add_documents(batch)
+                stats.chunks += len(batch)
+                stats.batches += 1
+                if on_batch is not None:
+                    on_batch(batch)
+                logger.debug("Wrote batch of %d chunks", len(batch))
+    finally:
+        if split_executor is not None:
+            split_executor.shutdown()
+
+    stats.seconds = time.perf_counter() - start
+    logger.info("Ingested %s: %s", directory, stats.as_dict())
+    return stats
+
+
+def main(argv: List[str]) -> int:
+    """
+    Indexes the directory given as the first command line argument, relative
+    to the current directory, or the docs directory of the chatbot, and
+    prints the statistics as JSON.
+
+    Args:
+        argv (List[str]): The command line arguments, including the script.
+
+    Returns:
+        int: The exit status: 0 on success, 1 if the directory does not exist
+        or holds no document.
+    """
+    if len(argv) > 1:
+        directory = os.path.abspath(argv[1])
+    else:
+        directory = os.path.join(os.path.dirname(os.path.abspath(__file__)), "docs")
+    # Imported here so that worker processes do not import retriever_builder.
+    # pylint: disable-next=import-outside-toplevel
+    from retriever_builder import build_index_from_directory
+
+    try:
+        _, run_stats = build_index_from_directory(directory)
+    except (FileNotFoundError, NotADirectoryError) as e:
+        print(e, file=sys.stderr)
+        return 1
+    print(json.dumps(run_stats.as_dict()))
+    if not run_stats.documents:
+        print(
+            f"No document matching {INGEST_FILE_PATTERN} in {directory}",
+            file=sys.stderr,
+        )
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -0,0 +1,89 @@
+"""
+This module contains a local, CPU-only embeddings implementation that needs no
+network access and no model download.
+
+HashingEmbeddings maps word unigrams and bigrams, and character n-grams of each
+word, into a fixed number of dimensions with a stable hash (the "hashing
+trick"). Term frequencies are scaled sublinearly and the resulting vector is
+L2-normalized, so cosine similarity reduces to a dot product like with OpenAI
+embeddings. The embeddings are deterministic across processes, which makes
+index builds reproducible and lets retrieval be exercised in CI and air-gapped
+environments.
+
+Classes:
+    HashingEmbeddings: Embeddings based on hashed word and character n-grams.
+"""
+
+import re
+import math
+import zlib
+from collections import Counter
+from typing import List
+
+from langchain.schema.embeddings import Embeddings
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+
+class HashingEmbeddings(Embeddings):
+    """
+    Embeddings based on hashed word and character n-grams, computed locally.
+    """
+
+    def __init__(self, n_features: int = 1024, char_ngram_range=(3, 4)) -> None:
+        """
+        Args:
+            n_features (int): Number of dimensions of the embeddings.
+            char_ngram_range (tuple): Minimum and maximum length of the
+                character n-grams taken from each word.
+        """
+        self.n_features = n_features
+        self.char_ngram_range = char_ngram_range
+        self.model = f"hashing-{n_features}"
+
+    def _features(self, text: str) -> Counter:
+        words = TOKEN_PATTERN.findall(text.lower())
+        features = Counter(f"w:{word}" for word in words)
+        features.update(f"b:{a} {b}" for a, b in zip(words, words[1:]))
+        low, high = self.char_ngram_range
+        for word in words:
+            padded = f"<{word}>"
+            for n in range(low, high + 1):
+                features.update(
+                    f"c:{padded[i:i + n]}" for i in range(len(padded) - n + 1)
+                )
+        return features
+
+    def _embed(self, text: str) -> List[float]:
+        vector = [0.0] * self.n_features
+        for feature, count in self._features(text).items():
+            digest = zlib.crc32(feature.encode("utf-8"))
+            # The lowest bit picks the sign so that collisions tend to cancel.
+            sign = 1.0 if digest & 1 else -1.0
+            vector[(digest >> 1) % self.n_features] += sign * (1 + math.log(count))
+        norm = math.sqrt(sum(value * value for value in vector))
+        return [value / norm for value in vector] if norm else vector
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embeds a list of texts.
+
+        Args:
+            texts (List[str]): Texts to embed.
+
+        Returns:
+            List[List[float]]: One embedding per text.
+        """
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        """
+        Embeds a query text.
+
+        Args:
+            text (str): Text to embed.
+
+        Returns:
+            List[float]: The embedding.
+        """
+        return self._embed(text)
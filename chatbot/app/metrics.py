@@ -0,0 +1,330 @@
+"""
+This module contains the metrics of the chatbot, exposed in the Prometheus
+text format.
+
+Stage durations are aggregated into histograms, and cache lookups, responses
+and errors into counters. The metrics are kept in memory by a process-wide
+registry, and serve.py exposes them on GET /metrics of its side port, next to
+the readiness endpoint, for Prometheus to scrape and for custom autoscaling.
+
+The registry implements the small subset of the Prometheus client that the
+chatbot needs, so no additional dependency is required.
+
+Classes:
+    Counter: Monotonic counter with labels.
+    Gauge: Value that goes up and down, with labels.
+    Histogram: Histogram of observed values with labels.
+    MetricsRegistry: Registry of metrics rendering them in the text format.
+
+Functions:
+    track: Context manager timing a stage and counting its errors.
+    record_cache_lookup: Counts a cache hit or miss.
+
+Metrics:
+    STAGE_DURATION: Duration of each stage of the pipeline in seconds.
+    STAGE_ERRORS: Number of errors raised by each stage.
+    CACHE_LOOKUPS: Number of cache lookups by cache and result.
+    RESPONSES: Number of responses by the path that served them.
+    QUERIES_IN_FLIGHT: Number of queries being processed.
+"""
+
+import time
+import bisect
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Sequence, Tuple
+
+DEFAULT_BUCKETS = (
+    0.001,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+)
+
+
+def _escape(value: str, quotes: bool = True) -> str:
+    value = value.replace("\\", "\\\\").replace("\n", "\\n")
+    return value.replace('"', '\\"') if quotes else value
+
+
+def _format_labels(pairs: Sequence[Tuple[str, str]]) -> str:
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class _Metric:
+    """
+    Base class of the metrics, holding one value per combination of labels.
+    """
+
+    metric_type = "untyped"
+
+    def __init__(self, name: str, documentation: str, label_names=()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple[str, ...], object] = {}
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        if set(labels) != set(self.label_names):
+            raise ValueError(
+                f"{self.name} expects labels {self.label_names}, got {tuple(labels)}"
+            )
+        return tuple(str(labels[name]) for name in self.label_names)
+
+    def _samples(self) -> List[Tuple[str, Sequence[Tuple[str, str]], float]]:
+        raise NotImplementedError
+
+    def expose(self) -> str:
+        """
+        Renders the metric in the Prometheus text format.
+
+        Returns:
+            str: The HELP and TYPE lines followed by one line per sample.
+        """
+        lines = [
+            f"# HELP {self.name} {_escape(self.documentation, quotes=False)}",
+            f"# TYPE {self.name} {self.metric_type}",
+        ]
+        for name, labels, value in self._samples():
+            lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    """
+    Monotonic counter with labels.
+    """
+
+    metric_type = "counter"
+
+    def __init__(self, name: str, documentation: str, label_names=()) -> None:
+        super().__init__(name, documentation, label_names)
+        if not self.label_names:
+            # A metric without labels is exposed from the start.
+            self._values[()] = 0
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        """
+        Increments the counter of the given labels.
+
+        Args:
+            amount (float): Non-negative amount to add.
+            **labels (str): Value of each label.
+        """
+        if amount < 0:
+            raise ValueError("Counters can only be incremented")
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels: str) -> float:
+        """
+        Returns the counter of the given labels.
+        """
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def _samples(self):
+        with self._lock:
+            return [
+                (self.name, tuple(zip(self.label_names, key)), value)
+                for key, value in sorted(self._values.items())
+            ]
+
+
+class Gauge(Counter):
+    """
+    Value that goes up and down, with labels.
+    """
+
+    metric_type = "gauge"
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels: str) -> None:
+        """
+        Decrements the gauge of the given labels.
+        """
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels: str) -> None:
+        """
+        Sets the gauge of the given labels.
+        """
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(_Metric):
+    """
+    Histogram of observed values with labels, with cumulative buckets as in
+    Prometheus.
+    """
+
+    metric_type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        label_names=(),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> None:
+        super().__init__(name, documentation, label_names)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels: str) -> None:
+        """
+        Records an observation for the given labels.
+
+        Args:
+            value (float): The observed value.
+            **labels (str): Value of each label.
+        """
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            # Bucket counts, with the count of larger values last, and sum.
+            entry = self._values.setdefault(key, [[0] * (len(self.buckets) + 1), 0.0])
+            entry[0][index] += 1
+            entry[1] += value
+
+    def count(self, **labels: str) -> int:
+        """
+        Returns the number of observations of the given labels.
+        """
+        with self._lock:
+            entry = self._values.get(self._key(labels))
+            return sum(entry[0]) if entry else 0
+
+    def _samples(self):
+        samples = []
+        with self._lock:
+            for key, (counts, total) in sorted(self._values.items()):
+                labels = tuple(zip(self.label_names, key))
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                    cumulative += bucket_count
+                    bucket_labels = labels + (("le", _format_value(bound)),)
+                    samples.append((f"{self.name}_bucket", bucket_labels, cumulative))
+                samples.append((f"{self.name}_sum", labels, total))
+                samples.append((f"{self.name}_count", labels, cumulative))
+        return samples
+
+
+class MetricsRegistry:
+    """
+    Registry of metrics, rendering them in the Prometheus text format.
+    """
+
+    def __init__(self) -> None:
+        self._metrics: List[_Metric] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        """
+        Adds a metric to the registry.
+
+        Args:
+            metric (_Metric): The metric.
+
+        Returns:
+            _Metric: The metric.
+        """
+        self._metrics.append(metric)
+        return metric
+
+    def expose(self) -> str:
+        """
+        Renders every metric in the Prometheus text format.
+
+        Returns:
+            str: The metrics.
+        """
+        return "\n".join(metric.expose() for metric in self._metrics) + "\n"
+
+
+registry = MetricsRegistry()
+STAGE_DURATION = registry.register(
+    Histogram(
+        "chatbot_stage_duration_seconds",
+        "Duration of each stage of the chatbot in seconds.",
+        ["stage"],
+    )
+)
+STAGE_ERRORS = registry.register(
+    Counter(
+        "chatbot_stage_errors_total",
+        "Number of errors raised by each stage of the chatbot.",
+        ["stage"],
+    )
+)
+CACHE_LOOKUPS = registry.register(
+    Counter(
+        "chatbot_cache_lookups_total",
+        "Number of cache lookups by cache and result (hit or miss).",
+        ["cache", "result"],
+    )
+)
+RESPONSES = registry.register(
+    Counter(
+        "chatbot_responses_total",
+        "Number of responses by the path that served them.",
+        ["source"],
+    )
+)
+QUERIES_IN_FLIGHT = registry.register(
+    Gauge("chatbot_queries_in_flight", "Number of queries being processed.")
+)
+
+
+@contextmanager
+def track(stage: str) -> Iterator[None]:
+    """
+    Times the enclosed block into the stage duration histogram, and counts
+    it as an error of the stage if it raises an exception. A generator
+    closed before it is exhausted is timed, but not counted as an error.
+
+    Args:
+        stage (str): Name of the stage.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        STAGE_ERRORS.inc(stage=stage)
+        raise
+    finally:
+        STAGE_DURATION.observe(time.perf_counter() - start, stage=stage)
+
+
+def record_cache_lookup(cache: str, hit: bool) -> None:
+    """
+    Counts a cache lookup.
+
+    Args:
+        cache (str): Name of the cache.
+        hit (bool): Whether the lookup was a hit.
+    """
+    CACHE_LOOKUPS.inc(cache=cache, result="hit" if hit else "miss")
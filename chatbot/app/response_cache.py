@@ -0,0 +1,145 @@
+"""
+This module contains a semantic cache of chatbot responses.
+
+Questions that customers ask are often the same question phrased differently.
+The cache stores the embedding of each answered question together with its
+answer. A new question whose embedding is similar enough to a cached one, by
+cosine similarity, is answered from the cache without calling the language
+model.
+
+Entries expire after a time to live, and the least recently used entry is
+evicted once the cache is full. The cache must be cleared whenever the
+documents the answers were generated from change.
+
+Classes:
+    SemanticResponseCache: Thread-safe cache of answers keyed by question
+        embedding.
+"""
+
+import time
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+
+class SemanticResponseCache:
+    """
+    Thread-safe cache of answers keyed by question embedding, with a
+    similarity threshold, a time to live and least recently used eviction.
+    """
+
+    def __init__(
+        self,
+        threshold: float = 0.95,
+        ttl_seconds: float = 3600,
+        max_entries: int = 512,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        """
+        Args:
+            threshold (float): Minimum cosine similarity between two questions
+                for the cached answer to be reused.
+            ttl_seconds (float): Number of seconds an answer stays cached.
+            max_entries (int): Maximum number of cached answers.
+            clock (Callable[[], float]): Source of the current time in seconds.
+        """
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, Tuple[np.ndarray, str, float]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _normalize(embedding: List[float]) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _expire(self, now: float) -> None:
+        expired = [
+            question
+            for question, (_, _, stored_at) in self._entries.items()
+            if now - stored_at > self.ttl_seconds
+        ]
+        for question in expired:
+            del self._entries[question]
+
+    def lookup(self, embedding: List[float]) -> Optional[str]:
+        """
+        Returns the cached answer of the most similar question, if its
+        similarity is at least the threshold.
+
+        Args:
+            embedding (List[float]): Embedding of the new question.
+
+        Returns:
+            Optional[str]: The cached answer, or None on a cache miss.
+        """
+        vector = self._normalize(embedding)
+        with self._lock:
+            self._expire(self._clock())
+            best_question, best_similarity = None, self.threshold
+            for question, (cached_vector, _, _) in self._entries.items():
+                similarity = float(np.dot(vector, cached_vector))
+                if similarity >= best_similarity:
+                    best_question, best_similarity = question, similarity
+
+            if best_question is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._entries.move_to_end(best_question)
+            return self._entries[best_question][1]
+
+    def store(self, question: str, embedding: List[float], answer: str) -> None:
+        """
+        Caches the answer to a question, evicting the least recently used
+        answer if the cache is full.
+
+        Args:
+            question (str): The question that was answered.
+            embedding (List[float]): Embedding of the question.
+            answer (str): The answer to cache.
+        """
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[question] = (
+                self._normalize(embedding),
+                answer,
+                self._clock(),
+            )
+            self._entries.move_to_end(question)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """
+        Removes every cached answer.
+        """
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Returns the number of cached answers and the cumulative hit and miss
+        counts.
+
+        Returns:
+            Dict[str, int]: Size, hit and miss counts.
+        """
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
@@ -0,0 +1,581 @@
+"""
+This module contains the retriever plumbing of the chatbot: the embeddings,
+the loading and splitting of the source documents, the vector stores and
+their persistence, and the retrievers built over them.
+
+A retriever is persisted under a directory of VECTOR_STORE_DIR keyed by the
+vector store backend, the fingerprint of the embeddings and the hash of the
+documents, so that a restart reuses the stored embeddings instead of
+embedding the documents again, and never reuses embeddings of another
+provider, model or dimension. A directory
+of documents is indexed with the streaming ingestion pipeline. Documents are
+embedded through the on-disk embedding cache.
+
+The OpenAI embeddings, the document loaders and the Chroma vector store are
+imported on first use, through get_embeddings, load_documents and the Chroma
+backend, since importing them takes most of the time needed to import the
+chatbot.
+
+Functions:
+    create_embeddings: Creates the embeddings for the configured provider.
+    get_embeddings: Returns the process-wide embeddings, creating them on
+        first use.
+    resolve_path: Converts a path relative to the chatbot application into an
+        absolute path.
+    load_documents: Loads a file and splits it into Document objects.
+    load_embeddings: Creates a vector store from a list of Document objects,
+        using the Chroma or the in-memory NumPy backend.
+    build_index_from_directory: Indexes a directory of documents with the
+        streaming ingestion pipeline.
+    build_hybrid_retriever: Combines a vector retriever with a BM25 index built
+        from the same documents.
+    hash_documents: Computes a content hash used to key the persisted vector
+        store.
+    hash_directory: Computes a content hash of the documents of a directory.
+    embeddings_fingerprint: Identifies the embedding space of the embeddings.
+    source_version: Returns the modification times of the source documents.
+    prune_persist_dirs: Removes the vector stores of older documents.
+    load_retriever: Builds or reloads the retriever over the source documents.
+"""
+
+import os
+import shutil
+import hashlib
+import logging
+import threading
+from typing import Callable, List, Optional, Tuple
+
+from dotenv import load_dotenv
+from langchain.schema.document import Document
+from langchain.text_splitter import (
+    CharacterTextSplitter,
+)
+from langchain.schema import BaseRetriever
+from langchain.vectorstores.base import VectorStore, VectorStoreRetriever
+from langchain.schema.embeddings import Embeddings
+from logger_config import setup_logger
+from embedding_cache import EmbeddingCache, CachedEmbeddings
+from vector_store import NumpyVectorStore
+from local_embeddings import HashingEmbeddings
+from hybrid_retriever import BM25Index, HybridRetriever
+from metrics import CACHE_LOOKUPS, track
+from ingestion import (
+    INGEST_FILE_PATTERN,
+    IngestionStats,
+    PrimedEmbeddings,
+    ingest_directory,
+    iter_document_paths,
+    split_file,
+)
+
+load_dotenv()
+
+# "openai" or "hashing"
+EMBEDDING_PROVIDER = os.getenv("EMBEDDING_PROVIDER", "openai")
+HASHING_EMBEDDING_FEATURES = int(os.getenv("HASHING_EMBEDDING_FEATURES", "1024"))
+# "chroma" or "numpy"
+VECTOR_STORE_BACKEND = os.getenv("VECTOR_STORE_BACKEND", "chroma")
+# "hybrid" fuses BM25 and vector retrieval, "vector" uses vector retrieval only
+RETRIEVER_MODE = os.getenv("RETRIEVER_MODE", "hybrid")
+RETRIEVER_K = int(os.getenv("RETRIEVER_K", "4"))
+RETRIEVER_FETCH_K = int(os.getenv("RETRIEVER_FETCH_K", "10"))
+VECTOR_STORE_DIR = os.getenv(
+    "VECTOR_STORE_DIR", os.path.join(os.path.dirname(__file__), ".vector_store")
+)
+EMBEDDING_CACHE_PATH = os.getenv(
+    "EMBEDDING_CACHE_PATH",
+    os.path.join(os.path.dirname(__file__), ".embedding_cache", "embeddings.sqlite3"),
+)
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "10000"))
+LOGGING_LEVEL = (
+    int(os.getenv("LOGGING_LEVEL")) if os.getenv("LOGGING_LEVEL") else logging.DEBUG
+)
+script_name = os.path.splitext(os.path.basename(__file__))[0]
+
+logger = setup_logger(script_name, LOGGING_LEVEL)
+
+
+def create_embeddings(provider: str = EMBEDDING_PROVIDER) -> Embeddings:
+    """
+    Creates the embeddings used to index documents and embed questions.
+
+    Args:
+        provider (str): "openai" for OpenAI embeddings, which need network
+            access, or "hashing" for local hashed n-gram embeddings, which run
+            on the CPU without network access. Defaults to EMBEDDING_PROVIDER.
+
+    Returns:
+        Embeddings: The embeddings. Both providers expose the model name as
+        the "model" attribute, which keys the embedding cache.
+
+    Raises:
+        ValueError: If the provider is not supported.
+    """
+    if provider == "openai":
+        # pylint: disable-next=import-outside-toplevel
+        from langchain.embeddings.openai import OpenAIEmbeddings
+
+        return OpenAIEmbeddings()
+    if provider == "hashing":
+        return HashingEmbeddings(HASHING_EMBEDDING_FEATURES)
+    raise ValueError(f"Unsupported embedding provider: {provider}")
+
+
+embedding_cache = EmbeddingCache(EMBEDDING_CACHE_PATH, EMBEDDING_CACHE_MAX_ENTRIES)
+
+# The embeddings are created on first use.
+_embeddings_lock = threading.Lock()
+_embeddings: Optional[Embeddings] = None
+
+
+def get_embeddings() -> Embeddings:
+    """
+    Returns the process-wide embeddings of the configured provider, creating
+    them on first use.
+
+    Returns:
+        Embeddings: The embeddings.
+    """
+    global _embeddings  # pylint: disable=global-statement
+
+    with _embeddings_lock:
+        if _embeddings is None:
+            _embeddings = create_embeddings()
+        return _embeddings
+
+
+def resolve_path(relative_path: str) -> str:
+    """
+    Converts a path relative to this script's directory into an absolute path.
+
+    Args:
+        relative_path (str): Relative path to the file.
+
+    Returns:
+        str: Absolute path to the file.
+    """
+    script_dir = os.path.dirname(__file__)
+    return os.path.join(script_dir, relative_path)
+
+
+def load_documents(relative_path: str) -> List[Document]:
+    """
+    Loads a file from the relative path, splits it into chunks, and returns a
+    list of Document objects.
+
+    Args:
+        relative_path (str): Relative path to the file.
+
+    Returns:
+        List[Document]: List of Document objects.
+    """
+    logger.debug("Loading documents from %s", relative_path)
+    absolute_path = resolve_path(relative_path)
+    logger.debug("Relative path: %s converted to %s", relative_path, absolute_path)
+
+    # pylint: disable-next=import-outside-toplevel
+    from langchain.document_loaders.text import TextLoader
+
+    with track("load_documents"):
+        logger.debug("Loading documents from %s", absolute_path)
+        raw_documents = TextLoader(absolute_path).load()
+        logger.debug("Loaded %d documents", len(raw_documents))
+        logger.info("Splitting documents")
+        text_splitter = CharacterTextSplitter(chunk_size=100, chunk_overlap=0)
+        return text_splitter.split_documents(raw_documents)
+
+
+def _load_chroma(
+    documents: List[Document],
+    embedding: Embeddings,
+    persist_directory: Optional[str],
+) -> VectorStore:
+    """
+    Loads the Chroma collection persisted in a directory, or creates it from a
+    list of Document objects if the directory holds no collection.
+
+    Args:
+        documents (List[Document]): List of Document objects.
+        embedding (Embeddings): Embeddings for documents and queries.
+        persist_directory (Optional[str]): Directory where Chroma persists the
+            collection, or None to keep the collection in memory.
+
+    Returns:
+        VectorStore: The Chroma vector store.
+    """
+    # pylint: disable-next=import-outside-toplevel
+    from langchain.vectorstores.chroma import Chroma
+
+    if persist_directory and os.path.isdir(persist_directory):
+        db = Chroma(persist_directory=persist_directory, embedding_function=embedding)
+        if db.get(limit=1, include=[])["ids"]:
+            logger.debug("Reusing vector store persisted in %s", persist_directory)
+            return db
+    logger.debug("Creating Chroma vector store from %d documents", len(documents))
+    return Chroma.from_documents(
+        documents, embedding, persist_directory=persist_directory
+    )
+
+
+def _load_numpy(
+    documents: List[Document],
+    embedding: Embeddings,
+    persist_directory: Optional[str],
+) -> VectorStore:
+    """
+    Loads the NumPy vector store saved in a directory, or creates it from a
+    list of Document objects and saves it if the directory holds no store.
+
+    Args:
+        documents (List[Document]): List of Document objects.
+        embedding (Embeddings): Embeddings for documents and queries.
+        persist_directory (Optional[str]): Directory where the store is
+            saved, or None to keep the store in memory only.
+
+    Returns:
+        VectorStore: The NumPy vector store.
+    """
+    if persist_directory and NumpyVectorStore.exists(persist_directory):
+        logger.debug("Reusing vector store persisted in %s", persist_directory)
+        return NumpyVectorStore.load(persist_directory, embedding)
+    logger.debug("Creating NumPy vector store from %d documents", len(documents))
+    db = NumpyVectorStore.from_documents(documents, embedding)
+    if persist_directory:
+        db.save(persist_directory)
+    return db
+
+
+def load_embeddings(
+    documents: List[Document],
+    persist_directory: Optional[str] = None,
+    backend: str = VECTOR_STORE_BACKEND,
+) -> VectorStoreRetriever:
+    """
+    Create a vector store from a list of Document objects.
+
+    If a persist directory is given and already holds a vector store, the
+    stored embeddings are reused instead of embedding the documents again.
+    Otherwise the documents are embedded through the on-disk embedding cache,
+    so only chunks that have not been embedded before reach the embedding
+    provider.
+
+    Args:
+        documents (List[Document]): List of Document objects.
+        persist_directory (Optional[str]): Directory where the vector store is
+            persisted. Defaults to None, which keeps the store in memory.
+        backend (str): "chroma" for the Chroma vector store or "numpy" for the
+            in-memory NumPy vector store. Defaults to VECTOR_STORE_BACKEND.
+
+    Returns:
+        VectorStoreRetriever: Retriever over the vector store.
+
+    Raises:
+        ValueError: If the backend is not supported.
+    """
+    loaders = {"chroma": _load_chroma, "numpy": _load_numpy}
+    if backend not in loaders:
+        raise ValueError(f"Unsupported vector store backend: {backend}")
+
+    embeddings = get_embeddings()
+    cached_embeddings = CachedEmbeddings(embeddings, embedding_cache, embeddings.model)
+    with track("load_embeddings"):
+        db = loaders[backend](documents, cached_embeddings, persist_directory)
+    cache_stats = cached_embeddings.stats()
+    logger.info("Embedding cache stats: %s", cache_stats)
+    CACHE_LOOKUPS.inc(cache_stats["hits"], cache="embedding", result="hit")
+    CACHE_LOOKUPS.inc(cache_stats["misses"], cache="embedding", result="miss")
+
+    return db.as_retriever()
+
+
+def _create_store(
+    backend: str, embedding: Embeddings, persist_directory: Optional[str]
+) -> VectorStore:
+    """
+    Creates an empty vector store for the ingestion pipeline to write to.
+
+    Args:
+        backend (str): "chroma" or "numpy".
+        embedding (Embeddings): Embeddings for documents and queries.
+        persist_directory (Optional[str]): Directory where Chroma persists the
+            collection. The NumPy store is saved once ingestion is done.
+
+    Returns:
+        VectorStore: The empty vector store.
+
+    Raises:
+        ValueError: If the backend is not supported.
+    """
+    if backend == "chroma":
+        # pylint: disable-next=import-outside-toplevel
+        from langchain.vectorstores.chroma import Chroma
+
+        return Chroma(persist_directory=persist_directory, embedding_function=embedding)
+    if backend == "numpy":
+        return NumpyVectorStore(embedding)
+    raise ValueError(f"Unsupported vector store backend: {backend}")
+
+
+def build_index_from_directory(
+    relative_path: str,
+    persist_directory: Optional[str] = None,
+    backend: str = VECTOR_STORE_BACKEND,
+    on_batch: Optional[Callable[[List[Document]], None]] = None,
+) -> Tuple[VectorStoreRetriever, IngestionStats]:
+    """
+    Indexes the documents of a directory with the streaming ingestion
+    pipeline: files are split in a process pool, chunks are embedded in
+    concurrent batches through the embedding cache, and each batch is written
+    to the vector store as soon as it is embedded.
+
+    Args:
+        relative_path (str): Relative path to the directory.
+        persist_directory (Optional[str]): Directory where the vector store is
+            persisted. Defaults to None, which keeps the store in memory.
+        backend (str): "chroma" or "numpy". Defaults to VECTOR_STORE_BACKEND.
+        on_batch (Optional[Callable[[List[Document]], None]]): Called with
+            each batch of chunks once it is written.
+
+    Returns:
+        Tuple[VectorStoreRetriever, IngestionStats]: Retriever over the vector
+        store, and the counts and timings of the ingestion.
+    """
+    embeddings = get_embeddings()
+    cached_embeddings = CachedEmbeddings(embeddings, embedding_cache, embeddings.model)
+    primed_embeddings = PrimedEmbeddings(cached_embeddings)
+    db = _create_store(backend, primed_embeddings, persist_directory)
+    try:
+        stats = ingest_directory(
+            resolve_path(relative_path), db, primed_embeddings, on_batch=on_batch
+        )
+    except Exception:
+        # A partially written store must not be reused by the next build.
+        if persist_directory:
+            shutil.rmtree(persist_directory, ignore_errors=True)
+        raise
+    if backend == "numpy" and persist_directory:
+        db.save(persist_directory)
+    logger.info("Embedding cache stats: %s", cached_embeddings.stats())
+    return db.as_retriever(), stats
+
+
+def _is_persisted(backend: str, persist_directory: str) -> bool:
+    """
+    Checks whether a vector store of the given backend has been persisted in
+    a directory.
+
+    Args:
+        backend (str): "chroma" or "numpy".
+        persist_directory (str): Directory to check.
+
+    Returns:
+        bool: True if the directory holds a vector store.
+    """
+    if backend == "numpy":
+        return NumpyVectorStore.exists(persist_directory)
+    return os.path.isfile(os.path.join(persist_directory, "chroma.sqlite3"))
+
+
+def build_hybrid_retriever(
+    documents: List[Document], vector_retriever: VectorStoreRetriever
+) -> HybridRetriever:
+    """
+    Builds a BM25 inverted index from a list of Document objects and combines
+    it with a vector retriever over the same documents. Both retrievers fetch
+    RETRIEVER_FETCH_K candidates, and the RETRIEVER_K best documents of the
+    fused ranking are returned.
+
+    Args:
+        documents (List[Document]): List of Document objects.
+        vector_retriever (VectorStoreRetriever): Retriever over the vector
+            store built from the documents.
+
+    Returns:
+        HybridRetriever: The hybrid retriever.
+    """
+    logger.debug("Building BM25 index from %d documents", len(documents))
+    vector_retriever.search_kwargs = {"k": RETRIEVER_FETCH_K}
+    with track("build_bm25_index"):
+        bm25_index = BM25Index(documents)
+    return HybridRetriever(
+        vector_retriever=vector_retriever,
+        bm25_index=bm25_index,
+        k=RETRIEVER_K,
+        fetch_k=RETRIEVER_FETCH_K,
+    )
+
+
+def hash_documents(documents: List[Document]) -> str:
+    """
+    Computes a content hash of a list of Document objects. The hash changes
+    whenever the text of any chunk changes, so it can be used to key a
+    persisted vector store.
+
+    Args:
+        documents (List[Document]): List of Document objects.
+
+    Returns:
+        str: Hex digest of the documents' content.
+    """
+    digest = hashlib.sha256()
+    for document in documents:
+        digest.update(document.page_content.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()[:16]
+
+
+def hash_directory(absolute_path: str) -> str:
+    """
+    Computes a content hash of the documents of a directory, reading them one
+    at a time. The hash changes whenever a document is added, removed,
+    renamed or modified.
+
+    Args:
+        absolute_path (str): Absolute path to the directory.
+
+    Returns:
+        str: Hex digest of the documents' names and content.
+    """
+    digest = hashlib.sha256()
+    for path in iter_document_paths(absolute_path, INGEST_FILE_PATTERN):
+        digest.update(os.path.relpath(path, absolute_path).encode("utf-8"))
+        digest.update(b"\0")
+        with open(path, "rb") as file:
+            for block in iter(lambda: file.read(65536), b""):
+                digest.update(block)
+        digest.update(b"\0")
+    return digest.hexdigest()[:16]
+
+
+def embeddings_fingerprint(embeddings: Embeddings) -> str:
+    """
+    Computes a fingerprint of the embedding space of the embeddings, from the
+    provider, the model name and the dimension, so that vectors of different
+    spaces are never stored under the same key.
+
+    Args:
+        embeddings (Embeddings): The embeddings.
+
+    Returns:
+        str: Hex digest of the provider, model and dimension.
+    """
+    dimension = getattr(embeddings, "n_features", None) or getattr(
+        embeddings, "dimensions", None
+    )
+    key = f"{EMBEDDING_PROVIDER}\0{embeddings.model}\0{dimension}"
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()[:8]
+
+
+def _store_name(content_hash: str) -> str:
+    """
+    Returns the name of the persist directory of the vector store of the
+    documents with the given hash, for the configured backend and embeddings.
+    """
+    fingerprint = embeddings_fingerprint(get_embeddings())
+    return f"{VECTOR_STORE_BACKEND}-{fingerprint}-{content_hash}"
+
+
+def source_version(relative_path: str) -> tuple:
+    """
+    Returns the modification times of the source file, or of every document
+    of the source directory, so that changes can be detected without reading
+    the documents. For a directory, every document is listed, so callers
+    should not check it on every request.
+
+    Args:
+        relative_path (str): Relative path to the source file or directory.
+
+    Returns:
+        tuple: The source path and modification times.
+    """
+    absolute_path = resolve_path(relative_path)
+    if not os.path.isdir(absolute_path):
+        return (relative_path, os.stat(absolute_path).st_mtime_ns)
+    return (relative_path,) + tuple(
+        (path, os.stat(path).st_mtime_ns)
+        for path in iter_document_paths(absolute_path, INGEST_FILE_PATTERN)
+    )
+
+
+def prune_persist_dirs(*keep: Optional[str]) -> None:
+    """
+    Removes persisted vector stores built from older versions of the source
+    documents, or with other embeddings or another backend.
+
+    Args:
+        *keep (Optional[str]): Names of the persist directories that are
+            still in use. None is ignored.
+    """
+    if not os.path.isdir(VECTOR_STORE_DIR):
+        return
+    for name in os.listdir(VECTOR_STORE_DIR):
+        if name not in keep:
+            logger.debug("Removing stale vector store %s", name)
+            shutil.rmtree(os.path.join(VECTOR_STORE_DIR, name), ignore_errors=True)
+
+
+def _build_directory_retriever(relative_path: str) -> Tuple[BaseRetriever, str]:
+    """
+    Indexes the documents of a directory with the ingestion pipeline, or
+    reuses the vector store persisted for the same documents. In hybrid mode,
+    the chunks are collected for the BM25 index as they are ingested, or
+    split again without embedding them when the vector store is reused.
+
+    Args:
+        relative_path (str): Relative path to the source directory.
+
+    Returns:
+        Tuple[BaseRetriever, str]: Retriever over the documents, and the name
+        of the persist directory of the vector store.
+    """
+    absolute_path = resolve_path(relative_path)
+    store_name = _store_name(hash_directory(absolute_path))
+    persist_directory = os.path.join(VECTOR_STORE_DIR, store_name)
+    documents: List[Document] = []
+    if _is_persisted(VECTOR_STORE_BACKEND, persist_directory):
+        logger.info("Loading embeddings for vector store %s", store_name)
+        retriever = load_embeddings([], persist_directory)
+        if RETRIEVER_MODE == "hybrid":
+            for path in iter_document_paths(absolute_path, INGEST_FILE_PATTERN):
+                documents.extend(split_file(path))
+    else:
+        logger.info("Ingesting %s into vector store %s", relative_path, store_name)
+        retriever, _ = build_index_from_directory(
+            relative_path,
+            persist_directory,
+            on_batch=documents.extend if RETRIEVER_MODE == "hybrid" else None,
+        )
+    if RETRIEVER_MODE == "hybrid":
+        return build_hybrid_retriever(documents, retriever), store_name
+    return retriever, store_name
+
+
+def load_retriever(relative_path: str) -> Tuple[BaseRetriever, str]:
+    """
+    Builds the retriever over the source file or directory, reusing the
+    vector store persisted for the same documents if there is one. In hybrid
+    mode, the vector retriever is combined with a BM25 index of the same
+    documents; otherwise it returns the RETRIEVER_K nearest documents.
+
+    Args:
+        relative_path (str): Relative path to the source file or directory.
+
+    Returns:
+        Tuple[BaseRetriever, str]: Retriever over the documents, and the name
+        of the persist directory of the vector store.
+    """
+    if os.path.isdir(resolve_path(relative_path)):
+        retriever, store_name = _build_directory_retriever(relative_path)
+    else:
+        logger.info("Loading documents")
+        documents = load_documents(relative_path)
+        store_name = _store_name(hash_documents(documents))
+        logger.info("Loading embeddings for vector store %s", store_name)
+        retriever = load_embeddings(
+            documents, os.path.join(VECTOR_STORE_DIR, store_name)
+        )
+        if RETRIEVER_MODE == "hybrid":
+            retriever = build_hybrid_retriever(documents, retriever)
+    if RETRIEVER_MODE != "hybrid":
+        retriever.search_kwargs = {"k": RETRIEVER_K}
+    return retriever, store_name
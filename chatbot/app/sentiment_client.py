@@ -0,0 +1,617 @@
+"""
+This module contains the client-side plumbing used by the chatbot to send user
+prompts to the sentiment analysis API without delaying the assistant's reply.
+
+The chatbot never shows the sentiment analysis result to the user, so calls to
+the API are submitted to a small thread pool and not waited for. The number of
+submissions in flight is bounded: when the API is slow and the bound is
+reached, new submissions are dropped and logged rather than queued without
+limit.
+
+Requests to the API go through a shared keep-alive session with a sized
+connection pool. Failures to connect and 429/503 responses, which mean the
+request was not processed, are retried with jittered exponential backoff.
+Other connection errors, like a connection reset once the request was sent,
+are not retried, since the API stores each user query it receives and a
+retry could store it twice.
+A circuit breaker stops calling the API after repeated failures and lets a
+single probe through once the reset timeout has passed.
+
+When batching is enabled, prompts are instead collected by a background
+submission queue and flushed to the API's bulk endpoint in batches, either
+when a batch is full or when the flush interval has passed. The queue is
+bounded and drops prompts according to its overflow policy when full, and it
+flushes what is left on shutdown.
+
+Classes:
+    SentimentSubmitter: Submits sentiment analysis calls to a bounded thread
+        pool in a fire-and-forget manner.
+    CircuitBreaker: Tracks failures and decides whether calls are allowed.
+    CircuitOpenError: Raised when a call is skipped by an open breaker.
+    SentimentAPIClient: Pooled, retrying HTTP client for the sentiment API.
+    SentimentBatcher: Bounded background queue that flushes prompts in
+        batches.
+
+Functions:
+    post_sentiment_batch: Posts a batch of prompts to the bulk endpoint.
+
+Module attributes:
+    sentiment_submitter: The process-wide SentimentSubmitter.
+    sentiment_api_client: The process-wide SentimentAPIClient.
+    sentiment_batcher: The process-wide SentimentBatcher.
+"""
+
+import os
+import time
+import atexit
+import random
+import logging
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import ConnectTimeoutError
+from dotenv import load_dotenv
+
+from logger_config import setup_logger
+from metrics import track
+
+load_dotenv()
+
+SENTIMENT_API_BASE_URL = os.getenv("SENTIMENT_API_BASE_URL", "http://localhost:5000")
+LOGGING_LEVEL = (
+    int(os.getenv("LOGGING_LEVEL")) if os.getenv("LOGGING_LEVEL") else logging.DEBUG
+)
+SENTIMENT_MAX_WORKERS = int(os.getenv("SENTIMENT_MAX_WORKERS", "4"))
+SENTIMENT_MAX_IN_FLIGHT = int(os.getenv("SENTIMENT_MAX_IN_FLIGHT", "32"))
+SENTIMENT_API_TIMEOUT = float(os.getenv("SENTIMENT_API_TIMEOUT", "3"))
+SENTIMENT_API_MAX_RETRIES = int(os.getenv("SENTIMENT_API_MAX_RETRIES", "2"))
+SENTIMENT_API_BACKOFF_SECONDS = float(os.getenv("SENTIMENT_API_BACKOFF_SECONDS", "0.2"))
+SENTIMENT_BREAKER_FAILURE_THRESHOLD = int(
+    os.getenv("SENTIMENT_BREAKER_FAILURE_THRESHOLD", "5")
+)
+SENTIMENT_BREAKER_RESET_SECONDS = float(
+    os.getenv("SENTIMENT_BREAKER_RESET_SECONDS", "30")
+)
+SENTIMENT_BATCHING_ENABLED = os.getenv("SENTIMENT_BATCHING_ENABLED", "True") == "True"
+SENTIMENT_BATCH_SIZE = int(os.getenv("SENTIMENT_BATCH_SIZE", "25"))
+SENTIMENT_BATCH_INTERVAL_SECONDS = float(
+    os.getenv("SENTIMENT_BATCH_INTERVAL_SECONDS", "1")
+)
+SENTIMENT_BATCH_MAX_BUFFER = int(os.getenv("SENTIMENT_BATCH_MAX_BUFFER", "1000"))
+SENTIMENT_BATCH_OVERFLOW_POLICY = os.getenv(
+    "SENTIMENT_BATCH_OVERFLOW_POLICY", "drop_oldest"
+)
+
+script_name = os.path.splitext(os.path.basename(__file__))[0]
+
+logger = setup_logger(script_name, LOGGING_LEVEL)
+
+
+class SentimentSubmitter:
+    """
+    Submits sentiment analysis calls to a thread pool without waiting for
+    them, with a bound on the number of calls in flight.
+    """
+
+    def __init__(self, max_workers: int = 4, max_in_flight: int = 32) -> None:
+        """
+        Args:
+            max_workers (int): Number of worker threads.
+            max_in_flight (int): Maximum number of submitted calls that have
+                not completed yet, including the ones waiting for a worker.
+        """
+        self.max_in_flight = max_in_flight
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="sentiment"
+        )
+        self._slots = threading.BoundedSemaphore(max_in_flight)
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self.dropped = 0
+
+    @property
+    def in_flight(self) -> int:
+        """
+        Returns the number of submitted calls that have not completed yet.
+        """
+        with self._lock:
+            return self._in_flight
+
+    def submit(self, call: Callable[[str], Optional[dict]], prompt: str) -> bool:
+        """
+        Submits a call to the sentiment analysis API without waiting for it.
+
+        Args:
+            call (Callable[[str], Optional[dict]]): Function calling the API
+                with the prompt.
+            prompt (str): The user's prompt.
+
+        Returns:
+            bool: True if the call was submitted, False if it was dropped
+            because too many calls are in flight.
+        """
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.dropped += 1
+            logger.warning(
+                "Dropping sentiment analysis call: %d calls already in flight",
+                self.max_in_flight,
+            )
+            return False
+
+        with self._lock:
+            self._in_flight += 1
+        try:
+            future = self._executor.submit(call, prompt)
+        except RuntimeError:
+            self._release()
+            logger.error("Sentiment analysis submitter is shut down")
+            return False
+        future.add_done_callback(self._on_done)
+        return True
+
+    def _release(self) -> None:
+        with self._lock:
+            self._in_flight -= 1
+        self._slots.release()
+
+    def _on_done(self, future: Future) -> None:
+        self._release()
+        if future.cancelled():
+            return
+        exception = future.exception()
+        if exception is not None:
+            logger.error("Sentiment analysis call failed: %s", exception)
+        else:
+            logger.debug("Sentiment analysis response: %s", future.result())
+
+    def shutdown(self, wait: bool = True) -> None:
+        """
+        Stops accepting calls and, if wait is True, waits for the calls in
+        flight to complete.
+
+        Args:
+            wait (bool): Whether to wait for the calls in flight.
+        """
+        self._executor.shutdown(wait=wait)
+
+
+class CircuitOpenError(requests.exceptions.RequestException):
+    """
+    Raised when a call to the sentiment analysis API is skipped because the
+    circuit breaker is open.
+    """
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker for calls to a remote service.
+
+    The breaker starts closed and lets every call through. After
+    failure_threshold consecutive failures it opens and rejects calls. Once
+    reset_timeout seconds have passed it becomes half-open and lets a single
+    probe through: the breaker closes if the probe succeeds and opens again if
+    it fails.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        """
+        Args:
+            failure_threshold (int): Consecutive failures that open the
+                breaker.
+            reset_timeout (float): Seconds the breaker stays open before a
+                probe is allowed.
+            clock (Callable[[], float]): Source of the current time in seconds.
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+
+    @property
+    def state(self) -> str:
+        """
+        Returns the current state of the breaker.
+        """
+        with self._lock:
+            return self._state
+
+    @property
+    def failures(self) -> int:
+        """
+        Returns the number of consecutive failures.
+        """
+        with self._lock:
+            return self._failures
+
+    def allow_request(self) -> bool:
+        """
+        Decides whether a call may go through, moving an open breaker to
+        half-open once the reset timeout has passed.
+
+        Returns:
+            bool: True if the call may go through.
+        """
+        with self._lock:
+            if self._state == self.CLOSED:
+                return True
+            if (
+                self._state == self.OPEN
+                and self._clock() - self._opened_at >= self.reset_timeout
+            ):
+                logger.info("Circuit breaker half-open, sending a probe")
+                self._state = self.HALF_OPEN
+                self._probe_in_flight = False
+            if self._state == self.HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            return False
+
+    def record_success(self) -> None:
+        """
+        Records a successful call, closing the breaker.
+        """
+        with self._lock:
+            if self._state != self.CLOSED:
+                logger.info("Circuit breaker closed")
+            self._state = self.CLOSED
+            self._failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        """
+        Records a failed call, opening the breaker if the probe failed or the
+        failure threshold is reached.
+        """
+        with self._lock:
+            self._failures += 1
+            self._probe_in_flight = False
+            if self._state == self.HALF_OPEN or (
+                self._state == self.CLOSED and self._failures >= self.failure_threshold
+            ):
+                logger.warning(
+                    "Circuit breaker open after %d consecutive failures",
+                    self._failures,
+                )
+                self._state = self.OPEN
+                self._opened_at = self._clock()
+
+
+class SentimentAPIClient:
+    """
+    HTTP client for the sentiment analysis API with a shared keep-alive
+    session, jittered retries and a circuit breaker.
+    """
+
+    RETRY_STATUSES = (429, 503)
+
+    def __init__(
+        self,
+        timeout: float = 3,
+        pool_maxsize: int = 4,
+        max_retries: int = 2,
+        backoff_seconds: float = 0.2,
+        breaker: Optional[CircuitBreaker] = None,
+    ) -> None:
+        """
+        Args:
+            timeout (float): Timeout of each request in seconds.
+            pool_maxsize (int): Maximum number of pooled connections per host.
+            max_retries (int): Number of retries after the first attempt.
+            backoff_seconds (float): Base delay of the exponential backoff.
+            breaker (Optional[CircuitBreaker]): Circuit breaker guarding the
+                calls. Defaults to a breaker with default settings.
+        """
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.breaker = breaker or CircuitBreaker()
+        self.adapter = HTTPAdapter(
+            pool_connections=1, pool_maxsize=pool_maxsize, max_retries=0
+        )
+        self.session = requests.Session()
+        self.session.mount("http://", self.adapter)
+        self.session.mount("https://", self.adapter)
+
+    def _backoff(self, attempt: int) -> None:
+        # Full jitter keeps retries from many pods from arriving in lockstep.
+        delay = random.uniform(0, self.backoff_seconds * 2**attempt)  # nosec B311
+        time.sleep(delay)
+
+    @staticmethod
+    def _is_not_sent(error: requests.exceptions.ConnectionError) -> bool:
+        # Connection timeouts and refused connections, wrapped by urllib3 in
+        # a MaxRetryError, fail before any byte of the request is sent.
+        if isinstance(error, requests.exceptions.ConnectTimeout):
+            return True
+        reason = getattr(error.args[0], "reason", None) if error.args else None
+        return isinstance(reason, ConnectTimeoutError)
+
+    def post_json(self, url: str, payload: Dict[str, Any]) -> Any:
+        """
+        Posts a JSON payload and returns the decoded JSON response.
+
+        Args:
+            url (str): URL to post to.
+            payload (Dict[str, Any]): JSON payload.
+
+        Returns:
+            Any: The decoded JSON response.
+
+        Raises:
+            CircuitOpenError: If the circuit breaker rejects the call.
+            requests.exceptions.RequestException: If the request fails after
+                all retries.
+        """
+        if not self.breaker.allow_request():
+            raise CircuitOpenError(f"Circuit breaker is open, skipping {url}")
+
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = self.session.post(url, json=payload, timeout=self.timeout)
+                if (
+                    response.status_code in self.RETRY_STATUSES
+                    and attempt < self.max_retries
+                ):
+                    logger.debug("Retrying after status %d", response.status_code)
+                    self._backoff(attempt)
+                    continue
+                response.raise_for_status()
+            except requests.exceptions.ConnectionError as e:
+                if attempt < self.max_retries and self._is_not_sent(e):
+                    logger.debug("Retrying after failing to connect")
+                    self._backoff(attempt)
+                    continue
+                self.breaker.record_failure()
+                raise
+            except requests.exceptions.HTTPError as e:
+                # Client errors mean the API is up, unless it is still
+                # throttling or unavailable once the retries are exhausted.
+                status = e.response.status_code if e.response is not None else 500
+                if status < 500 and status not in self.RETRY_STATUSES:
+                    self.breaker.record_success()
+                else:
+                    self.breaker.record_failure()
+                raise
+            except requests.exceptions.RequestException:
+                self.breaker.record_failure()
+                raise
+            self.breaker.record_success()
+            return response.json()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Returns the state of the circuit breaker and the statistics of the
+        connection pools.
+
+        Returns:
+            Dict[str, Any]: Breaker state, consecutive failures and, per pool,
+            the number of connections opened, requests sent and free pool
+            slots.
+        """
+        pools = {}
+        pool_manager = self.adapter.poolmanager
+        for key in list(pool_manager.pools.keys()):
+            pool = pool_manager.pools.get(key)
+            if pool is not None:
+                pools[f"{pool.scheme}://{pool.host}:{pool.port}"] = {
+                    "connections_opened": pool.num_connections,
+                    "requests": pool.num_requests,
+                    "available_slots": pool.pool.qsize() if pool.pool else 0,
+                }
+        return {
+            "breaker_state": self.breaker.state,
+            "consecutive_failures": self.breaker.failures,
+            "pools": pools,
+        }
+
+
+class SentimentBatcher:
+    """
+    Bounded background queue that collects prompts and sends them in batches.
+
+    A worker thread, started on the first submission, sends a batch as soon as
+    max_batch_size prompts are buffered, or once flush_interval seconds have
+    passed since the oldest buffered prompt was submitted. When the buffer is
+    full, the overflow policy decides whether the oldest buffered prompt
+    ("drop_oldest") or the new prompt ("drop_newest") is dropped.
+    """
+
+    OVERFLOW_POLICIES = ("drop_oldest", "drop_newest")
+
+    def __init__(
+        self,
+        send_batch: Callable[[List[str]], Any],
+        max_batch_size: int = 25,
+        flush_interval: float = 1,
+        max_buffer: int = 1000,
+        overflow_policy: str = "drop_oldest",
+    ) -> None:
+        """
+        Args:
+            send_batch (Callable[[List[str]], Any]): Function sending a batch
+                of prompts.
+            max_batch_size (int): Maximum number of prompts per batch.
+            flush_interval (float): Maximum number of seconds a prompt waits
+                in the buffer before its batch is sent.
+            max_buffer (int): Maximum number of buffered prompts.
+            overflow_policy (str): "drop_oldest" or "drop_newest".
+
+        Raises:
+            ValueError: If the overflow policy is not supported.
+        """
+        if overflow_policy not in self.OVERFLOW_POLICIES:
+            raise ValueError(f"Unsupported overflow policy: {overflow_policy}")
+        self.send_batch = send_batch
+        self.max_batch_size = max_batch_size
+        self.flush_interval = flush_interval
+        self.max_buffer = max_buffer
+        self.overflow_policy = overflow_policy
+        self._buffer: Deque[str] = deque()
+        self._oldest_at = 0.0
+        self._condition = threading.Condition()
+        self._stopping = False
+        self._worker: Optional[threading.Thread] = None
+        self._counts = {"submitted": 0, "dropped": 0, "batches": 0, "failed": 0}
+
+    def submit(self, prompt: str) -> bool:
+        """
+        Buffers a prompt to be sent with the next batch.
+
+        Args:
+            prompt (str): The user's prompt.
+
+        Returns:
+            bool: True if the prompt was buffered, False if it was dropped.
+        """
+        with self._condition:
+            if self._stopping:
+                logger.error("Sentiment batcher is shut down, dropping prompt")
+                self._counts["dropped"] += 1
+                return False
+            if self._worker is None:
+                self._worker = threading.Thread(
+                    target=self._run, name="sentiment-batcher", daemon=True
+                )
+                self._worker.start()
+
+            if len(self._buffer) >= self.max_buffer:
+                self._counts["dropped"] += 1
+                logger.warning(
+                    "Sentiment batch buffer full, applying %s", self.overflow_policy
+                )
+                if self.overflow_policy == "drop_newest":
+                    return False
+                self._buffer.popleft()
+
+            if not self._buffer:
+                self._oldest_at = time.monotonic()
+            self._buffer.append(prompt)
+            self._counts["submitted"] += 1
+            # Wakes the worker to start the flush timer or send a full batch.
+            self._condition.notify()
+            return True
+
+    def _next_batch(self) -> List[str]:
+        with self._condition:
+            while not self._stopping:
+                if len(self._buffer) >= self.max_batch_size:
+                    break
+                if self._buffer:
+                    remaining = self.flush_interval - (
+                        time.monotonic() - self._oldest_at
+                    )
+                    if remaining <= 0:
+                        break
+                    self._condition.wait(remaining)
+                else:
+                    self._condition.wait()
+            batch = [
+                self._buffer.popleft()
+                for _ in range(min(self.max_batch_size, len(self._buffer)))
+            ]
+            if self._buffer:
+                self._oldest_at = time.monotonic()
+            return batch
+
+    def _send(self, batch: List[str]) -> None:
+        try:
+            response = self.send_batch(batch)
+            logger.debug("Sentiment batch response: %s", response)
+        except Exception as e:  # pylint: disable=broad-exception-caught
+            with self._condition:
+                self._counts["failed"] += 1
+            logger.error("Failed to send batch of %d prompts: %s", len(batch), e)
+        with self._condition:
+            self._counts["batches"] += 1
+
+    def _run(self) -> None:
+        while True:
+            batch = self._next_batch()
+            if batch:
+                self._send(batch)
+            with self._condition:
+                if self._stopping and not self._buffer:
+                    return
+
+    def shutdown(self, timeout: Optional[float] = None) -> None:
+        """
+        Stops accepting prompts, flushes the buffered prompts and waits for
+        the worker thread to finish.
+
+        Args:
+            timeout (Optional[float]): Maximum number of seconds to wait.
+        """
+        with self._condition:
+            self._stopping = True
+            self._condition.notify()
+            worker = self._worker
+        if worker is not None:
+            worker.join(timeout)
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Returns the number of buffered prompts and the cumulative counts of
+        submitted and dropped prompts, and of sent and failed batches.
+
+        Returns:
+            Dict[str, int]: Buffer size and counts.
+        """
+        with self._condition:
+            return {"buffered": len(self._buffer), **self._counts}
+
+
+def post_sentiment_batch(prompts: List[str]) -> Any:
+    """
+    Posts a batch of prompts to the bulk endpoint of the sentiment analysis
+    API.
+
+    Args:
+        prompts (List[str]): The users' prompts.
+
+    Returns:
+        Any: The decoded JSON response.
+    """
+    url = f"{SENTIMENT_API_BASE_URL}/api/v1/user_queries:batch"
+    logger.info(
+        "Sending batch of %d prompts to the sentiment analysis API", len(prompts)
+    )
+    with track("sentiment_api_batch"):
+        return sentiment_api_client.post_json(url, {"texts": prompts})
+
+
+sentiment_submitter = SentimentSubmitter(SENTIMENT_MAX_WORKERS, SENTIMENT_MAX_IN_FLIGHT)
+sentiment_api_client = SentimentAPIClient(
+    SENTIMENT_API_TIMEOUT,
+    SENTIMENT_MAX_WORKERS,
+    SENTIMENT_API_MAX_RETRIES,
+    SENTIMENT_API_BACKOFF_SECONDS,
+    CircuitBreaker(
+        SENTIMENT_BREAKER_FAILURE_THRESHOLD, SENTIMENT_BREAKER_RESET_SECONDS
+    ),
+)
+sentiment_batcher = SentimentBatcher(
+    post_sentiment_batch,
+    SENTIMENT_BATCH_SIZE,
+    SENTIMENT_BATCH_INTERVAL_SECONDS,
+    SENTIMENT_BATCH_MAX_BUFFER,
+    SENTIMENT_BATCH_OVERFLOW_POLICY,
+)
+atexit.register(sentiment_batcher.shutdown, SENTIMENT_API_TIMEOUT)
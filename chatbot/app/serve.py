@@ -0,0 +1,133 @@
+"""
+This module is the entry point of the chatbot container. It warms the chatbot
+up at process start and exposes its readiness, then starts Streamlit in the
+same process.
+
+Streamlit only runs app.py once a user opens a session, so without this entry
+point the retriever and chain would be built during the first user's request.
+Here, bot_logic is imported and warmed up in a background thread as soon as the
+process starts. Since app.py imports the same bot_logic module, Streamlit
+sessions reuse the warmed-up retriever and chain.
+
+A small HTTP server on READINESS_PORT answers GET /ready with 200 once the
+warm-up has completed, and 503 before, so that Kubernetes only routes traffic
+to warmed-up pods. The same server answers GET /metrics with the metrics of
+the chatbot in the Prometheus text format, for Prometheus to scrape.
+
+Usage:
+    python app/serve.py [streamlit run options]
+
+Classes:
+    StatusHandler: HTTP handler reporting the readiness and the metrics of the
+        chatbot.
+
+Functions:
+    start_readiness_server: Starts the readiness HTTP server in a thread.
+    start_warm_up: Warms the chatbot up in a thread, retrying until it
+        succeeds.
+"""
+
+import os
+import sys
+import time
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import bot_logic
+import metrics
+from logger_config import setup_logger
+
+READINESS_PORT = int(os.getenv("READINESS_PORT", "8502"))
+METRICS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+WARMUP_RETRY_SECONDS = float(os.getenv("WARMUP_RETRY_SECONDS", "10"))
+LOGGING_LEVEL = (
+    int(os.getenv("LOGGING_LEVEL")) if os.getenv("LOGGING_LEVEL") else logging.DEBUG
+)
+
+script_name = os.path.splitext(os.path.basename(__file__))[0]
+
+logger = setup_logger(script_name, LOGGING_LEVEL)
+
+
+class StatusHandler(BaseHTTPRequestHandler):
+    """
+    HTTP handler answering GET /ready with 200 once the chatbot is warmed up
+    and 503 before, and GET /metrics with the metrics of the chatbot.
+    """
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        """
+        Handles GET requests.
+        """
+        if self.path == "/ready":
+            ready = bot_logic.is_ready()
+            self._send(200 if ready else 503, b"ready" if ready else b"warming up")
+        elif self.path == "/metrics":
+            self._send(
+                200, metrics.registry.expose().encode("utf-8"), METRICS_CONTENT_TYPE
+            )
+        else:
+            self.send_error(404)
+
+    def _send(self, status: int, body: bytes, content_type: str = "text/plain"):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        # Probes and scrapes are frequent, so they are only logged at the
+        # debug level.
+        logger.debug("Status request: " + format, *args)
+
+
+def start_readiness_server(port: int = READINESS_PORT) -> ThreadingHTTPServer:
+    """
+    Starts the readiness and metrics HTTP server in a daemon thread.
+
+    Args:
+        port (int): Port to listen on.
+
+    Returns:
+        ThreadingHTTPServer: The running server.
+    """
+    server = ThreadingHTTPServer(("", port), StatusHandler)  # nosec B104
+    threading.Thread(
+        target=server.serve_forever, name="readiness-server", daemon=True
+    ).start()
+    logger.info("Readiness server listening on port %d", port)
+    return server
+
+
+def start_warm_up(retry_seconds: float = WARMUP_RETRY_SECONDS) -> threading.Thread:
+    """
+    Warms the chatbot up in a daemon thread, retrying every retry_seconds
+    until the warm-up succeeds.
+
+    Args:
+        retry_seconds (float): Seconds to wait between attempts.
+
+    Returns:
+        threading.Thread: The warm-up thread.
+    """
+
+    def run() -> None:
+        while not bot_logic.warm_up():
+            time.sleep(retry_seconds)
+
+    thread = threading.Thread(target=run, name="warm-up", daemon=True)
+    thread.start()
+    return thread
+
+
+if __name__ == "__main__":
+    # Imported here so that importing this module does not import Streamlit.
+    from streamlit.web import cli
+
+    start_readiness_server()
+    start_warm_up()
+    app_path = os.path.join(os.path.dirname(__file__), "app.py")
+    sys.argv = ["streamlit", "run", app_path] + sys.argv[1:]
+    sys.exit(cli.main())  # pylint: disable=no-value-for-parameter
@@ -0,0 +1,281 @@
+"""
+This module contains an in-memory vector store backed by a NumPy matrix.
+
+For FAQ-sized corpora a vector database is not needed: the normalized
+embeddings of all chunks fit in a single contiguous float32 matrix, and the
+cosine similarity of a query to every chunk is one matrix-vector product. The
+top k chunks are then selected with argpartition, without sorting all scores.
+Batches added by the ingestion pipeline are copied into a buffer whose
+capacity doubles when it is full, so adding n chunks copies O(n) rows.
+
+NumpyVectorStore implements the LangChain VectorStore interface, so its
+retriever plugs into the same LCEL chain as the Chroma retriever. The store can
+be saved to and loaded from a directory.
+
+Classes:
+    NumpyVectorStore: VectorStore keeping normalized embeddings in a NumPy
+        matrix.
+"""
+
+import os
+import json
+import uuid
+from typing import Any, Callable, Iterable, List, Optional, Tuple
+
+import numpy as np
+from langchain.schema.document import Document
+from langchain.schema.embeddings import Embeddings
+from langchain.schema.vectorstore import VectorStore
+
+MATRIX_FILE = "embeddings.npy"
+DOCUMENTS_FILE = "documents.json"
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1
+    return vectors / norms
+
+
+class NumpyVectorStore(VectorStore):
+    """
+    VectorStore keeping normalized embeddings in a contiguous float32 NumPy
+    matrix, with one row per document. Similarity scores are cosine
+    similarities.
+    """
+
+    def __init__(self, embedding: Embeddings) -> None:
+        """
+        Args:
+            embedding (Embeddings): Embeddings used for documents and queries.
+        """
+        self._embedding = embedding
+        # Rows beyond the number of documents are spare capacity.
+        self._buffer: Optional[np.ndarray] = None
+        self._documents: List[Document] = []
+        self._ids: List[str] = []
+
+    @property
+    def _matrix(self) -> Optional[np.ndarray]:
+        # A slice of leading rows of a C-contiguous buffer is contiguous.
+        if self._buffer is None:
+            return None
+        return self._buffer[: len(self._documents)]
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self._embedding
+
+    def __len__(self) -> int:
+        return len(self._documents)
+
+    def add_vectors(
+        self,
+        vectors: List[List[float]],
+        documents: List[Document],
+        ids: Optional[List[str]] = None,
+    ) -> List[str]:
+        """
+        Adds precomputed embeddings and their documents to the store.
+
+        Args:
+            vectors (List[List[float]]): One embedding per document.
+            documents (List[Document]): The documents.
+            ids (Optional[List[str]]): Document ids. Defaults to random ids.
+
+        Returns:
+            List[str]: The ids of the added documents.
+
+        Raises:
+            ValueError: If the embeddings do not have the dimension of the
+                embeddings already in the store.
+        """
+        if not documents:
+            return []
+        ids = ids or [str(uuid.uuid4()) for _ in documents]
+        rows = _normalize(np.asarray(vectors, dtype=np.float32))
+        count = len(self._documents)
+        if count and rows.shape[1] != self._buffer.shape[1]:
+            raise ValueError(
+                f"Embeddings of dimension {rows.shape[1]} cannot be added to a "
+                f"store of dimension {self._buffer.shape[1]}"
+            )
+        needed = count + len(rows)
+        if (
+            self._buffer is None
+            or needed > len(self._buffer)
+            or rows.shape[1] != self._buffer.shape[1]
+        ):
+            capacity = needed if self._buffer is None else max(needed, 2 * count)
+            buffer = np.empty((capacity, rows.shape[1]), dtype=np.float32)
+            if count:
+                buffer[:count] = self._buffer[:count]
+            self._buffer = buffer
+        self._buffer[count:needed] = rows
+        self._documents.extend(documents)
+        self._ids.extend(ids)
+        return ids
+
+    def add_texts(
+        self,
+        texts: Iterable[str],
+        metadatas: Optional[List[dict]] = None,
+        **kwargs: Any,
+    ) -> List[str]:
+        """
+        Embeds texts and adds them to the store.
+
+        Args:
+            texts (Iterable[str]): Texts to add.
+            metadatas (Optional[List[dict]]): One metadata dict per text.
+            **kwargs: "ids" may be given to set the document ids.
+
+        Returns:
+            List[str]: The ids of the added documents.
+        """
+        texts = list(texts)
+        metadatas = metadatas or [{} for _ in texts]
+        documents = [
+            Document(page_content=text, metadata=metadata)
+            for text, metadata in zip(texts, metadatas)
+        ]
+        vectors = self._embedding.embed_documents(texts)
+        return self.add_vectors(vectors, documents, kwargs.get("ids"))
+
+    def similarity_search_by_vector_with_score(
+        self, embedding: List[float], k: int = 4
+    ) -> List[Tuple[Document, float]]:
+        """
+        Returns the k documents most similar to an embedding, most similar
+        first, with their cosine similarity.
+
+        Args:
+            embedding (List[float]): Query embedding.
+            k (int): Number of documents to return.
+
+        Returns:
+            List[Tuple[Document, float]]: Documents and similarity scores.
+        """
+        if self._matrix is None or not len(self._documents) or k <= 0:
+            return []
+        query = _normalize(np.asarray(embedding, dtype=np.float32))
+        scores = self._matrix @ query
+        k = min(k, len(scores))
+        if k < len(scores):
+            top = np.argpartition(-scores, k - 1)[:k]
+        else:
+            top = np.arange(len(scores))
+        top = top[np.argsort(-scores[top])]
+        return [(self._documents[i], float(scores[i])) for i in top]
+
+    def similarity_search_by_vector(
+        self, embedding: List[float], k: int = 4, **kwargs: Any
+    ) -> List[Document]:
+        return [
+            document
+            for document, _ in self.similarity_search_by_vector_with_score(embedding, k)
+        ]
+
+    def similarity_search_with_score(
+        self, query: str, k: int = 4, **kwargs: Any
+    ) -> List[Tuple[Document, float]]:
+        return self.similarity_search_by_vector_with_score(
+            self._embedding.embed_query(query), k
+        )
+
+    def similarity_search(
+        self, query: str, k: int = 4, **kwargs: Any
+    ) -> List[Document]:
+        return self.similarity_search_by_vector(self._embedding.embed_query(query), k)
+
+    def _select_relevance_score_fn(self) -> Callable[[float], float]:
+        # Cosine similarity in [-1, 1] mapped to a relevance score in [0, 1].
+        return lambda score: (score + 1) / 2
+
+    @classmethod
+    def from_texts(
+        cls,
+        texts: List[str],
+        embedding: Embeddings,
+        metadatas: Optional[List[dict]] = None,
+        **kwargs: Any,
+    ) -> "NumpyVectorStore":
+        """
+        Creates a store from texts, embedding them with the given embeddings.
+
+        Args:
+            texts (List[str]): Texts to add.
+            embedding (Embeddings): Embeddings used for documents and queries.
+            metadatas (Optional[List[dict]]): One metadata dict per text.
+            **kwargs: "ids" may be given to set the document ids.
+
+        Returns:
+            NumpyVectorStore: The store.
+        """
+        store = cls(embedding)
+        store.add_texts(texts, metadatas, **kwargs)
+        return store
+
+    @staticmethod
+    def exists(directory: str) -> bool:
+        """
+        Checks whether a store has been saved to a directory.
+
+        Args:
+            directory (str): Directory to check.
+
+        Returns:
+            bool: True if the directory holds a saved store.
+        """
+        return os.path.isfile(os.path.join(directory, MATRIX_FILE)) and (
+            os.path.isfile(os.path.join(directory, DOCUMENTS_FILE))
+        )
+
+    def save(self, directory: str) -> None:
+        """
+        Saves the embeddings matrix and the documents to a directory.
+
+        Args:
+            directory (str): Directory to save the store to.
+        """
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+        matrix = self._matrix if self._matrix is not None else np.empty((0, 0))
+        np.save(os.path.join(directory, MATRIX_FILE), matrix)
+        with open(
+            os.path.join(directory, DOCUMENTS_FILE), "w", encoding="utf-8"
+        ) as file:
+            json.dump(
+                [
+                    {"id": i, "page_content": d.page_content, "metadata": d.metadata}
+                    for i, d in zip(self._ids, self._documents)
+                ],
+                file,
+            )
+
+    @classmethod
+    def load(cls, directory: str, embedding: Embeddings) -> "NumpyVectorStore":
+        """
+        Loads a store saved to a directory.
+
+        Args:
+            directory (str): Directory the store was saved to.
+            embedding (Embeddings): Embeddings used for queries.
+
+        Returns:
+            NumpyVectorStore: The store.
+        """
+        store = cls(embedding)
+        with open(
+            os.path.join(directory, DOCUMENTS_FILE), "r", encoding="utf-8"
+        ) as file:
+            records = json.load(file)
+        store._buffer = np.ascontiguousarray(
+            np.load(os.path.join(directory, MATRIX_FILE)), dtype=np.float32
+        )
+        store._documents = [
+            Document(page_content=r["page_content"], metadata=r["metadata"])
+            for r in records
+        ]
+        store._ids = [r["id"] for r in records]
+        return store
@@ -0,0 +1,428 @@
+"""
+This module is an offline benchmark of the chatbot's retrieval-augmented
+generation pipeline.
+
+It runs the real bot_logic pipeline (load_documents, load_embeddings,
+retrieval, context assembly, generate_response and query) on a synthetic FAQ
+corpus of configurable size. The OpenAI embeddings and chat model are replaced
+with fakes that add configurable latency, so the benchmark needs no network
+access and measures the time spent in the pipeline itself, plus the simulated
+time spent waiting for OpenAI.
+
+The report is printed as JSON. It holds, for each stage, the number of runs and
+the mean, minimum, maximum, p50, p95 and p99 durations in milliseconds, and the
+peak resident memory of the process. With --baseline, the p95 of each stage is
+compared to a previous report, and the benchmark exits with status 1 if any
+stage is slower than the baseline by more than --tolerance.
+
+Usage, from the chatbot folder:
+
+    python benchmarks/rag_benchmark.py --documents 2000 --queries 200 \\
+        --embedding-latency-ms 20 --llm-latency-ms 300 --output report.json
+
+Classes:
+    LatencyEmbeddings: Local embeddings with injected latency.
+    FakeChatModel: Chat model returning a canned answer with injected latency.
+
+Functions:
+    generate_corpus: Writes a synthetic FAQ document.
+    percentile: Computes a percentile of durations.
+    summarize: Summarizes the durations of a stage.
+    run_benchmark: Runs the benchmark and returns the report.
+    compare_to_baseline: Lists the stages slower than in a baseline report.
+"""
+
+import os
+import sys
+import json
+import math
+import time
+import random
+import logging
+import argparse
+import resource
+import tempfile
+from typing import Any, Dict, Iterator, List, Optional
+
+APP_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app"
+)
+sys.path.insert(0, APP_DIR)
+
+# pylint: disable=wrong-import-position
+from langchain.chat_models.base import BaseChatModel
+from langchain.schema.embeddings import Embeddings
+from langchain.schema.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain.schema.output import ChatGeneration, ChatGenerationChunk, ChatResult
+from local_embeddings import HashingEmbeddings
+
+# pylint: enable=wrong-import-position
+
+TOPICS = [
+    "return policy",
+    "international shipping",
+    "loyalty program",
+    "half sizes",
+    "warranty",
+    "gift cards",
+    "store hours",
+    "eco-friendly materials",
+    "order tracking",
+    "wide fit",
+]
+PRODUCTS = [
+    "sneaker",
+    "loafer",
+    "sandal",
+    "boot",
+    "oxford",
+    "slipper",
+    "trainer",
+    "pump",
+]
+
+
+class LatencyEmbeddings(Embeddings):
+    """
+    Local hashed n-gram embeddings that sleep before returning, to simulate
+    the latency of an embedding API.
+    """
+
+    def __init__(
+        self, latency_seconds: float = 0.0, latency_per_text_seconds: float = 0.0
+    ) -> None:
+        """
+        Args:
+            latency_seconds (float): Latency added to each call.
+            latency_per_text_seconds (float): Latency added per embedded text.
+        """
+        self.underlying = HashingEmbeddings()
+        self.latency_seconds = latency_seconds
+        self.latency_per_text_seconds = latency_per_text_seconds
+        self.model = f"fake-{self.underlying.model}"
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        time.sleep(self.latency_seconds + self.latency_per_text_seconds * len(texts))
+        return self.underlying.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        time.sleep(self.latency_seconds + self.latency_per_text_seconds)
+        return self.underlying.embed_query(text)
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    Chat model answering every prompt with a canned answer, after a latency
+    before the first token and a latency per token, to simulate a chat API.
+    """
+
+    answer: str = "Thank you for your question. " * 10
+    first_token_latency_seconds: float = 0.0
+    token_latency_seconds: float = 0.0
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat-model"
+
+    def _tokens(self) -> Iterator[str]:
+        time.sleep(self.first_token_latency_seconds)
+        for index, word in enumerate(self.answer.split(" ")):
+            if index:
+                time.sleep(self.token_latency_seconds)
+            yield word + " "
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Any = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        content = "".join(self._tokens())
+        return ChatResult(
+            generations=[ChatGeneration(message=AIMessage(content=content))]
+        )
+
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Any = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        for token in self._tokens():
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token))
+
+
+def generate_corpus(path: str, documents: int, seed: int) -> List[str]:
+    """
+    Writes a synthetic FAQ document in the format of faq_albert_shoes.txt,
+    with a blank line between entries.
+
+    Args:
+        path (str): Path of the document to write.
+        documents (int): Number of question and answer pairs.
+        seed (int): Seed of the random generator.
+
+    Returns:
+        List[str]: The questions of the document.
+    """
+    rng = random.Random(seed)
+    questions = []
+    entries = ["Albert Shoes\nFrequently Asked Questions (FAQs)"]
+    for index in range(documents):
+        topic, product = rng.choice(TOPICS), rng.choice(PRODUCTS)
+        question = f"What is the {topic} for the {product} model {index}?"
+        questions.append(question)
+        entries.append(
+            f"{question}\n* The {topic} for the {product} model {index} covers "
+            f"{rng.randint(1, 90)} days and {rng.choice(TOPICS)}."
+        )
+    # Entries are separated by blank lines, so that each is split into its
+    # own chunk.
+    with open(path, "w", encoding="utf-8") as file:
+        file.write("\n\n".join(entries))
+    return questions
+
+
+def percentile(durations: List[float], percent: float) -> float:
+    """
+    Computes a percentile of durations with the nearest-rank method.
+
+    Args:
+        durations (List[float]): The durations.
+        percent (float): The percentile, between 0 and 100.
+
+    Returns:
+        float: The percentile.
+    """
+    ranked = sorted(durations)
+    return ranked[max(0, math.ceil(percent / 100 * len(ranked)) - 1)]
+
+
+def summarize(durations: List[float]) -> Dict[str, float]:
+    """
+    Summarizes the durations of a stage in milliseconds.
+
+    Args:
+        durations (List[float]): The durations in seconds.
+
+    Returns:
+        Dict[str, float]: The number of runs, and the mean, minimum, maximum,
+        p50, p95 and p99 durations in milliseconds.
+    """
+    milliseconds = [duration * 1000 for duration in durations]
+    return {
+        "runs": len(milliseconds),
+        "mean_ms": sum(milliseconds) / len(milliseconds),
+        "min_ms": min(milliseconds),
+        "max_ms": max(milliseconds),
+        "p50_ms": percentile(milliseconds, 50),
+        "p95_ms": percentile(milliseconds, 95),
+        "p99_ms": percentile(milliseconds, 99),
+    }
+
+
+def _timed(timings: Dict[str, List[float]], stage: str, function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    timings.setdefault(stage, []).append(time.perf_counter() - start)
+    return result
+
+
+def run_benchmark(args: argparse.Namespace, workdir: str) -> Dict[str, Any]:
+    """
+    Runs the benchmark on a synthetic corpus. bot_logic runs from the working
+    directory, where the corpus, the vector store, the embedding cache and
+    the logs are written.
+
+    Args:
+        args (argparse.Namespace): The command line arguments.
+        workdir (str): The working directory.
+
+    Returns:
+        Dict[str, Any]: The report.
+    """
+    document_path = os.path.join(workdir, "faq.txt")
+    questions = generate_corpus(document_path, args.documents, args.seed)
+
+    # bot_logic reads its configuration when it is imported.
+    os.environ.update(
+        {
+            "DOCUMENT_PATH": document_path,
+            "VECTOR_STORE_BACKEND": args.backend,
+            "RETRIEVER_MODE": args.retriever_mode,
+            "VECTOR_STORE_DIR": os.path.join(workdir, "vector_store"),
+            "EMBEDDING_CACHE_PATH": os.path.join(workdir, "embeddings.sqlite3"),
+            "EMBEDDING_PROVIDER": "hashing",
+            "FAQ_ENABLED": str(args.faq),
+            "RESPONSE_CACHE_ENABLED": str(args.response_cache),
+            "LOGGING_LEVEL": "40",
+        }
+    )
+    os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+    # The splitter warns about every chunk longer than the chunk size.
+    logging.getLogger("langchain.text_splitter").setLevel(logging.ERROR)
+    os.chdir(workdir)
+    timings: Dict[str, List[float]] = {}
+    import_start = time.perf_counter()
+    import bot_logic  # pylint: disable=import-outside-toplevel
+    import retriever_builder  # pylint: disable=import-outside-toplevel
+
+    timings["import"] = [time.perf_counter() - import_start]
+
+    # The fakes replace the clients that bot_logic creates on first use.
+    # pylint: disable=protected-access
+    retriever_builder._embeddings = LatencyEmbeddings(
+        args.embedding_latency_ms / 1000, args.embedding_latency_per_text_ms / 1000
+    )
+    bot_logic._model = FakeChatModel(
+        first_token_latency_seconds=args.llm_latency_ms / 1000,
+        token_latency_seconds=args.llm_token_latency_ms / 1000,
+    )
+    # pylint: enable=protected-access
+
+    documents = _timed(
+        timings, "load_documents", bot_logic.load_documents, document_path
+    )
+    retriever = _timed(timings, "load_embeddings", bot_logic.load_embeddings, documents)
+    if args.retriever_mode == "hybrid":
+        retriever = _timed(
+            timings,
+            "build_hybrid_retriever",
+            bot_logic.build_hybrid_retriever,
+            documents,
+            retriever,
+        )
+    _timed(timings, "get_retriever", bot_logic.get_retriever)
+
+    rng = random.Random(args.seed)
+    for _ in range(args.queries):
+        question = rng.choice(questions)
+        retrieved = _timed(timings, "retrieval", retriever.invoke, question)
+        _timed(timings, "format_docs", bot_logic.format_docs, retrieved)
+        _timed(
+            timings,
+            "generate_response",
+            bot_logic.generate_response,
+            retriever,
+            question,
+        )
+        _timed(timings, "query", bot_logic.query, question)
+
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS.
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    peak_rss_mb = peak_rss / (1024 * 1024 if sys.platform == "darwin" else 1024)
+    return {
+        "config": {
+            key: value
+            for key, value in vars(args).items()
+            if key not in ("output", "baseline", "tolerance")
+        },
+        "chunks": len(documents),
+        "stages": {stage: summarize(durations) for stage, durations in timings.items()},
+        "peak_rss_mb": peak_rss_mb,
+    }
+
+
+def compare_to_baseline(
+    report: Dict[str, Any], baseline: Dict[str, Any], tolerance: float
+) -> List[str]:
+    """
+    Lists the stages whose p95 duration exceeds the baseline's by more than
+    the tolerance.
+
+    Args:
+        report (Dict[str, Any]): The current report.
+        baseline (Dict[str, Any]): A previous report.
+        tolerance (float): Allowed slowdown, as a fraction of the baseline.
+
+    Returns:
+        List[str]: A description of each regression.
+    """
+    regressions = []
+    for stage, summary in report["stages"].items():
+        previous = baseline.get("stages", {}).get(stage)
+        if previous and summary["p95_ms"] > previous["p95_ms"] * (1 + tolerance):
+            regressions.append(
+                f"{stage}: p95 {summary['p95_ms']:.2f} ms, "
+                f"baseline {previous['p95_ms']:.2f} ms"
+            )
+    return regressions
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    """
+    Parses the command line arguments.
+
+    Args:
+        argv (Optional[List[str]]): The arguments. Defaults to sys.argv.
+
+    Returns:
+        argparse.Namespace: The parsed arguments.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1])
+    parser.add_argument("--documents", type=int, default=500)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--backend", choices=["chroma", "numpy"], default="numpy")
+    parser.add_argument(
+        "--retriever-mode", choices=["hybrid", "vector"], default="hybrid"
+    )
+    parser.add_argument("--embedding-latency-ms", type=float, default=0.0)
+    parser.add_argument("--embedding-latency-per-text-ms", type=float, default=0.0)
+    parser.add_argument("--llm-latency-ms", type=float, default=0.0)
+    parser.add_argument("--llm-token-latency-ms", type=float, default=0.0)
+    parser.add_argument(
+        "--faq", action="store_true", help="Enable the FAQ fast path in query"
+    )
+    parser.add_argument(
+        "--response-cache",
+        action="store_true",
+        help="Enable the response cache in query",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="File to write the report to")
+    parser.add_argument("--baseline", help="Previous report to compare to")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    Runs the benchmark, prints the report and compares it to the baseline.
+
+    Args:
+        argv (Optional[List[str]]): The arguments. Defaults to sys.argv.
+
+    Returns:
+        int: The exit status, 1 if a stage regressed.
+    """
+    args = parse_args(argv)
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as file:
+            baseline = json.load(file)
+    output = os.path.abspath(args.output) if args.output else None
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix="rag-benchmark-") as workdir:
+        try:
+            report = run_benchmark(args, workdir)
+        finally:
+            os.chdir(cwd)
+    text = json.dumps(report, indent=2)
+    print(text)
+    if output:
+        with open(output, "w", encoding="utf-8") as file:
+            file.write(text)
+
+    if baseline is not None:
+        regressions = compare_to_baseline(report, baseline, args.tolerance)
+        for regression in regressions:
+            print(f"Regression: {regression}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -11,9 +11,9 @@ The `TestApp` class contains two test cases:
   handles the exception correctly and returns `None`.
 
 Each test case uses the `unittest.mock.patch` decorator to mock the
-`requests.post` method and the logger used in the `call_sentiment_analysis_api`
-function. This allows us to simulate different API responses and check how
-the function handles them.
+`post` method of the sentiment API client's session and the logger used in
+the `call_sentiment_analysis_api` function. This allows us to simulate
+different API responses and check how the function handles them.
 """
 
 import unittest
@@ -34,12 +34,13 @@ class TestApp(unittest.TestCase):
       `RequestException`. It checks if the `call_sentiment_analysis_api` function
       handles the exception correctly and returns `None`.
 
-    Each test case uses the `unittest.mock.patch` decorator to mock the `requests.post`
-    method and the logger used in the `call_sentiment_analysis_api` function. This allows
-    us to simulate different API responses and check how the function handles them.
+    Each test case uses the `unittest.mock.patch` decorator to mock the `post` method
+    of the sentiment API client's session and the logger used in the
+    `call_sentiment_analysis_api` function. This allows us to simulate different
+    API responses and check how the function handles them.
     """
 
-    @patch("chatbot.app.app.requests.post")
+    @patch("chatbot.app.app.sentiment_api_client.session.post")
     @patch("chatbot.app.app.logger")
     def test_successful_api_call(self, mock_logger, mock_post):
         """
@@ -47,13 +48,13 @@ class TestApp(unittest.TestCase):
 
         This test case mocks a successful API response and checks if the
         `call_sentiment_analysis_api` function returns the correct response.
-        It also checks if the `requests.post` method and the logger methods
+        It also checks if the session's `post` method and the logger methods
         were called with the correct arguments.
 
         Args:
             mock_logger (Mock): A mock for the logger used in the
             `call_sentiment_analysis_api` function.
-            mock_post (Mock): A mock for the `requests.post` method.
+            mock_post (Mock): A mock for the session's `post` method.
 
         Returns:
             None
@@ -75,7 +76,7 @@ class TestApp(unittest.TestCase):
             "Request URL: %s and user_query: %s", mock_post.call_args[0][0], prompt
         )
 
-    @patch("chatbot.app.app.requests.post")
+    @patch("chatbot.app.app.sentiment_api_client.session.post")
     @patch("chatbot.app.app.logger")
     def test_failed_api_call(self, mock_logger, mock_post):
         """
@@ -83,13 +84,13 @@ class TestApp(unittest.TestCase):
 
         This test case mocks a failed API response by raising a `RequestException` and
         checks if the `call_sentiment_analysis_api` function handles the exception
-        correctly and returns `None`. It also checks if the `requests.post` method and
+        correctly and returns `None`. It also checks if the session's `post` method and
         the logger methods were called with the correct arguments.
 
         Args:
             mock_logger (Mock): A mock for the logger used in the
                 `call_sentiment_analysis_api` function.
-            mock_post (Mock): A mock for the `requests.post` method.
+            mock_post (Mock): A mock for the session's `post` method.
 
         Returns:
             None
@@ -1,18 +1,35 @@
 """
 This module contains unit tests for the bot_logic module of the chatbot
-application. It tests the functions load_documents, load_embeddings,
-generate_response, and query to ensure they are working as expected. The
-tests are written using the unittest framework. Each function in the bot_logic
-module has a corresponding test function in this module.
+application. It tests the functions create_embeddings, load_documents,
+load_embeddings, hash_documents, get_retriever, generate_response,
+generate_response_stream, query, query_stream, warm_up, and
+last_response_source to ensure they are working as expected. The tests are
+written using the unittest framework. Each function in the bot_logic module
+has a corresponding test function in this module.
 """
 
 import unittest
+from unittest.mock import patch
 from chatbot.app.bot_logic import (
+    create_embeddings,
     load_documents,
     load_embeddings,
+    hash_documents,
+    get_retriever,
     generate_response,
+    generate_response_stream,
     query,
+    query_stream,
+    warm_up,
+    is_ready,
+    last_response_source,
+    source_version,
+    _store_response,
+    RESPONSE_SOURCE_FAQ,
+    CACHE_LOOKUPS,
+    RESPONSES,
 )
+from chatbot.app.response_cache import SemanticResponseCache
 
 DOCUMENT_PATH = "../app/docs/faq_albert_shoes.txt"
 
@@ -24,6 +41,18 @@ class TestBotLogic(unittest.TestCase):
     runs the tests, and asserts the expected results.
     """
 
+    def test_create_embeddings(self):
+        """
+        Tests the create_embeddings function from the bot_logic module.
+        It checks if the function creates local embeddings, which embed
+        without network access, for the "hashing" provider and rejects an
+        unknown provider.
+        """
+        embeddings = create_embeddings("hashing")
+        self.assertEqual(len(embeddings.embed_query("test query")), 1024)
+        with self.assertRaises(ValueError):
+            create_embeddings("unknown")
+
     def test_load_documents(self):
         """
         Tests the load_documents function from the bot_logic module.
@@ -44,6 +73,56 @@ class TestBotLogic(unittest.TestCase):
         retriever = load_embeddings(documents)
         self.assertIsNotNone(retriever)
 
+    def test_hash_documents(self):
+        """
+        Tests the hash_documents function from the bot_logic module.
+        It checks if the function returns the same hash for the same documents
+        and a different hash once the content of a document changes.
+        """
+        documents = load_documents(DOCUMENT_PATH)
+        self.assertEqual(hash_documents(documents), hash_documents(documents))
+        documents[0].page_content += " edited"
+        self.assertNotEqual(
+            hash_documents(documents), hash_documents(load_documents(DOCUMENT_PATH))
+        )
+
+    def test_get_retriever(self):
+        """
+        Tests the get_retriever function from the bot_logic module.
+        It checks if the function builds the retriever once and returns the
+        same retriever on subsequent calls.
+        """
+        retriever = get_retriever(DOCUMENT_PATH)
+        self.assertIsNotNone(retriever)
+        self.assertIs(get_retriever(DOCUMENT_PATH), retriever)
+
+    def test_get_retriever_checks_source_periodically(self):
+        """
+        Tests the get_retriever function from the bot_logic module.
+        It checks if the source documents are not checked again within
+        SOURCE_CHECK_INTERVAL_SECONDS, and are checked once it has passed.
+        """
+        retriever = get_retriever(DOCUMENT_PATH)
+        with patch(
+            "chatbot.app.bot_logic.source_version", wraps=source_version
+        ) as mock_source_version:
+            with patch("chatbot.app.bot_logic.SOURCE_CHECK_INTERVAL_SECONDS", 60):
+                self.assertIs(get_retriever(DOCUMENT_PATH), retriever)
+            mock_source_version.assert_not_called()
+            with patch("chatbot.app.bot_logic.SOURCE_CHECK_INTERVAL_SECONDS", 0):
+                self.assertIs(get_retriever(DOCUMENT_PATH), retriever)
+            mock_source_version.assert_called_once_with(DOCUMENT_PATH)
+
+    @patch("chatbot.app.bot_logic.WARMUP_INVOKE_MODEL", False)
+    def test_warm_up(self):
+        """
+        Tests the warm_up function from the bot_logic module.
+        It checks if the function builds the retriever, runs the stub question
+        through it and marks the chatbot as ready.
+        """
+        self.assertTrue(warm_up("test query"))
+        self.assertTrue(is_ready())
+
     def test_generate_response(self):
         """
         Tests the generate_response function from the bot_logic module.
@@ -57,6 +136,17 @@ class TestBotLogic(unittest.TestCase):
         self.assertIsNotNone(response)
         self.assertTrue(isinstance(response, str))
 
+    def test_generate_response_stream(self):
+        """
+        Tests the generate_response_stream function from the bot_logic module.
+        It checks if the function yields string chunks that join into a
+        non-empty response for a given user query and vector store.
+        """
+        retriever = load_embeddings(load_documents(DOCUMENT_PATH))
+        chunks = list(generate_response_stream(retriever, "test query"))
+        self.assertTrue(all(isinstance(chunk, str) for chunk in chunks))
+        self.assertTrue("".join(chunks))
+
     def test_query(self):
         """
         Tests the query function from the bot_logic module.
@@ -68,6 +158,50 @@ class TestBotLogic(unittest.TestCase):
         self.assertIsNotNone(response)
         self.assertTrue(isinstance(response, str))
 
+    def test_query_serves_faq_answer(self):
+        """
+        Tests the query function from the bot_logic module.
+        It checks if the function answers a rephrased FAQ question with the
+        canonical answer from the FAQ, without calling the language model,
+        and counts the response and the FAQ hit in the metrics.
+        """
+        get_retriever()
+        responses = RESPONSES.value(source=RESPONSE_SOURCE_FAQ)
+        hits = CACHE_LOOKUPS.value(cache="faq", result="hit")
+
+        response = query("whats albert shoes return policy")
+        self.assertTrue(response.startswith("We accept all returns within 30 days"))
+        self.assertEqual(last_response_source(), RESPONSE_SOURCE_FAQ)
+        self.assertEqual(RESPONSES.value(source=RESPONSE_SOURCE_FAQ), responses + 1)
+        self.assertEqual(CACHE_LOOKUPS.value(cache="faq", result="hit"), hits + 1)
+
+    def test_stale_response_is_not_cached(self):
+        """
+        Tests the _store_response function from the bot_logic module.
+        It checks if a response generated with a retriever that has been
+        replaced meanwhile is not cached, while a response generated with
+        the current retriever is.
+        """
+        current, replaced = object(), object()
+        embedding = [1.0, 0.0, 0.0]
+        with patch("chatbot.app.bot_logic._retriever", current), patch(
+            "chatbot.app.bot_logic.response_cache",
+            SemanticResponseCache(0.95, 60, 8),
+        ) as cache:
+            _store_response(replaced, "stale question", embedding, "stale answer")
+            self.assertIsNone(cache.lookup(embedding))
+            _store_response(current, "fresh question", embedding, "fresh answer")
+            self.assertEqual(cache.lookup(embedding), "fresh answer")
+
+    def test_query_stream(self):
+        """
+        Tests the query_stream function from the bot_logic module.
+        It checks if the function yields string chunks for a given user input.
+        """
+        chunks = list(query_stream("test query"))
+        self.assertTrue(chunks)
+        self.assertTrue(all(isinstance(chunk, str) for chunk in chunks))
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,127 @@
+"""
+This module contains unit tests for the context_builder module of the chatbot
+application. It tests the ContextAssembler class to ensure the context stays
+within the token budget, keeps the relevance order, skips duplicate and
+overlapping chunks, and records the tokens used.
+
+Tokens are counted as words so the tests do not depend on the tiktoken
+encodings, which are downloaded on first use.
+"""
+
+import unittest
+from langchain.schema.document import Document
+from chatbot.app.context_builder import ContextAssembler, TokenCounter
+
+
+class WordTokenCounter(TokenCounter):
+    """
+    Token counter counting one token per whitespace-separated word.
+    """
+
+    def count(self, text):
+        return len(text.split())
+
+    def truncate(self, text, max_tokens):
+        return " ".join(text.split()[:max_tokens])
+
+
+def documents(*texts):
+    """
+    Returns one Document per text.
+    """
+    return [Document(page_content=text) for text in texts]
+
+
+class TestContextAssembler(unittest.TestCase):
+    """
+    This class contains unit tests for the ContextAssembler class.
+    """
+
+    def setUp(self):
+        self.assembler = ContextAssembler(
+            max_tokens=10, separator=" | ", token_counter=WordTokenCounter()
+        )
+
+    def test_assemble_fills_budget_in_relevance_order(self):
+        """
+        Tests that chunks are added in order, that a chunk exceeding the
+        remaining budget is skipped for a smaller one, and that the context
+        stays within the budget.
+        """
+        context, tokens = self.assembler.assemble(
+            documents(
+                "returns are free for thirty days",
+                "shipping takes three to five business days",
+                "sizes run small",
+            )
+        )
+
+        self.assertEqual(context, "returns are free for thirty days | sizes run small")
+        self.assertEqual(tokens, 10)
+        self.assertEqual(self.assembler.stats()["skipped_over_budget"], 1)
+
+    def test_assemble_skips_duplicate_and_overlapping_chunks(self):
+        """
+        Tests that exact duplicates, chunks contained in a selected chunk and
+        chunks mostly made of selected text are skipped.
+        """
+        assembler = ContextAssembler(max_tokens=100, token_counter=WordTokenCounter())
+        context, _ = assembler.assemble(
+            documents(
+                "Returns are free for thirty days after delivery",
+                "returns are free for thirty days after delivery",
+                "free for thirty days",
+                "Returns are free for thirty days after delivery, always",
+                "Our shoes are made in Portugal",
+            )
+        )
+
+        self.assertEqual(
+            context.split("\n\n"),
+            [
+                "Returns are free for thirty days after delivery",
+                "Our shoes are made in Portugal",
+            ],
+        )
+        self.assertEqual(assembler.stats()["skipped_overlapping"], 3)
+
+    def test_assemble_truncates_oversized_first_chunk(self):
+        """
+        Tests that the most relevant chunk is truncated to the budget when it
+        does not fit on its own.
+        """
+        context, tokens = self.assembler.assemble(
+            documents(" ".join(f"word{i}" for i in range(20)))
+        )
+
+        self.assertEqual(tokens, 10)
+        self.assertEqual(context.split(), [f"word{i}" for i in range(10)])
+
+    def test_stats_record_tokens_per_request(self):
+        """
+        Tests that the tokens of the last request and of all requests are
+        recorded.
+        """
+        self.assembler.assemble(documents("sizes run small"))
+        self.assembler.assemble(documents("returns are free"))
+        self.assembler.assemble([])
+
+        stats = self.assembler.stats()
+        self.assertEqual(stats["requests"], 3)
+        self.assertEqual(stats["total_tokens"], 6)
+        self.assertEqual(stats["last_tokens"], 0)
+
+    def test_token_counter_counts_tokens(self):
+        """
+        Tests that the default token counter counts tokens and truncates
+        text, with tiktoken or with its estimate.
+        """
+        counter = TokenCounter()
+        text = "What is your return policy for shoes bought online?"
+
+        self.assertGreater(counter.count(text), 0)
+        self.assertLessEqual(counter.count(counter.truncate(text, 3)), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
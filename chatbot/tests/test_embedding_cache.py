@@ -0,0 +1,97 @@
+"""
+This module contains unit tests for the embedding_cache module of the chatbot
+application. It tests the EmbeddingCache and CachedEmbeddings classes to ensure
+embeddings are stored, reused and evicted as expected.
+
+The underlying embeddings are replaced with a Mock so the tests do not call the
+OpenAI API.
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import Mock
+from chatbot.app.embedding_cache import EmbeddingCache, CachedEmbeddings
+
+
+def fake_embed_documents(texts):
+    """
+    Returns a deterministic one-dimensional embedding per text.
+    """
+    return [[float(len(text))] for text in texts]
+
+
+class TestEmbeddingCache(unittest.TestCase):
+    """
+    This class contains unit tests for the EmbeddingCache and CachedEmbeddings
+    classes. Each test uses a cache database in a temporary directory.
+    """
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.cache = EmbeddingCache(
+            os.path.join(self.directory, "embeddings.sqlite3"), max_entries=3
+        )
+        self.underlying = Mock()
+        self.underlying.embed_documents.side_effect = fake_embed_documents
+        self.embeddings = CachedEmbeddings(self.underlying, self.cache, "test-model")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_key_depends_on_model_name(self):
+        """
+        Tests that the same text embedded by different models has different
+        cache keys.
+        """
+        self.assertNotEqual(
+            EmbeddingCache.key("model-a", "text"), EmbeddingCache.key("model-b", "text")
+        )
+
+    def test_embed_documents_only_embeds_missing_texts(self):
+        """
+        Tests that re-embedding after one text changed only sends the changed
+        text to the underlying embeddings, and that hits and misses are
+        counted.
+        """
+        self.embeddings.embed_documents(["a", "bb"])
+        vectors = self.embeddings.embed_documents(["a", "ccc"])
+
+        self.assertEqual(vectors, [[1.0], [3.0]])
+        self.underlying.embed_documents.assert_called_with(["ccc"])
+        self.assertEqual(self.embeddings.stats(), {"hits": 1, "misses": 3})
+
+    def test_concurrent_calls_count_every_lookup(self):
+        """
+        Tests that hits and misses are all counted when texts are embedded
+        from several threads at once, as in the ingestion pipeline.
+        """
+        self.embeddings.embed_documents(["a"])
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            list(
+                executor.map(
+                    lambda _: self.embeddings.embed_documents(["a"]), range(200)
+                )
+            )
+
+        self.assertEqual(self.embeddings.stats(), {"hits": 200, "misses": 1})
+
+    def test_put_many_evicts_least_recently_used(self):
+        """
+        Tests that the cache keeps at most max_entries embeddings and evicts
+        the least recently used ones first.
+        """
+        self.cache.put_many({"a": [1.0], "b": [2.0], "c": [3.0]})
+        self.cache.get_many(["a"])
+        self.cache.put_many({"d": [4.0]})
+
+        self.assertEqual(len(self.cache), 3)
+        self.assertEqual(
+            set(self.cache.get_many(["a", "b", "c", "d"])), {"a", "c", "d"}
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,117 @@
+"""
+This module contains unit tests for the faq_index module of the chatbot
+application. It tests that FAQ documents are parsed into question and answer
+pairs, and that FAQIndex matches exact and rephrased questions while rejecting
+questions that only share a few words with an FAQ question, or that negate or
+narrow it.
+"""
+
+import unittest
+from chatbot.app.faq_index import FAQIndex, normalize, parse_faq
+
+FAQ = """﻿Albert Shoes
+Frequently Asked Questions (FAQs)
+What is Albert's return policy?
+* We accept all returns within 30 days of purchase.
+How much does international shipping cost?
+* International shipping costs vary by destination,
+* starting at $15.
+What is the warranty on Albert Shoes' products?
+* All our shoes come with a one-year warranty.
+What are Albert Shoes' business hours?
+* Our online store is open 24/7.
+Are your products environmentally friendly?
+* We use sustainable materials wherever possible.
+"""
+
+
+class TestFAQIndex(unittest.TestCase):
+    """
+    This class contains unit tests for the FAQ parser and the FAQIndex class.
+    """
+
+    def setUp(self):
+        self.index = FAQIndex(parse_faq(FAQ), threshold=0.9)
+
+    def test_parse_faq(self):
+        """
+        Tests that questions are paired with their answers, that answers
+        spanning several lines are joined, and that titles are skipped.
+        """
+        pairs = parse_faq(FAQ)
+
+        self.assertEqual(len(pairs), 5)
+        self.assertEqual(
+            pairs[1],
+            (
+                "How much does international shipping cost?",
+                "International shipping costs vary by destination, starting at $15.",
+            ),
+        )
+
+    def test_normalize(self):
+        """
+        Tests that case, punctuation, possessives and stop words are removed.
+        """
+        self.assertEqual(
+            normalize("What is Albert's RETURN policy?"), ["albert", "return", "policy"]
+        )
+
+    def test_lookup_exact_match(self):
+        """
+        Tests that a question differing only in case and punctuation is an
+        exact match.
+        """
+        match = self.index.lookup("WHAT IS ALBERT’S RETURN POLICY")
+
+        self.assertTrue(match.exact)
+        self.assertEqual(match.score, 1.0)
+        self.assertEqual(
+            match.answer, "We accept all returns within 30 days of purchase."
+        )
+
+    def test_lookup_fuzzy_match(self):
+        """
+        Tests that a rephrased question with an extra word is a fuzzy match.
+        """
+        match = self.index.lookup("Whats the Albert Shoes return policy")
+
+        self.assertFalse(match.exact)
+        self.assertGreaterEqual(match.score, 0.9)
+        self.assertEqual(match.question, "What is Albert's return policy?")
+
+    def test_lookup_rejects_partial_overlap(self):
+        """
+        Tests that questions sharing only some words with an FAQ question,
+        or none, are not matched.
+        """
+        self.assertIsNone(self.index.lookup("policy"))
+        self.assertIsNone(self.index.lookup("What is the warranty on sandals?"))
+        self.assertIsNone(self.index.lookup("Do you sell gift cards?"))
+        self.assertIsNone(self.index.lookup("?"))
+
+    def test_lookup_rejects_negated_question(self):
+        """
+        Tests that a question negating an FAQ question is not matched, although
+        it has all of its words.
+        """
+        self.assertIsNone(
+            self.index.lookup("Are your products not environmentally friendly?")
+        )
+        self.assertIsNone(
+            self.index.lookup("Aren't Albert Shoes' products environmentally friendly?")
+        )
+
+    def test_lookup_rejects_narrowed_question(self):
+        """
+        Tests that a question adding words the FAQ never uses to an FAQ
+        question is not matched, since the FAQ answer may not apply to it.
+        """
+        self.assertIsNone(
+            self.index.lookup("What are Albert Shoes' business hours in December?")
+        )
+        self.assertIsNone(self.index.lookup("What are your business hours in december"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,82 @@
+"""
+This module contains unit tests for the hybrid_retriever module of the chatbot
+application. It tests the BM25Index class to ensure documents are ranked by
+their exact terms, and the HybridRetriever class to ensure the lexical and
+vector rankings are fused.
+
+The vector retriever is replaced with a retriever returning a fixed ranking,
+so the tests do not call the OpenAI API.
+"""
+
+import unittest
+from typing import List
+from langchain.schema import BaseRetriever
+from langchain.schema.document import Document
+from chatbot.app.hybrid_retriever import BM25Index, HybridRetriever
+
+DOCUMENTS = [
+    Document(page_content="Is there an Albert Shoes loyalty program?"),
+    Document(page_content="How much does international shipping cost?"),
+    Document(page_content="What is Albert's return policy?"),
+]
+
+
+class FixedRetriever(BaseRetriever):
+    """
+    Retriever returning the same documents for every query.
+    """
+
+    documents: List[Document]
+
+    def _get_relevant_documents(self, query, *, run_manager):
+        return self.documents
+
+
+class TestBM25Index(unittest.TestCase):
+    """
+    This class contains unit tests for the BM25Index class.
+    """
+
+    def test_search_ranks_documents_with_query_terms_first(self):
+        """
+        Tests that the document containing the query terms ranks first and
+        that documents sharing no term with the query are not returned.
+        """
+        index = BM25Index(DOCUMENTS)
+        results = index.search("international shipping", k=3)
+
+        self.assertEqual([i for i, _ in results], [1])
+        self.assertGreater(results[0][1], 0)
+
+    def test_search_ignores_unknown_terms(self):
+        """
+        Tests that a query made only of unknown terms returns no documents.
+        """
+        self.assertEqual(BM25Index(DOCUMENTS).search("sneakers"), [])
+
+
+class TestHybridRetriever(unittest.TestCase):
+    """
+    This class contains unit tests for the HybridRetriever class.
+    """
+
+    def test_fusion_promotes_lexical_match(self):
+        """
+        Tests that a document ranked second by the vector retriever but first
+        by BM25 comes first in the fused ranking, and that the fused ranking
+        is cut to k documents without duplicates.
+        """
+        retriever = HybridRetriever(
+            vector_retriever=FixedRetriever(
+                documents=[DOCUMENTS[2], DOCUMENTS[0], DOCUMENTS[1]]
+            ),
+            bm25_index=BM25Index(DOCUMENTS),
+            k=2,
+        )
+        documents = retriever.get_relevant_documents("loyalty program")
+
+        self.assertEqual(documents, [DOCUMENTS[0], DOCUMENTS[2]])
+
+
+if __name__ == "__main__":
+    unittest.main()
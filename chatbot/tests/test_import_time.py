@@ -0,0 +1,110 @@
+"""
+This module contains an import-time benchmark of the bot_logic module of the
+chatbot application.
+
+bot_logic is imported in a fresh interpreter with `python -X importtime`, and
+the test checks that the slowest dependencies (the OpenAI client, the
+LangChain chat models, embeddings, document loaders and Chroma vector store)
+are not imported until they are first used. If IMPORT_TIME_BUDGET_MS is set,
+the import time is also checked against that budget in milliseconds; it is
+not checked by default, since wall-clock timings vary too much on shared CI
+runners. On failure, the slowest imports of the report are listed.
+"""
+
+import os
+import sys
+import subprocess  # nosec B404
+import unittest
+from typing import Dict
+
+APP_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "app")
+IMPORT_TIME_BUDGET_MS = os.getenv("IMPORT_TIME_BUDGET_MS")
+DEFERRED_MODULES = (
+    "openai",
+    "langchain.chat_models",
+    "langchain.embeddings",
+    "langchain.document_loaders",
+    "langchain.vectorstores.chroma",
+)
+
+
+def measure_import_time(module: str) -> Dict[str, int]:
+    """
+    Imports a module in a fresh interpreter with `-X importtime`.
+
+    Args:
+        module (str): Name of the module to import from the app directory.
+
+    Returns:
+        Dict[str, int]: Cumulative import time in microseconds of every
+        module imported, by module name.
+    """
+    env = dict(os.environ, PYTHONPATH=APP_DIR)
+    env.setdefault("OPENAI_API_KEY", "sk-import-time")
+    result = subprocess.run(  # nosec B603
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=APP_DIR,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    timings = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|")
+        timings[name.strip()] = int(cumulative)
+    return timings
+
+
+class TestImportTime(unittest.TestCase):
+    """
+    This class contains the import-time benchmark of the bot_logic module.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        # The fastest of several runs, so that a cold disk cache does not
+        # count against the budget.
+        runs = [measure_import_time("bot_logic") for _ in range(3)]
+        cls.timings = min(runs, key=lambda timings: timings["bot_logic"])
+
+    def slowest(self, count: int = 10) -> str:
+        """
+        Returns the slowest imports of the report, one per line.
+        """
+        ranked = sorted(self.timings.items(), key=lambda item: item[1], reverse=True)
+        return "\n".join(f"{us / 1000:9.1f} ms  {name}" for name, us in ranked[:count])
+
+    @unittest.skipUnless(IMPORT_TIME_BUDGET_MS, "IMPORT_TIME_BUDGET_MS is not set")
+    def test_import_time_within_budget(self):
+        """
+        Tests that importing bot_logic takes less than IMPORT_TIME_BUDGET_MS.
+        """
+        import_time_ms = self.timings["bot_logic"] / 1000
+
+        self.assertLess(
+            import_time_ms,
+            float(IMPORT_TIME_BUDGET_MS),
+            f"bot_logic imported in {import_time_ms:.0f} ms:\n{self.slowest()}",
+        )
+
+    def test_heavy_dependencies_are_deferred(self):
+        """
+        Tests that the slowest dependencies are not imported with bot_logic.
+        """
+        imported = [
+            name
+            for name in self.timings
+            if any(
+                name == deferred or name.startswith(f"{deferred}.")
+                for deferred in DEFERRED_MODULES
+            )
+        ]
+
+        self.assertEqual(imported, [], self.slowest())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,211 @@
+"""
+This module contains unit tests for the ingestion module of the chatbot
+application. It tests that a directory of documents is streamed into a vector
+store in batches, that every chunk is embedded exactly once, that
+bounded_map keeps the order of its input, and that a missing directory or a
+directory without documents makes the command line fail.
+
+The documents are embedded with the local hashing embeddings, so the tests do
+not call the OpenAI API.
+"""
+
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from functools import partial
+from contextlib import ExitStack, redirect_stderr, redirect_stdout
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from io import StringIO
+from unittest.mock import patch
+import retriever_builder
+from chatbot.app.ingestion import (
+    PrimedEmbeddings,
+    bounded_map,
+    ingest_directory,
+    iter_document_paths,
+    main,
+)
+from chatbot.app.local_embeddings import HashingEmbeddings
+from chatbot.app.vector_store import NumpyVectorStore
+
+
+class CountingEmbeddings(HashingEmbeddings):
+    """
+    Hashing embeddings counting the texts they embed.
+    """
+
+    def __init__(self):
+        super().__init__(n_features=64)
+        self.embedded_texts = []
+        self.lock = threading.Lock()
+
+    def embed_documents(self, texts):
+        with self.lock:
+            self.embedded_texts.extend(texts)
+        return super().embed_documents(texts)
+
+
+class TestIngestion(unittest.TestCase):
+    """
+    This class contains unit tests for the ingestion pipeline.
+    """
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        os.makedirs(os.path.join(self.directory, "nested"))
+        for index in range(5):
+            subdirectory = "nested" if index % 2 else ""
+            path = os.path.join(self.directory, subdirectory, f"faq_{index}.txt")
+            with open(path, "w", encoding="utf-8") as file:
+                file.write(
+                    "\n\n".join(
+                        f"Question {index}-{line} about shoe size {line}?"
+                        for line in range(6)
+                    )
+                )
+        with open(os.path.join(self.directory, "notes.md"), "w", encoding="utf-8"):
+            pass
+        self.underlying = CountingEmbeddings()
+        self.embeddings = PrimedEmbeddings(self.underlying)
+        self.store = NumpyVectorStore(self.embeddings)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_iter_document_paths_matches_pattern_recursively(self):
+        """
+        Tests that matching files are listed from subdirectories and that
+        other files are skipped.
+        """
+        paths = list(iter_document_paths(self.directory, "*.txt"))
+
+        self.assertEqual(len(paths), 5)
+        self.assertTrue(all(path.endswith(".txt") for path in paths))
+
+    def test_iter_document_paths_rejects_missing_directory(self):
+        """
+        Tests that a missing directory, or a file, is reported instead of
+        being listed as an empty directory.
+        """
+        with self.assertRaises(FileNotFoundError):
+            iter_document_paths(os.path.join(self.directory, "missing"))
+        with self.assertRaises(NotADirectoryError):
+            iter_document_paths(os.path.join(self.directory, "notes.md"))
+
+    def test_main_resolves_path_from_current_directory(self):
+        """
+        Tests that the command line indexes a directory relative to the
+        current directory, and fails for a missing directory or a directory
+        without documents.
+        """
+        os.makedirs(os.path.join(self.directory, "empty"))
+        cwd = os.getcwd()
+        os.chdir(os.path.dirname(self.directory))
+        self.addCleanup(os.chdir, cwd)
+        name = os.path.basename(self.directory)
+        stdout, stderr = StringIO(), StringIO()
+        # The in-memory Chroma collection is shared by the whole process, so
+        # the index is built with the NumPy store.
+        build = partial(retriever_builder.build_index_from_directory, backend="numpy")
+        stack = ExitStack()
+        self.addCleanup(stack.close)
+        stack.enter_context(
+            patch.object(retriever_builder, "_embeddings", self.underlying)
+        )
+        stack.enter_context(
+            patch.object(retriever_builder, "build_index_from_directory", build)
+        )
+        with redirect_stdout(stdout), redirect_stderr(stderr):
+            self.assertEqual(main(["ingestion.py", name]), 0)
+            self.assertEqual(main(["ingestion.py", os.path.join(name, "empty")]), 1)
+            self.assertEqual(main(["ingestion.py", os.path.join(name, "missing")]), 1)
+
+        self.assertIn('"documents": 5', stdout.getvalue())
+        self.assertIn("No document matching", stderr.getvalue())
+        self.assertIn("Document directory not found", stderr.getvalue())
+
+    def test_ingest_directory_writes_every_chunk_once(self):
+        """
+        Tests that every chunk is embedded exactly once, written to the store
+        in batches, and reported in the statistics.
+        """
+        batches = []
+        stats = ingest_directory(
+            self.directory,
+            self.store,
+            self.embeddings,
+            batch_size=4,
+            max_processes=0,
+            max_concurrent_batches=2,
+            pattern="*.txt",
+            on_batch=batches.append,
+        )
+
+        self.assertEqual(stats.documents, 5)
+        self.assertEqual(stats.chunks, len(self.store))
+        self.assertEqual(len(self.underlying.embedded_texts), stats.chunks)
+        self.assertEqual(stats.batches, len(batches))
+        self.assertTrue(all(len(batch) <= 4 for batch in batches))
+        self.assertGreater(stats.as_dict()["chunks_per_second"], 0)
+        results = self.store.similarity_search("Question 3-2 about shoe size 2?", k=1)
+        self.assertIn("Question 3-2 about shoe size 2?", results[0].page_content)
+
+    def test_ingest_directory_splits_in_worker_processes(self):
+        """
+        Tests that splitting documents in a process pool produces the same
+        chunks, in the same order, as splitting them in the calling process,
+        and that the worker processes are spawned rather than forked.
+        """
+        ingest_directory(self.directory, self.store, self.embeddings, 4, 0, 2, "*.txt")
+        store = NumpyVectorStore(self.embeddings)
+        with patch(
+            "chatbot.app.ingestion.ProcessPoolExecutor", wraps=ProcessPoolExecutor
+        ) as pool:
+            ingest_directory(self.directory, store, self.embeddings, 4, 2, 2, "*.txt")
+
+        self.assertEqual(
+            pool.call_args.kwargs["mp_context"].get_start_method(), "spawn"
+        )
+
+        self.assertEqual(
+            [d.page_content for d in store._documents],
+            [d.page_content for d in self.store._documents],
+        )
+
+    def test_primed_embeddings_fall_back_to_underlying(self):
+        """
+        Tests that primed vectors are served once and that other texts are
+        embedded by the underlying embeddings.
+        """
+        self.embeddings.prime(["primed"], [[1.0]])
+
+        vectors = self.embeddings.embed_documents(["primed", "other"])
+
+        self.assertEqual(vectors[0], [1.0])
+        self.assertEqual(self.underlying.embedded_texts, ["other"])
+        self.embeddings.embed_documents(["primed"])
+        self.assertEqual(self.underlying.embedded_texts, ["other", "primed"])
+
+    def test_bounded_map_keeps_order_and_window(self):
+        """
+        Tests that results are yielded in input order and that the input is
+        consumed lazily, at most window items ahead of the results.
+        """
+        consumed = []
+
+        def items():
+            for item in range(10):
+                consumed.append(item)
+                yield item
+
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            results = bounded_map(executor, lambda item: item * 2, items(), 3)
+            self.assertEqual(next(results), 0)
+            self.assertEqual(len(consumed), 3)
+            self.assertEqual(list(results), [item * 2 for item in range(1, 10)])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,65 @@
+"""
+This module contains unit tests for the local_embeddings module of the chatbot
+application. It tests the HashingEmbeddings class to ensure embeddings are
+deterministic, normalized, and place related texts closer together than
+unrelated ones.
+"""
+
+import math
+import unittest
+from chatbot.app.local_embeddings import HashingEmbeddings
+
+
+def cosine(a, b):
+    """
+    Returns the dot product of two normalized vectors.
+    """
+    return sum(x * y for x, y in zip(a, b))
+
+
+class TestHashingEmbeddings(unittest.TestCase):
+    """
+    This class contains unit tests for the HashingEmbeddings class.
+    """
+
+    def setUp(self):
+        self.embeddings = HashingEmbeddings(n_features=256)
+
+    def test_embeddings_are_deterministic_and_normalized(self):
+        """
+        Tests that embedding the same text twice gives the same unit-length
+        vector with the configured number of dimensions.
+        """
+        vector = self.embeddings.embed_query("What is Albert's return policy?")
+
+        self.assertEqual(len(vector), 256)
+        self.assertEqual(
+            vector,
+            self.embeddings.embed_documents(["What is Albert's return policy?"])[0],
+        )
+        self.assertAlmostEqual(math.sqrt(sum(v * v for v in vector)), 1.0)
+
+    def test_related_texts_are_more_similar(self):
+        """
+        Tests that a question is more similar to the FAQ entry it matches than
+        to an unrelated one.
+        """
+        question, related, unrelated = self.embeddings.embed_documents(
+            [
+                "how do returns work",
+                "We accept all returns within 30 days of purchase",
+                "International shipping costs vary by destination",
+            ]
+        )
+
+        self.assertGreater(cosine(question, related), cosine(question, unrelated))
+
+    def test_empty_text_embeds_to_zero_vector(self):
+        """
+        Tests that a text without any tokens embeds to a zero vector.
+        """
+        self.assertEqual(self.embeddings.embed_query("?!"), [0.0] * 256)
+
+
+if __name__ == "__main__":
+    unittest.main()
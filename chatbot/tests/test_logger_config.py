@@ -22,8 +22,20 @@ Functions:
       Tests if the handlers have the correct log level.
     test_setup_logger_handlers_have_correct_formatter():
       Tests if the handlers have the correct formatter.
+    test_setup_logger_is_idempotent():
+      Tests if setting up a logger twice does not add handlers.
+    test_records_are_written_by_listener_thread():
+      Tests if records are written by the listener thread.
+    test_json_formatter():
+      Tests if the JSON formatter writes one JSON object per record.
+    test_debug_rate_limit_filter():
+      Tests if debug records are rate limited per line of code.
+    test_api_logger_config_is_identical():
+      Tests if the copy of the module in the API is identical.
 """
 
+import os
+import json
 import logging
 from unittest import mock
 from chatbot.app import logger_config
@@ -63,7 +75,7 @@ def test_setup_logger_creates_logs_directory_if_not_exists(mock_makedirs, mock_e
     creates the logs directory when it does not exist.
     """
     mock_exists.return_value = False
-    logger_config.setup_logger("test_script", logging.DEBUG)
+    logger_config.setup_logger("test_script_new_dir", logging.DEBUG)
     mock_makedirs.assert_called_once_with("logs")
 
 
@@ -83,7 +95,7 @@ def test_setup_logger_does_not_create_logs_directory_if_exists(mock_makedirs):
     attempt to create it again.
     """
     mock_makedirs.side_effect = FileExistsError
-    logger_config.setup_logger("test_script", logging.DEBUG)
+    logger_config.setup_logger("test_script_existing_dir", logging.DEBUG)
     mock_makedirs.assert_not_called()
 
 
@@ -93,20 +105,24 @@ def test_setup_logger_adds_two_handlers_to_logger():
 
     The function setup_logger is called with a name and level. The test first
     removes any existing handlers from the logger. Then it asserts that the
-    logger has exactly two handlers after calling setup_logger, and that these
-    handlers are instances of the expected classes: StreamHandler and
-    TimedRotatingFileHandler.
+    logger has exactly one QueueHandler, and that the listener thread runs
+    exactly two handlers for the logger, which are instances of the expected
+    classes: StreamHandler and TimedRotatingFileHandler.
 
     This test is important to ensure that the setup_logger function correctly
-    sets up both a console handler and a file handler for the logger.
+    sets up both a console handler and a file handler for the logger, and that
+    they are kept off the calling thread.
     """
     logger = logging.getLogger("test_script")
     for handler in logger.handlers[:]:
         logger.removeHandler(handler)
     logger = logger_config.setup_logger("test_script", logging.DEBUG)
-    assert len(logger.handlers) == 2
-    assert isinstance(logger.handlers[0], logging.StreamHandler)
-    assert isinstance(logger.handlers[1], logging.handlers.TimedRotatingFileHandler)
+    handlers = logger_config.get_handlers("test_script")
+    assert len(logger.handlers) == 1
+    assert isinstance(logger.handlers[0], logging.handlers.QueueHandler)
+    assert len(handlers) == 2
+    assert isinstance(handlers[0], logging.StreamHandler)
+    assert isinstance(handlers[1], logging.handlers.TimedRotatingFileHandler)
 
 
 def test_setup_logger_handlers_have_correct_log_level():
@@ -122,9 +138,10 @@ def test_setup_logger_handlers_have_correct_log_level():
     sets the log level for both the console handler and the file handler, as the
     log level determines which log messages are output by the handlers.
     """
-    logger = logger_config.setup_logger("test_script", logging.DEBUG)
-    assert logger.handlers[0].level == logging.DEBUG
-    assert logger.handlers[1].level == logging.DEBUG
+    logger_config.setup_logger("test_script", logging.DEBUG)
+    handlers = logger_config.get_handlers("test_script")
+    assert handlers[0].level == logging.DEBUG
+    assert handlers[1].level == logging.DEBUG
 
 
 def test_setup_logger_handlers_have_correct_formatter():
@@ -141,14 +158,99 @@ def test_setup_logger_handlers_have_correct_formatter():
     sets the formatter for both the console handler and the file handler, as the
     formatter determines the format of the log messages output by the handlers.
     """
-    logger = logger_config.setup_logger("test_script", logging.DEBUG)
-    assert isinstance(logger.handlers[0].formatter, logging.Formatter)
-    assert isinstance(logger.handlers[1].formatter, logging.Formatter)
+    logger_config.setup_logger("test_script", logging.DEBUG)
+    handlers = logger_config.get_handlers("test_script")
+    assert isinstance(handlers[0].formatter, logging.Formatter)
+    assert isinstance(handlers[1].formatter, logging.Formatter)
     assert (
-        logger.handlers[0].formatter._fmt
+        handlers[0].formatter._fmt
         == "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
     )
     assert (
-        logger.handlers[1].formatter._fmt
+        handlers[1].formatter._fmt
         == "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
     )
+
+
+def test_setup_logger_is_idempotent():
+    """
+    Test to verify if calling setup_logger again for the same logger, as
+    happens when Streamlit reruns its script, does not add handlers and only
+    updates the logging level.
+    """
+    logger_config.setup_logger("test_script_idempotent", logging.DEBUG)
+    handlers = logger_config.get_handlers("test_script_idempotent")
+    logger = logger_config.setup_logger("test_script_idempotent", logging.INFO)
+
+    assert len(logger.handlers) == 1
+    assert logger_config.get_handlers("test_script_idempotent") == handlers
+    assert logger.level == logging.INFO
+    assert handlers[0].level == logging.INFO
+
+
+def test_records_are_written_by_listener_thread():
+    """
+    Test to verify if records logged on the calling thread are written to the
+    log file by the listener thread, with the message formatted.
+    """
+    logger = logger_config.setup_logger("test_script_listener", logging.DEBUG)
+    logger.info("Processed %d queries", 3)
+    logger_config.flush_logs()
+
+    file_handler = logger_config.get_handlers("test_script_listener")[1]
+    file_handler.flush()
+    with open(file_handler.baseFilename, "r", encoding="utf-8") as file:
+        lines = file.read().splitlines()
+    assert lines[-1].endswith("- test_script_listener - INFO - Processed 3 queries")
+
+
+def test_json_formatter():
+    """
+    Test to verify if the JSON formatter writes the logger, the level and the
+    message of a record as a JSON object.
+    """
+    record = logging.LogRecord(
+        "test_script", logging.WARNING, __file__, 1, "Slow %s", ("query",), None
+    )
+    entry = json.loads(logger_config.JsonFormatter().format(record))
+    assert entry["logger"] == "test_script"
+    assert entry["level"] == "WARNING"
+    assert entry["message"] == "Slow query"
+
+
+def test_debug_rate_limit_filter():
+    """
+    Test to verify if debug records of a same line of code are limited to the
+    given number per second, while records of other lines and of higher
+    levels pass.
+    """
+    rate_limit = logger_config.DebugRateLimitFilter(max_per_second=2)
+
+    def record(level, lineno):
+        return logging.LogRecord("test", level, __file__, lineno, "m", None, None)
+
+    passed = [rate_limit.filter(record(logging.DEBUG, 1)) for _ in range(5)]
+    assert passed == [True, True, False, False, False]
+    assert rate_limit.suppressed == 3
+    assert rate_limit.filter(record(logging.DEBUG, 2))
+    assert rate_limit.filter(record(logging.INFO, 1))
+    assert not logger_config.DebugRateLimitFilter(sample_rate=0).filter(
+        record(logging.DEBUG, 1)
+    )
+
+
+def test_api_logger_config_is_identical():
+    """
+    Test to verify if the copy of the module used by the sentiment analysis
+    API, whose image is built from its own directory, is identical to this one.
+    """
+    root = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
+    paths = [
+        os.path.join(root, service, "app", "logger_config.py")
+        for service in ("chatbot", "api")
+    ]
+    contents = []
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as file:
+            contents.append(file.read())
+    assert contents[0] == contents[1]
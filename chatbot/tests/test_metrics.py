@@ -0,0 +1,102 @@
+"""
+This module contains unit tests for the metrics module of the chatbot
+application. It tests the counters, gauges and histograms, their rendering in
+the Prometheus text format, and the track context manager.
+"""
+
+import unittest
+from chatbot.app.metrics import (
+    Counter,
+    Gauge,
+    Histogram,
+    MetricsRegistry,
+    STAGE_DURATION,
+    STAGE_ERRORS,
+    track,
+)
+
+
+class TestMetrics(unittest.TestCase):
+    """
+    This class contains unit tests for the metrics and the registry.
+    """
+
+    def test_counter(self):
+        """
+        Tests that a counter is incremented per combination of labels, and
+        rejects negative amounts and unknown labels.
+        """
+        counter = Counter("lookups_total", "Lookups.", ["cache", "result"])
+        counter.inc(cache="faq", result="hit")
+        counter.inc(2, cache="faq", result="hit")
+        counter.inc(cache="faq", result="miss")
+
+        self.assertEqual(counter.value(cache="faq", result="hit"), 3)
+        self.assertEqual(counter.value(cache="faq", result="miss"), 1)
+        with self.assertRaises(ValueError):
+            counter.inc(-1, cache="faq", result="hit")
+        with self.assertRaises(ValueError):
+            counter.inc(cache="faq")
+
+    def test_gauge(self):
+        """
+        Tests that a gauge goes up and down and can be set.
+        """
+        gauge = Gauge("in_flight", "In flight.")
+        gauge.inc()
+        gauge.inc()
+        gauge.dec()
+        self.assertEqual(gauge.value(), 1)
+        gauge.set(5)
+        self.assertEqual(gauge.value(), 5)
+
+    def test_expose(self):
+        """
+        Tests that histogram buckets are cumulative and that the registry
+        renders every metric in the Prometheus text format.
+        """
+        registry = MetricsRegistry()
+        histogram = registry.register(
+            Histogram("duration_seconds", "Duration.", ["stage"], buckets=(0.1, 1))
+        )
+        counter = registry.register(Counter("errors_total", 'Errors "x".'))
+        histogram.observe(0.05, stage="query")
+        histogram.observe(0.5, stage="query")
+        histogram.observe(2, stage="query")
+        counter.inc()
+
+        self.assertEqual(histogram.count(stage="query"), 3)
+        self.assertEqual(
+            registry.expose(),
+            "# HELP duration_seconds Duration.\n"
+            "# TYPE duration_seconds histogram\n"
+            'duration_seconds_bucket{stage="query",le="0.1"} 1\n'
+            'duration_seconds_bucket{stage="query",le="1"} 2\n'
+            'duration_seconds_bucket{stage="query",le="+Inf"} 3\n'
+            'duration_seconds_sum{stage="query"} 2.55\n'
+            'duration_seconds_count{stage="query"} 3\n'
+            '# HELP errors_total Errors "x".\n'
+            "# TYPE errors_total counter\n"
+            "errors_total 1\n",
+        )
+
+    def test_track(self):
+        """
+        Tests that track times the block, and counts it as an error of the
+        stage if it raises.
+        """
+        count = STAGE_DURATION.count(stage="test_stage")
+        errors = STAGE_ERRORS.value(stage="test_stage")
+
+        with track("test_stage"):
+            pass
+        with self.assertRaises(RuntimeError):
+            with track("test_stage"):
+                raise RuntimeError("failed")
+
+        self.assertEqual(STAGE_DURATION.count(stage="test_stage"), count + 2)
+        self.assertEqual(STAGE_ERRORS.value(stage="test_stage"), errors + 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
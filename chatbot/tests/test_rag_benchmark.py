@@ -0,0 +1,74 @@
+"""
+This module contains a smoke test of the offline benchmark of the chatbot
+pipeline in benchmarks/rag_benchmark.py. It runs the benchmark on a small
+synthetic corpus in a separate interpreter, since the benchmark configures
+bot_logic through environment variables before importing it, and checks the
+report and the comparison to a baseline.
+"""
+
+import os
+import sys
+import json
+import tempfile
+import subprocess  # nosec B404
+import unittest
+
+BENCHMARK = os.path.join(
+    os.path.dirname(os.path.dirname(__file__)), "benchmarks", "rag_benchmark.py"
+)
+STAGES = {
+    "load_documents",
+    "load_embeddings",
+    "build_hybrid_retriever",
+    "retrieval",
+    "format_docs",
+    "generate_response",
+    "query",
+}
+
+
+def run_benchmark(*args):
+    """
+    Runs the benchmark with a small corpus and returns the completed process.
+    """
+    return subprocess.run(  # nosec B603
+        [sys.executable, BENCHMARK, "--documents", "50", "--queries", "5", *args],
+        capture_output=True,
+        text=True,
+        check=False,
+        timeout=300,
+    )
+
+
+class TestRagBenchmark(unittest.TestCase):
+    """
+    This class contains the smoke test of the offline benchmark.
+    """
+
+    def test_report_and_baseline(self):
+        """
+        Tests that the report holds the percentiles of every stage and the
+        peak memory, and that a run slower than the baseline fails.
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            report_path = os.path.join(directory, "report.json")
+            result = run_benchmark("--output", report_path)
+            self.assertEqual(result.returncode, 0, result.stderr)
+            with open(report_path, "r", encoding="utf-8") as file:
+                report = json.load(file)
+
+            self.assertEqual(report, json.loads(result.stdout))
+            self.assertTrue(STAGES <= set(report["stages"]))
+            self.assertEqual(report["stages"]["query"]["runs"], 5)
+            self.assertLessEqual(
+                report["stages"]["query"]["p50_ms"], report["stages"]["query"]["p99_ms"]
+            )
+            self.assertGreater(report["peak_rss_mb"], 0)
+
+            slower = run_benchmark("--llm-latency-ms", "100", "--baseline", report_path)
+            self.assertEqual(slower.returncode, 1)
+            self.assertIn("Regression: generate_response", slower.stderr)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,82 @@
+"""
+This module contains unit tests for the response_cache module of the chatbot
+application. It tests the SemanticResponseCache class to ensure answers are
+reused for similar questions and expire or get evicted as expected.
+
+The tests use small hand-written embeddings and a fake clock, so they do not
+call the OpenAI API or depend on the wall clock.
+"""
+
+import unittest
+from chatbot.app.response_cache import SemanticResponseCache
+
+
+class FakeClock:
+    """
+    Clock whose current time is set by the test.
+    """
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestSemanticResponseCache(unittest.TestCase):
+    """
+    This class contains unit tests for the SemanticResponseCache class.
+    """
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.cache = SemanticResponseCache(
+            threshold=0.9, ttl_seconds=60, max_entries=2, clock=self.clock
+        )
+
+    def test_lookup_returns_answer_for_similar_question(self):
+        """
+        Tests that a question whose embedding is above the similarity
+        threshold gets the cached answer, and a dissimilar one does not.
+        """
+        self.cache.store("return policy?", [1.0, 0.0], "30 days")
+
+        self.assertEqual(self.cache.lookup([0.99, 0.05]), "30 days")
+        self.assertIsNone(self.cache.lookup([0.0, 1.0]))
+        self.assertEqual(self.cache.stats(), {"size": 1, "hits": 1, "misses": 1})
+
+    def test_lookup_ignores_expired_answers(self):
+        """
+        Tests that answers older than the time to live are not returned.
+        """
+        self.cache.store("return policy?", [1.0, 0.0], "30 days")
+        self.clock.now = 61
+
+        self.assertIsNone(self.cache.lookup([1.0, 0.0]))
+        self.assertEqual(len(self.cache), 0)
+
+    def test_store_evicts_least_recently_used(self):
+        """
+        Tests that storing an answer into a full cache evicts the least
+        recently used answer.
+        """
+        self.cache.store("a", [1.0, 0.0, 0.0], "A")
+        self.cache.store("b", [0.0, 1.0, 0.0], "B")
+        self.cache.lookup([1.0, 0.0, 0.0])
+        self.cache.store("c", [0.0, 0.0, 1.0], "C")
+
+        self.assertEqual(self.cache.lookup([1.0, 0.0, 0.0]), "A")
+        self.assertIsNone(self.cache.lookup([0.0, 1.0, 0.0]))
+
+    def test_clear_removes_all_answers(self):
+        """
+        Tests that clearing the cache removes every cached answer.
+        """
+        self.cache.store("a", [1.0, 0.0], "A")
+        self.cache.clear()
+
+        self.assertIsNone(self.cache.lookup([1.0, 0.0]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,89 @@
+"""
+This module contains unit tests for the retriever_builder module of the
+chatbot application. It tests that the persisted vector stores are keyed by
+the embeddings as well as by the documents, so that a store built with other
+embeddings is never reused, and that only the stores no longer in use are
+removed.
+
+The local hashing embeddings are used so the tests do not call the OpenAI API.
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+import chatbot.app.retriever_builder as retriever_builder
+from chatbot.app.local_embeddings import HashingEmbeddings
+
+DOCUMENT_PATH = "../app/docs/faq_albert_shoes.txt"
+
+
+class TestRetrieverBuilder(unittest.TestCase):
+    """
+    This class contains unit tests for the keys of the persisted vector
+    stores.
+    """
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        for name, value in {
+            "VECTOR_STORE_DIR": self.directory,
+            "VECTOR_STORE_BACKEND": "numpy",
+            "RETRIEVER_MODE": "vector",
+        }.items():
+            patcher = patch.object(retriever_builder, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def load_retriever(self, n_features):
+        """
+        Loads the retriever with hashing embeddings of n_features dimensions.
+        """
+        with patch.object(
+            retriever_builder, "_embeddings", HashingEmbeddings(n_features)
+        ):
+            retriever, store_name = retriever_builder.load_retriever(DOCUMENT_PATH)
+            documents = retriever.get_relevant_documents("What is your return policy?")
+        return store_name, documents
+
+    def test_embeddings_fingerprint(self):
+        """
+        Tests that embeddings of the same model and dimension have the same
+        fingerprint, and embeddings of another dimension a different one.
+        """
+        fingerprint = retriever_builder.embeddings_fingerprint
+        self.assertEqual(
+            fingerprint(HashingEmbeddings(1024)), fingerprint(HashingEmbeddings(1024))
+        )
+        self.assertNotEqual(
+            fingerprint(HashingEmbeddings(1024)), fingerprint(HashingEmbeddings(512))
+        )
+
+    def test_store_is_rebuilt_when_embeddings_change(self):
+        """
+        Tests that changing the number of features of the embeddings between
+        two builds builds a new store instead of reusing the vectors of the
+        first one, and that the rebuilt retriever can be queried.
+        """
+        first_store, _ = self.load_retriever(1024)
+        self.assertEqual(self.load_retriever(1024)[0], first_store)
+
+        second_store, documents = self.load_retriever(512)
+        self.assertNotEqual(second_store, first_store)
+        self.assertTrue(documents)
+
+    def test_prune_persist_dirs_keeps_stores_in_use(self):
+        """
+        Tests that every persisted store but the ones still in use is
+        removed.
+        """
+        for name in ("old", "previous", "current"):
+            os.makedirs(os.path.join(self.directory, name))
+        retriever_builder.prune_persist_dirs("current", "previous", None)
+        self.assertEqual(sorted(os.listdir(self.directory)), ["current", "previous"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,301 @@
+"""
+This module contains unit tests for the sentiment_client module of the chatbot
+application. It tests the SentimentSubmitter class to ensure calls run in the
+background, the number of calls in flight is bounded, and failures are logged.
+It also tests the CircuitBreaker and SentimentAPIClient classes to ensure
+failed connections are retried and the breaker opens and closes as expected,
+and the SentimentBatcher class to ensure prompts are sent in bounded batches.
+
+The session used by the client is mocked, so the tests do not make any
+network requests.
+"""
+
+import threading
+import unittest
+from unittest.mock import Mock, patch
+from requests.exceptions import ConnectionError as RequestsConnectionError
+from requests.exceptions import ConnectTimeout, HTTPError
+from urllib3.exceptions import MaxRetryError, NewConnectionError, ProtocolError
+from chatbot.app.sentiment_client import (
+    CircuitBreaker,
+    CircuitOpenError,
+    SentimentAPIClient,
+    SentimentBatcher,
+    SentimentSubmitter,
+)
+
+
+class TestSentimentSubmitter(unittest.TestCase):
+    """
+    This class contains unit tests for the SentimentSubmitter class.
+    """
+
+    def setUp(self):
+        self.submitter = SentimentSubmitter(max_workers=1, max_in_flight=1)
+
+    def tearDown(self):
+        self.submitter.shutdown()
+
+    def test_submit_runs_call_in_background(self):
+        """
+        Tests that a submitted call runs with the prompt and that the in flight
+        count drops back to zero once it completes.
+        """
+        call = Mock(return_value={"status": "Success"})
+
+        self.assertTrue(self.submitter.submit(call, "I love this product!"))
+        self.submitter.shutdown()
+
+        call.assert_called_once_with("I love this product!")
+        self.assertEqual(self.submitter.in_flight, 0)
+
+    def test_submit_drops_call_when_too_many_in_flight(self):
+        """
+        Tests that a call is dropped, without blocking, while the maximum
+        number of calls are in flight.
+        """
+        release = threading.Event()
+        self.submitter.submit(lambda prompt: release.wait(5), "first")
+
+        self.assertFalse(self.submitter.submit(Mock(), "second"))
+        self.assertEqual(self.submitter.dropped, 1)
+        release.set()
+
+    @patch("chatbot.app.sentiment_client.logger")
+    def test_failed_call_is_logged(self, mock_logger):
+        """
+        Tests that an exception raised by a submitted call is logged.
+        """
+        self.submitter.submit(Mock(side_effect=ValueError("boom")), "prompt")
+        self.submitter.shutdown()
+
+        mock_logger.error.assert_called_once()
+
+
+class FakeClock:
+    """
+    Clock whose current time is set by the test.
+    """
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestCircuitBreaker(unittest.TestCase):
+    """
+    This class contains unit tests for the CircuitBreaker class.
+    """
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.breaker = CircuitBreaker(
+            failure_threshold=2, reset_timeout=10, clock=self.clock
+        )
+
+    def test_breaker_opens_after_consecutive_failures(self):
+        """
+        Tests that the breaker opens once the failure threshold is reached and
+        then rejects calls.
+        """
+        self.breaker.record_failure()
+        self.assertTrue(self.breaker.allow_request())
+        self.breaker.record_failure()
+
+        self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+        self.assertFalse(self.breaker.allow_request())
+
+    def test_breaker_allows_one_probe_after_reset_timeout(self):
+        """
+        Tests that an open breaker lets a single probe through after the reset
+        timeout and closes when the probe succeeds.
+        """
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        self.clock.now = 10
+
+        self.assertTrue(self.breaker.allow_request())
+        self.assertEqual(self.breaker.state, CircuitBreaker.HALF_OPEN)
+        self.assertFalse(self.breaker.allow_request())
+        self.breaker.record_success()
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+
+    def test_failed_probe_reopens_breaker(self):
+        """
+        Tests that a failed probe opens the breaker again.
+        """
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        self.clock.now = 10
+        self.breaker.allow_request()
+        self.breaker.record_failure()
+
+        self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+        self.assertFalse(self.breaker.allow_request())
+
+
+class TestSentimentAPIClient(unittest.TestCase):
+    """
+    This class contains unit tests for the SentimentAPIClient class.
+    """
+
+    def setUp(self):
+        self.client = SentimentAPIClient(
+            max_retries=2,
+            backoff_seconds=0,
+            breaker=CircuitBreaker(failure_threshold=1, reset_timeout=60),
+        )
+        self.client.session.post = Mock()
+
+    def test_post_json_retries_connection_errors(self):
+        """
+        Tests that failures to connect are retried and the response of the
+        successful retry is returned.
+        """
+        response = Mock(status_code=200)
+        response.json.return_value = {"status": "Success"}
+        refused = RequestsConnectionError(
+            MaxRetryError(None, "/", NewConnectionError(None, "refused"))
+        )
+        self.client.session.post.side_effect = [refused, ConnectTimeout(), response]
+
+        self.assertEqual(
+            self.client.post_json("http://api/user_query", {"text": "hi"}),
+            {"status": "Success"},
+        )
+        self.assertEqual(self.client.session.post.call_count, 3)
+
+    def test_post_json_does_not_retry_after_request_is_sent(self):
+        """
+        Tests that a connection error once the request may have been sent,
+        like a connection reset, is not retried, so that the user query is
+        not stored twice.
+        """
+        self.client.session.post.side_effect = RequestsConnectionError(
+            ProtocolError("Connection aborted.", ConnectionResetError())
+        )
+
+        with self.assertRaises(RequestsConnectionError):
+            self.client.post_json("http://api/user_query", {"text": "hi"})
+        self.assertEqual(self.client.session.post.call_count, 1)
+
+    def test_post_json_skips_call_while_breaker_is_open(self):
+        """
+        Tests that once retries are exhausted the breaker opens and the next
+        call is skipped without reaching the session.
+        """
+        self.client.session.post.side_effect = ConnectTimeout()
+
+        with self.assertRaises(ConnectTimeout):
+            self.client.post_json("http://api/user_query", {"text": "hi"})
+        with self.assertRaises(CircuitOpenError):
+            self.client.post_json("http://api/user_query", {"text": "hi"})
+        self.assertEqual(self.client.session.post.call_count, 3)
+        self.assertEqual(self.client.stats()["breaker_state"], CircuitBreaker.OPEN)
+
+    def error_response(self, status_code):
+        """
+        Returns a mocked response whose raise_for_status raises an HTTPError.
+        """
+        response = Mock(status_code=status_code)
+        response.raise_for_status.side_effect = HTTPError(response=response)
+        return response
+
+    def test_post_json_throttled_responses_open_breaker(self):
+        """
+        Tests that a 429 response still returned once retries are exhausted
+        counts as a failure of the breaker, while another client error does
+        not.
+        """
+        self.client.session.post.return_value = self.error_response(404)
+        with self.assertRaises(HTTPError):
+            self.client.post_json("http://api/user_query", {"text": "hi"})
+        self.assertEqual(self.client.stats()["breaker_state"], CircuitBreaker.CLOSED)
+
+        self.client.session.post.return_value = self.error_response(429)
+        with self.assertRaises(HTTPError):
+            self.client.post_json("http://api/user_query", {"text": "hi"})
+        self.assertEqual(self.client.session.post.call_count, 4)
+        self.assertEqual(self.client.stats()["breaker_state"], CircuitBreaker.OPEN)
+
+
+class TestSentimentBatcher(unittest.TestCase):
+    """
+    This class contains unit tests for the SentimentBatcher class.
+    """
+
+    def test_full_batches_are_sent_by_size(self):
+        """
+        Tests that prompts are sent in batches of at most max_batch_size, and
+        that the remaining prompts are flushed on shutdown.
+        """
+        send_batch = Mock()
+        batcher = SentimentBatcher(send_batch, max_batch_size=2, flush_interval=60)
+        for prompt in ["a", "b", "c"]:
+            batcher.submit(prompt)
+        batcher.shutdown(timeout=5)
+
+        sent = [call.args[0] for call in send_batch.call_args_list]
+        self.assertEqual(sent, [["a", "b"], ["c"]])
+        self.assertEqual(batcher.stats()["batches"], 2)
+
+    def test_partial_batch_is_sent_after_flush_interval(self):
+        """
+        Tests that a partial batch is sent once the flush interval has passed.
+        """
+        sent = threading.Event()
+        batcher = SentimentBatcher(
+            lambda batch: sent.set(), max_batch_size=10, flush_interval=0.05
+        )
+        batcher.submit("a")
+
+        self.assertTrue(sent.wait(5))
+        batcher.shutdown(timeout=5)
+
+    def test_overflow_policy_drops_prompts_when_buffer_is_full(self):
+        """
+        Tests that a full buffer drops the oldest prompt with the drop_oldest
+        policy and the new prompt with the drop_newest policy.
+        """
+        release = threading.Event()
+        for policy, expected in [("drop_oldest", ["c"]), ("drop_newest", ["b"])]:
+            send_batch = Mock(side_effect=lambda batch: release.wait(5))
+            batcher = SentimentBatcher(
+                send_batch,
+                max_batch_size=1,
+                flush_interval=60,
+                max_buffer=1,
+                overflow_policy=policy,
+            )
+            batcher.submit("a")
+            while batcher.stats()["buffered"]:
+                pass
+            batcher.submit("b")
+            batcher.submit("c")
+            release.set()
+            batcher.shutdown(timeout=5)
+            release.clear()
+
+            sent = [call.args[0] for call in send_batch.call_args_list]
+            self.assertEqual(sent, [["a"], expected])
+            self.assertEqual(batcher.stats()["dropped"], 1)
+
+    def test_failed_batch_is_counted(self):
+        """
+        Tests that an exception raised while sending a batch is counted and
+        does not stop the worker.
+        """
+        batcher = SentimentBatcher(
+            Mock(side_effect=ValueError("boom")), max_batch_size=1, flush_interval=60
+        )
+        batcher.submit("a")
+        batcher.submit("b")
+        batcher.shutdown(timeout=5)
+
+        self.assertEqual(batcher.stats()["failed"], 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,69 @@
+"""
+This module contains unit tests for the serve module of the chatbot
+application. It tests that the readiness server answers 503 while the chatbot
+is warming up, 200 once it is ready, serves the metrics, and answers 404 on
+other paths.
+"""
+
+import unittest
+from unittest.mock import patch
+import requests
+from chatbot.app.serve import start_readiness_server
+
+
+class TestReadinessServer(unittest.TestCase):
+    """
+    This class contains unit tests for the readiness server.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = start_readiness_server(0)
+        cls.url = f"http://127.0.0.1:{cls.server.server_address[1]}"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def test_not_ready_before_warm_up(self):
+        """
+        Tests that /ready answers 503 until the warm-up has completed.
+        """
+        with patch("chatbot.app.serve.bot_logic.is_ready", return_value=False):
+            response = requests.get(f"{self.url}/ready", timeout=5)
+
+        self.assertEqual(response.status_code, 503)
+
+    def test_ready_after_warm_up(self):
+        """
+        Tests that /ready answers 200 once the warm-up has completed.
+        """
+        with patch("chatbot.app.serve.bot_logic.is_ready", return_value=True):
+            response = requests.get(f"{self.url}/ready", timeout=5)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.text, "ready")
+
+    def test_metrics(self):
+        """
+        Tests that /metrics serves the metrics in the Prometheus text format.
+        """
+        response = requests.get(f"{self.url}/metrics", timeout=5)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.headers["Content-Type"].startswith("text/plain"))
+        self.assertIn("# TYPE chatbot_stage_duration_seconds histogram", response.text)
+        self.assertIn("chatbot_queries_in_flight 0", response.text)
+
+    def test_unknown_path(self):
+        """
+        Tests that other paths answer 404.
+        """
+        response = requests.get(f"{self.url}/other", timeout=5)
+
+        self.assertEqual(response.status_code, 404)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,107 @@
+"""
+This module contains unit tests for the vector_store module of the chatbot
+application. It tests the NumpyVectorStore class to ensure documents are
+ranked by cosine similarity, the store works as a LangChain retriever, and it
+can be saved and loaded.
+
+The embeddings are replaced with a small lookup table so the tests do not call
+the OpenAI API.
+"""
+
+import shutil
+import tempfile
+import unittest
+from langchain.schema.document import Document
+from langchain.schema.embeddings import Embeddings
+from chatbot.app.vector_store import NumpyVectorStore
+
+VECTORS = {
+    "returns": [1.0, 0.0, 0.0],
+    "shipping": [0.0, 1.0, 0.0],
+    "sizes": [0.0, 0.0, 1.0],
+    "return policy?": [0.9, 0.1, 0.0],
+}
+
+
+class LookupEmbeddings(Embeddings):
+    """
+    Embeddings returning the vector of each text from the VECTORS table.
+    """
+
+    def embed_documents(self, texts):
+        return [VECTORS[text] for text in texts]
+
+    def embed_query(self, text):
+        return VECTORS[text]
+
+
+class TestNumpyVectorStore(unittest.TestCase):
+    """
+    This class contains unit tests for the NumpyVectorStore class.
+    """
+
+    def setUp(self):
+        self.store = NumpyVectorStore.from_documents(
+            [Document(page_content=text) for text in ["returns", "shipping", "sizes"]],
+            LookupEmbeddings(),
+        )
+
+    def test_similarity_search_returns_top_k_in_order(self):
+        """
+        Tests that the k most similar documents are returned, most similar
+        first, and that k larger than the store returns every document.
+        """
+        results = self.store.similarity_search_with_score("return policy?", k=2)
+
+        self.assertEqual([d.page_content for d, _ in results], ["returns", "shipping"])
+        self.assertGreater(results[0][1], results[1][1])
+        self.assertEqual(len(self.store.similarity_search("return policy?", k=10)), 3)
+
+    def test_as_retriever_returns_relevant_documents(self):
+        """
+        Tests that the store's retriever returns the most similar document
+        first, as used by the LCEL chain in bot_logic.
+        """
+        retriever = self.store.as_retriever(search_kwargs={"k": 1})
+        documents = retriever.get_relevant_documents("return policy?")
+
+        self.assertEqual([d.page_content for d in documents], ["returns"])
+
+    def test_add_vectors_in_batches(self):
+        """
+        Tests that documents added in many small batches, as written by the
+        ingestion pipeline, are all searchable, that the capacity of the
+        matrix grows geometrically, and that embeddings of another dimension
+        are rejected.
+        """
+        store = NumpyVectorStore(LookupEmbeddings())
+        for i in range(100):
+            store.add_vectors([[1.0, float(i), 0.0]], [Document(page_content=str(i))])
+
+        self.assertEqual(len(store), 100)
+        self.assertLessEqual(len(store._buffer), 128)  # pylint: disable=W0212
+        self.assertEqual(store.similarity_search("returns", k=1)[0].page_content, "0")
+        self.assertEqual(store.similarity_search("shipping", k=1)[0].page_content, "99")
+        with self.assertRaises(ValueError):
+            store.add_vectors([[1.0, 0.0]], [Document(page_content="2d")])
+
+    def test_save_and_load(self):
+        """
+        Tests that a saved store loads with the same documents and ranking.
+        """
+        directory = tempfile.mkdtemp()
+        try:
+            self.store.save(directory)
+            self.assertTrue(NumpyVectorStore.exists(directory))
+            loaded = NumpyVectorStore.load(directory, LookupEmbeddings())
+        finally:
+            shutil.rmtree(directory)
+
+        self.assertEqual(len(loaded), 3)
+        self.assertEqual(
+            loaded.similarity_search("return policy?", k=1)[0].page_content, "returns"
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()